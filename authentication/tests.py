@@ -1,3 +1,47 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+from core.testing import QueryCountTestCase
 
-# Create your tests here.
+
+# Hashing cost is irrelevant to query counts
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthenticationQueryCountTests(QueryCountTestCase):
+    """
+    Registration and login must issue a constant number of queries
+    regardless of how many users exist.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.users = []
+        self.registered = 0
+
+    def grow(self, rows):
+        while len(self.users) < rows:
+            index = len(self.users)
+            self.users.append(User.objects.create_user(
+                f'user{index}', email=f'user{index}@example.com', password='pass12345'
+            ))
+
+    def register(self):
+        self.registered += 1
+        return self.client.post('/api/auth/register/', {
+            'username': f'new{self.registered}',
+            'email': f'new{self.registered}@example.com',
+            'password': 'Str0ng-pass!word',
+            'password_confirm': 'Str0ng-pass!word',
+            'first_name': 'New',
+            'last_name': 'User',
+        }, format='json')
+
+    def test_register(self):
+        self.assertConstantQueries(self.grow, self.register, expected_status=201)
+
+    def test_login(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.post('/api/auth/login/', {
+                'username': self.users[0].username, 'password': 'pass12345'
+            }, format='json')
+        )
@@ -0,0 +1,44 @@
+from django.contrib import admin
+from .models import IdempotencyKey, OutboxEvent, Task, WebhookSubscription
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for stored idempotent responses.
+    """
+    list_display = ['key', 'user', 'status_code', 'created_at']
+    list_filter = ['status_code']
+    search_fields = ['key']
+    raw_id_fields = ['user']
+    readonly_fields = ['user', 'key', 'request_hash', 'status_code', 'response_body', 'created_at', 'claimed_at']
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for background tasks.
+    """
+    list_display = ['name', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['claim_token', 'claimed_at', 'created_at', 'updated_at']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """
+    Read-only view of change events waiting for or already delivered to webhooks.
+    """
+    list_display = ['id', 'aggregate_type', 'event_type', 'aggregate_id', 'created_at']
+    list_filter = ['aggregate_type', 'event_type']
+    readonly_fields = ['aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at']
+
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for webhook subscribers.
+    """
+    list_display = ['name', 'url', 'is_active', 'last_event_id', 'last_delivered_at', 'failure_count']
+    list_filter = ['is_active']
+    readonly_fields = ['last_delivered_at', 'failure_count', 'last_error', 'created_at']
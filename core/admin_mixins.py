@@ -0,0 +1,138 @@
+import json
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+FILTER_CACHE_PREFIX = 'admin-filter'
+
+# Appended to a prefix to get the upper end of the range it covers
+_PREFIX_END = '\uffff'
+
+
+def estimate_count(queryset):
+    """
+    The planner's row estimate for a queryset (PostgreSQL), or None where
+    the database offers no estimate.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids COUNT(*) over large results: when the planner
+    expects at least ADMIN_EXACT_COUNT_LIMIT rows its estimate is used,
+    otherwise (or without an estimate) the rows are counted exactly.
+    """
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+def _cached_choices(key, compute):
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(compute())
+        cache.set(key, choices, settings.ADMIN_FILTER_CACHE_TIMEOUT)
+    return choices
+
+
+class CachedRelatedOnlyFieldListFilter(admin.RelatedOnlyFieldListFilter):
+    """
+    Offer only the related objects that occur in the table, and cache that
+    list for ADMIN_FILTER_CACHE_TIMEOUT instead of loading the whole
+    related table or scanning for it on every page.
+    """
+    def field_choices(self, field, request, model_admin):
+        key = f'{FILTER_CACHE_PREFIX}:{model_admin.opts.label_lower}:{self.field_path}'
+        return _cached_choices(key, lambda: super(CachedRelatedOnlyFieldListFilter, self).field_choices(
+            field, request, model_admin
+        ))
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """
+    AllValuesFieldListFilter whose SELECT DISTINCT is cached for
+    ADMIN_FILTER_CACHE_TIMEOUT.
+    """
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        key = f'{FILTER_CACHE_PREFIX}:{model_admin.opts.label_lower}:{field_path}'
+        self.lookup_choices = _cached_choices(key, lambda: self.lookup_choices)
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin for tables with millions of rows.
+
+    - Page counts come from the planner estimate (EstimatedCountPaginator)
+      and the unfiltered total is never counted.
+    - search_fields only accept "=field" (case-insensitive exact match) and
+      "^field" (case-insensitive prefix). Both compare UPPER(field), so an
+      index on Upper(field) serves them: exact as an equality, prefix as a
+      range scan re-checked with istartswith.
+    - changelist_deferred_fields are not loaded on the changelist.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    changelist_deferred_fields = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if self.changelist_deferred_fields and match and (match.url_name or '').endswith('_changelist'):
+            queryset = queryset.defer(*self.changelist_deferred_fields)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_fields or not search_term:
+            return queryset, False
+
+        aliases = {}
+        for index, field in enumerate(search_fields):
+            if field[0] not in '=^':
+                raise ValueError(f'{type(self).__name__}.search_fields: "{field}" must start with = or ^')
+            aliases[field] = f'_search_{index}'
+        queryset = queryset.alias(**{
+            alias: Upper(field[1:]) for field, alias in aliases.items()
+        })
+
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            term = bit.upper()
+            conditions = []
+            for field, alias in aliases.items():
+                if field[0] == '=':
+                    conditions.append(Q(**{alias: term}))
+                else:
+                    conditions.append(Q(**{
+                        f'{alias}__gte': term,
+                        f'{alias}__lt': term + _PREFIX_END,
+                        f'{field[1:]}__istartswith': bit,
+                    }))
+            queryset = queryset.filter(reduce(or_, conditions))
+
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, field[1:]) for field in search_fields)
+        return queryset, may_have_duplicates
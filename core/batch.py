@@ -0,0 +1,86 @@
+import json
+import logging
+from io import BytesIO
+from urllib.parse import urlsplit
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve
+
+ALLOWED_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'DELETE'}
+SAFE_METHODS = {'GET', 'HEAD'}
+
+logger = logging.getLogger(__name__)
+
+
+def build_subrequest(parent, method, path, body=None, headers=None):
+    """
+    Build a WSGI request for one batch item that reuses the parent's
+    already-authenticated user instead of decoding the JWT again.
+    """
+    url = urlsplit(path)
+    payload = b'' if body is None else json.dumps(body).encode()
+
+    environ = {
+        key: value for key, value in parent.META.items()
+        if not key.startswith('HTTP_') and key not in ('CONTENT_TYPE', 'CONTENT_LENGTH')
+    }
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': BytesIO(payload),
+        'HTTP_HOST': parent.META.get('HTTP_HOST', 'localhost'),
+    })
+    for name, value in (headers or {}).items():
+        if name.lower() != 'authorization':
+            environ['HTTP_' + name.upper().replace('-', '_')] = str(value)
+
+    request = WSGIRequest(environ)
+    # Read by DRF's Request: authenticators are replaced by forced authentication
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    return request
+
+
+def run_subrequest(parent, item, batch_view):
+    """
+    Dispatch one batch item to the view its path resolves to.
+    Returns a {'status', 'body'} dict.
+
+    Only REST framework views, which honour the parent's forced
+    authentication, and views marked auth_free (the reference endpoints)
+    are allowed; other plain Django views (admin, metrics) would see an
+    anonymous request. An item whose view raises gets a 500 of its own
+    instead of failing the whole batch.
+    """
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in ALLOWED_METHODS or not isinstance(path, str) or not path.startswith('/'):
+        return {'status': 400, 'body': {'error': 'Each request needs a method and an absolute path'}}
+
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return {'status': 404, 'body': {'error': f'No route for {path}'}}
+    if match.func is batch_view:
+        return {'status': 400, 'body': {'error': 'Batch requests cannot be nested'}}
+    if not hasattr(match.func, 'cls') and not getattr(match.func, 'auth_free', False):
+        return {'status': 400, 'body': {'error': f'{path} cannot be used in a batch'}}
+
+    request = build_subrequest(parent, method, path, item.get('body'), item.get('headers'))
+    request.resolver_match = match
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Batch item %s %s failed', method, path)
+        return {'status': 500, 'body': {'error': 'Internal server error'}}
+
+    content = response.content
+    if content and response.get('Content-Type', '').startswith('application/json'):
+        body = json.loads(content)
+    else:
+        body = content.decode('utf-8', errors='replace') or None
+    return {'status': response.status_code, 'body': body}
@@ -0,0 +1,103 @@
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a versioned row was changed by someone else since it was loaded.
+    """
+    def __init__(self, instance, expected):
+        self.instance = instance
+        self.expected = expected
+        super().__init__(
+            f'{type(instance).__name__} {instance.pk} is no longer at version {expected}'
+        )
+
+
+class VersionedModelMixin:
+    """
+    Optimistic concurrency for models with a `version` field.
+
+    Updates of a row loaded from the database are issued as a single
+    UPDATE ... WHERE id = %s AND version = %s that also increments the
+    version. If no row matches, VersionConflict is raised instead of
+    silently overwriting a concurrent change. Instances that were not
+    loaded from the database (or had `version` deferred) save as usual.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.expected_version = instance.__dict__.get('version')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.expected_version = self.__dict__.get('version')
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, 'expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+        version_field = self._meta.get_field('version')
+        values = [value for value in values if value[0] is not version_field]
+        values.append((version_field, None, expected + 1))
+        row = base_qs.filter(pk=pk_val)
+        if row.filter(version=expected)._update(values) == 0:
+            if row.exists():
+                raise VersionConflict(self, expected)
+            return False
+        self.version = self.expected_version = expected + 1
+        return True
+
+
+class ChangedFieldsUpdateMixin:
+    """
+    Serializer mixin that saves only the fields whose values changed,
+    plus updated_at, and skips the write entirely when nothing changed.
+    """
+    def update(self, instance, validated_data):
+        changed = [
+            name for name, value in validated_data.items()
+            if getattr(instance, name) != value
+        ]
+        if not changed:
+            return instance
+        for name in changed:
+            setattr(instance, name, validated_data[name])
+        instance.save(update_fields=changed + ['updated_at'])
+        return instance
+
+
+def version_etag(instance):
+    return f'"{instance.version}"'
+
+
+def check_if_match(request, instance):
+    """
+    Compare the request's If-Match header (an ETag from a previous
+    response) with the instance's version and return a 412 response when
+    it does not match. The save that follows is conditional on the same
+    version, so a change committed after this check is still caught.
+    """
+    header = request.headers.get('If-Match', '').strip()
+    if not header or header == '*':
+        return None
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in header.split(',')}
+    if str(instance.version) not in tags:
+        return precondition_failed(instance)
+    return None
+
+
+def precondition_failed(instance):
+    """
+    412 response telling the client to reload the record before retrying.
+    """
+    current = type(instance)._base_manager.filter(pk=instance.pk).values_list('version', flat=True).first()
+    response = Response({
+        'error': 'This record was modified by someone else. Reload it and retry.',
+        'current_version': current
+    }, status=status.HTTP_412_PRECONDITION_FAILED)
+    if current is not None:
+        response['ETag'] = f'"{current}"'
+    return response
@@ -0,0 +1,65 @@
+import base64
+import zlib
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Stored values starting with one of these markers are compressed
+# (base64 so they fit any text column); anything else is plain text.
+ZLIB_MARKER = '~z:'
+ZSTD_MARKER = '~s:'
+MARKERS = (ZLIB_MARKER, ZSTD_MARKER)
+
+
+def _codec():
+    codec = getattr(settings, 'COMPRESSED_TEXT_CODEC', 'zlib')
+    if codec == 'zstd' and zstandard is not None:
+        return codec
+    return 'zlib'
+
+
+def compress_text(value):
+    data = value.encode()
+    if _codec() == 'zstd':
+        return ZSTD_MARKER + base64.b64encode(zstandard.ZstdCompressor().compress(data)).decode('ascii')
+    return ZLIB_MARKER + base64.b64encode(zlib.compress(data, 6)).decode('ascii')
+
+
+def decompress_text(value):
+    data = base64.b64decode(value[len(ZLIB_MARKER):])
+    if value.startswith(ZSTD_MARKER):
+        if zstandard is None:
+            raise ImproperlyConfigured('zstandard is required to read zstd-compressed text')
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    return zlib.decompress(data).decode()
+
+
+class CompressedTextField(models.TextField):
+    """
+    TextField stored compressed once it reaches COMPRESSED_TEXT_MIN_LENGTH
+    characters, and only when that actually saves space. Reads decompress
+    transparently; existing plain-text rows stay readable as they are.
+    COMPRESSED_TEXT_CODEC selects 'zlib' (default) or 'zstd' (needs the
+    zstandard package). Compressed values cannot be searched in SQL.
+    """
+    def from_db_value(self, value, expression, connection):
+        if value is not None and value.startswith(MARKERS):
+            return decompress_text(value)
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return value
+        # Plain text that looks like a marker is always compressed so reads stay unambiguous
+        if value.startswith(MARKERS):
+            return compress_text(value)
+        if len(value) < getattr(settings, 'COMPRESSED_TEXT_MIN_LENGTH', 1024):
+            return value
+        compressed = compress_text(value)
+        return compressed if len(compressed) < len(value) else value
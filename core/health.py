@@ -0,0 +1,109 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from . import metrics
+
+_probe_lock = threading.Lock()
+_last_probe = None  # (monotonic time, checks)
+
+
+def check_database():
+    start = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            result = {'ok': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT count(*), current_setting('max_connections')::int "
+                    "FROM pg_stat_activity WHERE datname = current_database()"
+                )
+                used, limit = cursor.fetchone()
+                result.update(connections=used, max_connections=limit)
+    except DatabaseError as exc:
+        return {'ok': False, 'error': type(exc).__name__}
+    return result
+
+
+def check_migrations():
+    try:
+        executor = MigrationExecutor(connection)
+        pending = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    except DatabaseError as exc:
+        return {'ok': False, 'error': type(exc).__name__}
+    return {'ok': not pending, 'pending': len(pending)}
+
+
+def check_cache():
+    key = 'health:probe'
+    value = str(time.time())
+    try:
+        cache.set(key, value, timeout=60)
+        ok = cache.get(key) == value
+    except Exception as exc:
+        # Backend-specific errors (e.g. redis.ConnectionError)
+        return {'ok': False, 'error': type(exc).__name__}
+    return {'ok': ok}
+
+
+def dependency_checks():
+    """
+    Database, migration and cache checks, run at most once per
+    READINESS_PROBE_INTERVAL per process. While one thread probes, other
+    callers get the previous result instead of piling onto the database.
+    """
+    global _last_probe
+    last = _last_probe
+    if last is not None and time.monotonic() - last[0] < settings.READINESS_PROBE_INTERVAL:
+        return last[1]
+    if not _probe_lock.acquire(blocking=last is None):
+        return last[1]
+    try:
+        if _last_probe is not last:
+            # Another thread probed while we waited for the lock
+            return _last_probe[1]
+        checks = {'database': check_database()}
+        checks['migrations'] = check_migrations() if checks['database']['ok'] else {'ok': False}
+        checks['cache'] = check_cache()
+        _last_probe = (time.monotonic(), checks)
+        return checks
+    finally:
+        _probe_lock.release()
+
+
+def readiness():
+    """
+    Return (status, checks). status is 'ready', 'degraded' when the process
+    or the database connections are saturated, or 'unavailable' when a
+    dependency check fails.
+    """
+    checks = dict(dependency_checks())
+
+    # The readiness request itself is in flight too
+    in_flight = max(0, metrics.registry.get('http_requests_in_flight') - 1)
+    capacity = {'in_flight': in_flight, 'max_in_flight': settings.READINESS_MAX_IN_FLIGHT}
+    capacity['ok'] = not settings.READINESS_MAX_IN_FLIGHT or in_flight < settings.READINESS_MAX_IN_FLIGHT
+    database = checks['database']
+    if database.get('max_connections'):
+        usage = database['connections'] / database['max_connections']
+        capacity['db_connection_usage'] = round(usage, 3)
+        capacity['ok'] = capacity['ok'] and usage < settings.READINESS_MAX_DB_CONNECTION_USAGE
+    checks['capacity'] = capacity
+
+    if not all(checks[name]['ok'] for name in ('database', 'migrations', 'cache')):
+        return 'unavailable', checks
+    if not capacity['ok']:
+        return 'degraded', checks
+    return 'ready', checks
+
+
+def reset():
+    """
+    Forget the cached probe result (tests, or after a failover).
+    """
+    global _last_probe
+    _last_probe = None
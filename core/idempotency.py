@@ -0,0 +1,122 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def request_fingerprint(request):
+    """
+    Hash the parts of a request that must match for a key to be reused.
+    """
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request._request.body)
+    return digest.hexdigest()
+
+
+def _claim_key(user, key, request_hash):
+    """
+    Return the stored record for a key, or reserve the key for this request.
+    Returns (record, created). A replay costs a single indexed lookup.
+
+    A reservation whose request never finished (the worker died) is taken
+    over once it is older than IDEMPOTENCY_CLAIM_LEASE.
+    """
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None:
+        expired = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        abandoned = now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_LEASE)
+        if record.created_at < expired:
+            record.delete()
+        elif record.status_code is None and record.claimed_at < abandoned:
+            # Conditional on the old claim, so only one retry takes it over
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk, status_code=None, claimed_at=record.claimed_at
+            ).update(claimed_at=now, request_hash=request_hash)
+            if taken:
+                record.claimed_at = now
+                record.request_hash = request_hash
+                return record, True
+            return IdempotencyKey.objects.get(pk=record.pk), False
+        else:
+            return record, False
+
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, request_hash=request_hash, claimed_at=now
+            ), True
+    except IntegrityError:
+        # Another request claimed the key between the lookup and the insert
+        return IdempotencyKey.objects.get(user=user, key=key), False
+
+
+def _own_claim(record):
+    """
+    The record as long as this request still holds it; a request that
+    outlived its lease must not overwrite or release the new claim.
+    """
+    return IdempotencyKey.objects.filter(pk=record.pk, claimed_at=record.claimed_at, status_code=None)
+
+
+def idempotent(view_func):
+    """
+    Make a POST view safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs normally and its response is stored.
+    Retries with the same key and body get the stored response back without
+    running validation or writing to the database. Reusing a key with a
+    different body is rejected, and a retry while the first request is still
+    running gets 409 until its claim lease runs out. Place below @api_view/@permission_classes
+    so the user is already authenticated.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if request.method != 'POST' or not key:
+            return view_func(request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response({
+                'error': 'Idempotency-Key must be at most 255 characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = request_fingerprint(request)
+        record, created = _claim_key(request.user, key, request_hash)
+
+        if not created:
+            if record.request_hash != request_hash:
+                return Response({
+                    'error': 'Idempotency-Key was already used for a different request'
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status_code is None:
+                return Response({
+                    'error': 'A request with this Idempotency-Key is still in progress'
+                }, status=status.HTTP_409_CONFLICT)
+            response = Response(record.response_body, status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            _own_claim(record).delete()
+            raise
+
+        # Server errors are not stored so the client can retry them
+        if response.status_code >= 500 or not isinstance(response, Response):
+            _own_claim(record).delete()
+        else:
+            _own_claim(record).update(status_code=response.status_code, response_body=response.data)
+        return response
+
+    return wrapper
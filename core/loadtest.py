@@ -0,0 +1,291 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+
+# Scenario weights used when --mix is not given
+DEFAULT_MIX = {'login': 1, 'browse': 4, 'patients': 3, 'mappings': 2}
+
+
+class StepFailed(Exception):
+    """
+    A request in a scenario did not return the expected status; the rest
+    of the iteration depends on it and is skipped.
+    """
+
+
+class HTTPConnection:
+    """
+    Minimal HTTP/1.1 client on asyncio streams with keep-alive. Each
+    virtual user owns one, so the client side adds almost no overhead and
+    thousands of concurrent users fit in one process.
+    """
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: keep-alive',
+            f'Content-Length: {len(payload)}',
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+        # A reused connection may have been closed by the server while idle
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                status_line = await self.reader.readline()
+                if not status_line:
+                    raise ConnectionResetError('Connection closed by server')
+                return await self._read_response(status_line)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if not reused or attempt:
+                    raise
+        raise ConnectionResetError('Connection closed by server')
+
+    async def _read_response(self, status_line):
+        version, status = status_line.decode('latin-1').split()[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            body = await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        else:
+            body = await self.reader.read()
+            self.close()
+
+        connection = response_headers.get('connection', '').lower()
+        if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+            self.close()
+        return Response(int(status), response_headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+@dataclass
+class Response:
+    status: int
+    headers: dict
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body)
+
+
+@dataclass
+class ScenarioStats:
+    iterations: int = 0
+    failed_iterations: int = 0
+    errors: int = 0
+    latencies: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        requests = len(latencies) + self.statuses['exception']
+        return {
+            'iterations': self.iterations,
+            'failed_iterations': self.failed_iterations,
+            'requests': requests,
+            'throughput': round(requests / duration, 2) if duration else 0,
+            'errors': self.errors,
+            'error_rate': round(self.errors / requests, 4) if requests else 0,
+            'p50_ms': percentile(latencies, 50),
+            'p90_ms': percentile(latencies, 90),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+            'statuses': dict(self.statuses),
+        }
+
+
+def percentile(ordered, percent):
+    """
+    Nearest-rank percentile of a sorted list of seconds, in milliseconds.
+    """
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[rank] * 1000, 2)
+
+
+class VirtualUser:
+    """
+    One simulated client: an account from the user pool, its access token,
+    a patient it owns (for mapping assignment) and its own connection.
+    """
+    def __init__(self, index, account, connection, doctor_ids, stats):
+        self.index = index
+        self.username = account['username']
+        self.password = account['password']
+        self.token = account['token']
+        self.patient_id = account['patient_id']
+        self.connection = connection
+        self.doctor_ids = doctor_ids
+        self.stats = stats
+        self.scenario = None
+        self.sequence = 0
+
+    async def call(self, method, path, body=None, expect=(200,), headers=None, authenticated=True):
+        headers = dict(headers or {})
+        if authenticated:
+            headers['Authorization'] = f'Bearer {self.token}'
+        stats = self.stats[self.scenario]
+        start = time.perf_counter()
+        try:
+            response = await self.connection.request(method, path, body, headers)
+        except (OSError, asyncio.IncompleteReadError):
+            stats.statuses['exception'] += 1
+            stats.errors += 1
+            raise StepFailed(f'{method} {path}: connection error')
+        stats.latencies.append(time.perf_counter() - start)
+        stats.statuses[response.status] += 1
+        if response.status not in expect:
+            stats.errors += 1
+            raise StepFailed(f'{method} {path}: {response.status}')
+        return response
+
+    def patient_payload(self):
+        self.sequence += 1
+        return {
+            'first_name': f'Load{self.index}',
+            'last_name': f'Test{self.sequence}',
+            'email': f'lt-{uuid.uuid4().hex[:16]}@loadtest.example.com',
+            'phone': f'555-{self.index % 10000:04d}',
+            'date_of_birth': f'19{50 + self.sequence % 50}-0{1 + self.sequence % 9}-1{self.sequence % 10}',
+            'gender': 'MFO'[self.sequence % 3],
+            'address': '1 Load Street',
+            'city': 'Austin',
+            'state': 'TX',
+            'zip_code': '78701',
+            'blood_group': 'O+',
+        }
+
+
+async def login_scenario(user):
+    await user.call(
+        'POST', '/api/auth/login/', {'username': user.username, 'password': user.password},
+        authenticated=False,
+    )
+
+
+async def browse_scenario(user):
+    await user.call('GET', '/api/doctors/')
+    await user.call('GET', f'/api/doctors/{random.choice(user.doctor_ids)}/')
+    await user.call('GET', '/api/doctors/specializations/', authenticated=False)
+
+
+async def patients_scenario(user):
+    payload = user.patient_payload()
+    created = await user.call('POST', '/api/patients/', payload, expect=(201,))
+    patient = created.json()['patient']
+    path = f"/api/patients/{patient['id']}/"
+    await user.call('GET', path)
+    updated = await user.call(
+        'PUT', path, {'city': 'Dallas'}, headers={'If-Match': f'"{patient["version"]}"'}
+    )
+    await user.call('GET', '/api/patients/')
+    await user.call('DELETE', path, expect=(204,), headers={'If-Match': updated.headers['etag']})
+
+
+async def mappings_scenario(user):
+    created = await user.call(
+        'POST', '/api/mappings/',
+        {'patient': user.patient_id, 'doctor': random.choice(user.doctor_ids)},
+        expect=(201,),
+    )
+    mapping = created.json()['mapping']
+    await user.call('GET', f'/api/mappings/{user.patient_id}/')
+    await user.call('DELETE', f"/api/mappings/detail/{mapping['id']}/", expect=(204,))
+
+
+SCENARIOS = {
+    'login': login_scenario,
+    'browse': browse_scenario,
+    'patients': patients_scenario,
+    'mappings': mappings_scenario,
+}
+
+
+def parse_mix(value):
+    """
+    "login=1,browse=4" -> {'login': 1.0, 'browse': 4.0}
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario "{name}" (choose from {", ".join(SCENARIOS)})')
+        mix[name] = float(weight or 1)
+    if not mix or not any(mix.values()):
+        raise ValueError('The scenario mix is empty')
+    return mix
+
+
+async def run_load(host, port, accounts, doctor_ids, mix, concurrency, duration):
+    """
+    Run `concurrency` virtual users for `duration` seconds, each picking
+    scenarios at random by weight; accounts[i] is virtual user i's account.
+    Returns (per-scenario stats, elapsed seconds).
+    """
+    stats = {name: ScenarioStats() for name in mix}
+    names, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+
+    async def worker(user):
+        try:
+            while loop.time() < deadline:
+                user.scenario = random.choices(names, weights)[0]
+                try:
+                    await SCENARIOS[user.scenario](user)
+                except StepFailed:
+                    stats[user.scenario].failed_iterations += 1
+                else:
+                    stats[user.scenario].iterations += 1
+        finally:
+            user.connection.close()
+
+    users = [
+        VirtualUser(index, accounts[index], HTTPConnection(host, port), doctor_ids, stats)
+        for index in range(concurrency)
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(user) for user in users))
+    return stats, time.perf_counter() - start
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
+from core.models import OutboxEvent, WebhookSubscription
+from core.webhooks import deliver
+
+
+class Command(BaseCommand):
+    help = 'Deliver outbox events to registered webhook subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events per webhook request')
+        parser.add_argument('--max-batches', type=int, default=10, help='Batches per subscriber per round')
+        parser.add_argument('--concurrency', type=int, default=4, help='Subscribers delivered in parallel')
+        parser.add_argument('--retries', type=int, default=3, help='Retries per batch before giving up for the round')
+        parser.add_argument('--timeout', type=float, default=10, help='HTTP timeout in seconds')
+        parser.add_argument(
+            '--visibility-window',
+            type=float,
+            default=60,
+            help='Seconds to wait for an event whose id was skipped, in case its transaction commits late',
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep dispatching until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between rounds with --loop')
+        parser.add_argument(
+            '--retain-days',
+            type=int,
+            default=7,
+            help='Delete events older than this once every active subscriber has received them',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                delivered = self.dispatch_round(options)
+                if delivered:
+                    self.stdout.write(f'Delivered {delivered} event(s)')
+                self.prune(options['retain_days'])
+                if not options['loop']:
+                    break
+                if not delivered:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping dispatcher')
+
+    def dispatch_round(self, options):
+        subscription_ids = list(WebhookSubscription.objects.filter(is_active=True).values_list('id', flat=True))
+        if not subscription_ids:
+            return 0
+
+        def run(subscription_id):
+            try:
+                return deliver(
+                    subscription_id,
+                    batch_size=options['batch_size'],
+                    max_batches=options['max_batches'],
+                    retries=options['retries'],
+                    timeout=options['timeout'],
+                    visibility_window=options['visibility_window'],
+                )
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            return sum(executor.map(run, subscription_ids))
+
+    def prune(self, retain_days):
+        """
+        Remove old events that every active subscriber has already received.
+        """
+        lowest_cursor = WebhookSubscription.objects.filter(is_active=True).aggregate(
+            lowest=Min('last_event_id')
+        )['lowest']
+        events = OutboxEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=retain_days))
+        if lowest_cursor is not None:
+            events = events.filter(id__lte=lowest_cursor)
+        events.delete()
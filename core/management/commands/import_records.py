@@ -0,0 +1,304 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from rest_framework.validators import UniqueValidator
+from core.models import ImportCheckpoint
+from core.outbox import record_events
+from core.response_cache import DOCTORS_SCOPE, bump_generation, user_scope
+from doctors.availability import availability_index, minutes_to_time, parse_availability
+from doctors.models import Doctor, DoctorAvailability
+from doctors.recommendations import recommendation_index
+from doctors.serializers import DoctorCreateSerializer
+from patients.analytics import invalidate_for_user
+from patients.duplicates import patient_blocking_keys
+from patients.models import Patient, PatientBlockingKey, PatientCounter
+from patients.serializers import PatientCreateSerializer
+
+
+class ImportValidationMixin:
+    """
+    Runs a serializer's field rules without touching the database.
+    Uniqueness is checked by the command against an in-memory set instead,
+    so validation can run in worker processes.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+        return fields
+
+    def validate_email(self, value):
+        return value
+
+    def validate_license_number(self, value):
+        return value
+
+
+class PatientImportSerializer(ImportValidationMixin, PatientCreateSerializer):
+    pass
+
+
+class DoctorImportSerializer(ImportValidationMixin, DoctorCreateSerializer):
+    pass
+
+
+# Import target -> (model, validating serializer, fields that must be unique)
+IMPORT_TARGETS = {
+    'patients': (Patient, PatientImportSerializer, ['email']),
+    'doctors': (Doctor, DoctorImportSerializer, ['email', 'license_number']),
+}
+
+
+def validate_rows(target, rows):
+    """
+    Validate (row_number, data) pairs with the target's serializer rules.
+    Runs in a worker process, so it must not use the database.
+    """
+    serializer_class = IMPORT_TARGETS[target][1]
+    results = []
+    for row_number, data in rows:
+        serializer = serializer_class(data=data)
+        if serializer.is_valid():
+            results.append((row_number, data, dict(serializer.validated_data), None))
+        else:
+            results.append((row_number, data, None, json.loads(json.dumps(serializer.errors))))
+    return results
+
+
+def read_records(path, file_format):
+    """
+    Yield (row_number, data) for every record in a CSV or NDJSON file.
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            for row_number, row in enumerate(csv.DictReader(handle), start=1):
+                yield row_number, {key: value for key, value in row.items() if value != ''}
+        else:
+            row_number = 0
+            for line in handle:
+                if line.strip():
+                    row_number += 1
+                    yield row_number, json.loads(line)
+
+
+class Command(BaseCommand):
+    help = 'Bulk import patients or doctors from CSV/NDJSON with parallel validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=list(IMPORT_TARGETS), help='Type of records in the file')
+        parser.add_argument('path', help='CSV or NDJSON (.ndjson/.jsonl) file to import')
+        parser.add_argument(
+            '--created-by',
+            required=True,
+            help='Username recorded as the creator of every imported record',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows validated and loaded per transaction')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Validation processes (1 validates in-process)',
+        )
+        parser.add_argument('--checkpoint', help='Checkpoint name (default: <target>:<absolute path>)')
+        parser.add_argument('--rejects', help='Rejected rows report (default: <path>.rejects.csv)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        model, _, unique_fields = IMPORT_TARGETS[target]
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'File not found: {path}')
+        file_format = 'ndjson' if path.suffix in ('.ndjson', '.jsonl') else 'csv'
+
+        try:
+            user = User.objects.get(username=options['created_by'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['created_by']}' does not exist")
+
+        checkpoint_name = options['checkpoint'] or f'{target}:{path.resolve()}'
+        rejects_path = Path(options['rejects'] or f'{path}.rejects.csv')
+        if options['restart']:
+            ImportCheckpoint.objects.filter(name=checkpoint_name).delete()
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=checkpoint_name)
+        if checkpoint.rows_done:
+            self.stdout.write(f"Resuming after row {checkpoint.rows_done}")
+
+        # Seed uniqueness sets from the database once; rows loaded by an
+        # interrupted run are already in the table, so resuming stays correct.
+        seen = {
+            field: set(model.objects.values_list(field, flat=True).iterator(chunk_size=10000))
+            for field in unique_fields
+        }
+
+        records = islice(read_records(path, file_format), checkpoint.rows_done, None)
+        resuming = checkpoint.rows_done > 0 and rejects_path.exists()
+        if resuming:
+            self.truncate_rejects(rejects_path, checkpoint.rows_done)
+        workers = max(1, options['workers'])
+
+        # Workers never use the database; drop connections so forked
+        # children do not inherit open sockets.
+        connections.close_all()
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        try:
+            with open(rejects_path, 'a' if resuming else 'w', newline='', encoding='utf-8') as rejects_file:
+                rejects = csv.writer(rejects_file)
+                if not resuming:
+                    rejects.writerow(['row_number', 'errors', 'data'])
+
+                while True:
+                    chunk = list(islice(records, options['chunk_size']))
+                    if not chunk:
+                        break
+
+                    results = self.validate_chunk(target, chunk, executor, workers)
+                    valid = []
+                    for row_number, data, validated, errors in results:
+                        if errors is None:
+                            errors = self.check_unique(validated, unique_fields, seen)
+                        if errors is None:
+                            valid.append(validated)
+                        else:
+                            rejects.writerow([row_number, json.dumps(errors), json.dumps(data)])
+
+                    # Rejects are on disk before the chunk commits; a resume
+                    # drops those of chunks that never committed
+                    rejects_file.flush()
+                    os.fsync(rejects_file.fileno())
+
+                    checkpoint.rows_done += len(chunk)
+                    checkpoint.loaded += len(valid)
+                    checkpoint.rejected += len(chunk) - len(valid)
+                    self.load(model, valid, user, checkpoint)
+                    self.stdout.write(
+                        f"{checkpoint.rows_done} rows processed "
+                        f"({checkpoint.loaded} loaded, {checkpoint.rejected} rejected)"
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        checkpoint.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {checkpoint.loaded} {target}; {checkpoint.rejected} rejected (see {rejects_path})"
+        ))
+
+    def truncate_rejects(self, rejects_path, rows_done):
+        """
+        Keep only the rejects of rows up to the checkpoint; later ones
+        belong to a chunk that was not committed and will be validated again.
+        """
+        with open(rejects_path, newline='', encoding='utf-8') as handle:
+            rows = list(csv.reader(handle))
+        with open(rejects_path, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(rows[0] if rows else ['row_number', 'errors', 'data'])
+            writer.writerows(row for row in rows[1:] if int(row[0]) <= rows_done)
+
+    def validate_chunk(self, target, chunk, executor, workers):
+        if executor is None:
+            return validate_rows(target, chunk)
+        size = -(-len(chunk) // workers)
+        slices = [chunk[i:i + size] for i in range(0, len(chunk), size)]
+        results = []
+        for part in executor.map(validate_rows, [target] * len(slices), slices):
+            results.extend(part)
+        return results
+
+    def check_unique(self, validated, unique_fields, seen):
+        """
+        Reject rows that clash with the database or with earlier rows in the file.
+        """
+        errors = {}
+        for field in unique_fields:
+            if validated.get(field) in seen[field]:
+                errors[field] = [f'A record with this {field.replace("_", " ")} already exists.']
+        if errors:
+            return errors
+        for field in unique_fields:
+            seen[field].add(validated[field])
+        return None
+
+    def load(self, model, rows, user, checkpoint):
+        """
+        Insert one chunk and save the checkpoint in a single transaction:
+        COPY on PostgreSQL, bulk_create elsewhere. Denormalized counters are
+        adjusted by the chunk size, one outbox 'created' event is written per
+        row, patients are added to the duplicate-detection blocking index and
+        doctors get their parsed availability slots, as Doctor.save() would.
+        """
+        if not rows:
+            checkpoint.save()
+            return
+        now = timezone.now()
+        objects = [model(**row, created_by=user, created_at=now, updated_at=now) for row in rows]
+
+        with transaction.atomic():
+            checkpoint.save()
+            if connection.vendor == 'postgresql':
+                self.copy_into(model, objects)
+            else:
+                objects = model.objects.bulk_create(objects, batch_size=1000)
+            if any(obj.pk is None for obj in objects):
+                # COPY does not return ids; read the rows back by their unique email
+                objects = list(model.objects.filter(email__in=[obj.email for obj in objects]))
+            record_events(model._meta.model_name, objects, 'created')
+            if model is Patient:
+                PatientCounter.adjust(user.id, len(objects))
+                PatientBlockingKey.objects.bulk_create([
+                    PatientBlockingKey(patient_id=obj.pk, user_id=user.id, key=key)
+                    for obj in objects
+                    for key in patient_blocking_keys(obj)
+                ], batch_size=1000)
+            else:
+                DoctorAvailability.objects.bulk_create([
+                    DoctorAvailability(
+                        doctor_id=obj.pk,
+                        weekday=weekday,
+                        start_time=minutes_to_time(start),
+                        end_time=minutes_to_time(end),
+                    )
+                    for obj in objects
+                    for weekday, start, end in parse_availability(obj.availability)
+                ], batch_size=1000)
+
+        if model is Patient:
+            invalidate_for_user(user.id)
+            bump_generation(user_scope(user.id))
+        else:
+            bump_generation(DOCTORS_SCOPE)
+            # One rebuild per process beats replaying a change per imported doctor
+            availability_index.invalidate()
+            recommendation_index.invalidate()
+
+    def copy_into(self, model, objects):
+        """
+        Stream rows into PostgreSQL with COPY ... FROM STDIN.
+        """
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objects:
+            row = []
+            for field in fields:
+                value = field.get_db_prep_save(getattr(obj, field.attname), connection)
+                row.append(r'\N' if value is None else value)
+            writer.writerow(row)
+        buffer.seek(0)
+
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
@@ -0,0 +1,252 @@
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.loadtest import DEFAULT_MIX, parse_mix, run_load
+from doctors.models import Doctor
+from patients.models import Patient
+
+USER_PREFIX = 'loadtest-'
+PASSWORD = 'loadtest-password'
+
+# Environment variables that set RATE_LIMITS in a server subprocess
+RATE_LIMIT_ENV = (
+    'RATE_LIMIT_DEFAULT', 'RATE_LIMIT_REGISTER', 'RATE_LIMIT_LOGIN',
+    'RATE_LIMIT_PATIENT_LIST', 'RATE_LIMIT_DOCTOR_LIST', 'RATE_LIMIT_MAPPING_LIST',
+)
+UNLIMITED_RATE = '1000000/second:1000000'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a mixed workload (login, doctor directory browsing, patient CRUD, mapping '
+        'assignment) against the API and report throughput, latency percentiles and error '
+        'rates per scenario. Starts the app locally unless --url is given; server settings '
+        '(caches, DB_CONN_MAX_AGE, ...) come from the environment, as for a real deployment.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server',
+            choices=['wsgi', 'gunicorn', 'uvicorn'],
+            default='wsgi',
+            help='wsgi: threaded WSGI server in this process; gunicorn (WSGI) or uvicorn (ASGI) subprocess',
+        )
+        parser.add_argument('--url', help='Target an already running server instead (same database and SECRET_KEY)')
+        parser.add_argument('--workers', type=int, default=2, help='Server processes (gunicorn/uvicorn)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to generate load')
+        parser.add_argument('--users', type=int, default=5, help='Accounts in the user/token pool')
+        parser.add_argument('--doctors', type=int, default=20, help='Doctors in the directory')
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help='Scenario weights, e.g. "login=1,browse=4,patients=3,mappings=2"',
+        )
+        parser.add_argument('--keep-rate-limits', action='store_true', help='Leave RATE_LIMITS in force')
+        parser.add_argument('--keep-data', action='store_true', help='Keep the loadtest-* users and their data')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['concurrency'] < 1 or options['users'] < 1 or options['doctors'] < 1:
+            raise CommandError('--concurrency, --users and --doctors must be at least 1')
+
+        accounts, doctor_ids = self.prepare_data(options)
+        try:
+            with self.server(options) as (host, port):
+                stats, elapsed = asyncio.run(run_load(
+                    host, port, accounts, doctor_ids, mix, options['concurrency'], options['duration']
+                ))
+        finally:
+            if not options['keep_data']:
+                User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+        report = {name: scenario.summary(elapsed) for name, scenario in stats.items()}
+        if options['json']:
+            self.stdout.write(json.dumps({'elapsed': round(elapsed, 3), 'scenarios': report}, indent=2))
+        else:
+            self.print_report(report, elapsed)
+
+    def prepare_data(self, options):
+        """
+        Create (or reuse) the user pool, the doctor directory and one
+        patient per virtual user, and mint an access token per user.
+        """
+        password = make_password(PASSWORD)
+        users = []
+        for index in range(options['users']):
+            user, created = User.objects.get_or_create(
+                username=f'{USER_PREFIX}{index}',
+                defaults={'email': f'{USER_PREFIX}{index}@loadtest.example.com', 'password': password},
+            )
+            users.append(user)
+        tokens = {user.pk: str(RefreshToken.for_user(user).access_token) for user in users}
+
+        doctor_ids = []
+        for index in range(options['doctors']):
+            doctor, _ = Doctor.objects.get_or_create(
+                license_number=f'LOADTEST-{index}',
+                defaults={
+                    'first_name': f'Doctor{index}', 'last_name': 'Load',
+                    'email': f'doctor{index}@loadtest.example.com', 'phone': '555-0100',
+                    'specialization': 'cardiology', 'experience_years': index % 30,
+                    'qualification': 'MD', 'hospital_name': 'Load Hospital',
+                    'hospital_address': '1 Load Street', 'city': 'Austin', 'state': 'TX',
+                    'consultation_fee': 100, 'availability': 'Mon-Fri 9:00-17:00',
+                    'created_by': users[0],
+                },
+            )
+            doctor_ids.append(doctor.pk)
+
+        accounts = []
+        for index in range(options['concurrency']):
+            user = users[index % len(users)]
+            patient, _ = Patient.objects.get_or_create(
+                email=f'{USER_PREFIX}vu{index}@loadtest.example.com',
+                defaults={
+                    'first_name': f'Virtual{index}', 'last_name': 'User', 'phone': '555-0200',
+                    'date_of_birth': date(1980, 1, index % 28 + 1), 'gender': 'O',
+                    'address': '1 Load Street', 'city': 'Austin', 'state': 'TX',
+                    'zip_code': '78701', 'created_by': user,
+                },
+            )
+            accounts.append({
+                'username': user.username,
+                'password': PASSWORD,
+                'token': tokens[user.pk],
+                'patient_id': patient.pk,
+            })
+        return accounts, doctor_ids
+
+    @contextmanager
+    def server(self, options):
+        if options['url']:
+            url = urlsplit(options['url'])
+            yield url.hostname, url.port or 80
+        elif options['server'] == 'wsgi':
+            with self.wsgi_server(options) as address:
+                yield address
+        else:
+            with self.subprocess_server(options) as address:
+                yield address
+
+    @contextmanager
+    def wsgi_server(self, options):
+        """
+        Django's threaded WSGI server (as used by runserver) on a free port.
+        It shares this process, and its GIL, with the load generator.
+        """
+        limits = {} if not options['keep_rate_limits'] else settings.RATE_LIMITS
+        with override_settings(RATE_LIMITS=limits):
+            server = ThreadedWSGIServer(('127.0.0.1', free_port()), QuietRequestHandler)
+            server.daemon_threads = True
+            server.set_app(get_internal_wsgi_application())
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                yield server.server_address
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    @contextmanager
+    def subprocess_server(self, options):
+        name = options['server']
+        if importlib.util.find_spec(name) is None:
+            raise CommandError(f'{name} is not installed')
+        port = free_port()
+        if name == 'gunicorn':
+            command = [
+                sys.executable, '-m', 'gunicorn', 'healthcare_project.wsgi:application',
+                '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+                '--threads', str(options['threads']), '--log-level', 'warning',
+            ]
+        else:
+            command = [
+                sys.executable, '-m', 'uvicorn', 'healthcare_project.asgi:application',
+                '--host', '127.0.0.1', '--port', str(port), '--workers', str(options['workers']),
+                '--log-level', 'warning',
+            ]
+        env = dict(os.environ)
+        if not options['keep_rate_limits']:
+            env.update({variable: UNLIMITED_RATE for variable in RATE_LIMIT_ENV})
+
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            self.wait_until_ready(process, port)
+            yield '127.0.0.1', port
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def wait_until_ready(self, process, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'Server exited with status {process.returncode}')
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/healthz', timeout=1).close()
+                return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        raise CommandError(f'Server did not start within {timeout} seconds')
+
+    def print_report(self, report, elapsed):
+        self.stdout.write(
+            f"{'scenario':<10}{'iters':>7}{'fail':>6}{'requests':>10}{'req/s':>9}{'errors':>8}"
+            f"{'err %':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for name, row in report.items():
+            self.stdout.write(
+                f"{name:<10}{row['iterations']:>7}{row['failed_iterations']:>6}{row['requests']:>10}"
+                f"{row['throughput']:>9.1f}{row['errors']:>8}{row['error_rate'] * 100:>7.2f}"
+                + ''.join(
+                    f"{row[key] if row[key] is not None else '-':>9}"
+                    for key in ('p50_ms', 'p90_ms', 'p99_ms', 'max_ms')
+                )
+            )
+        requests = sum(row['requests'] for row in report.values())
+        errors = sum(row['errors'] for row in report.values())
+        self.stdout.write(
+            f'{requests} request(s) in {elapsed:.1f}s: {requests / elapsed:.1f} req/s, {errors} error(s)'
+        )
+        for name, row in report.items():
+            if row['errors']:
+                statuses = ', '.join(f'{status}: {count}' for status, count in row['statuses'].items())
+                self.stdout.write(f'  {name} statuses: {statuses}')
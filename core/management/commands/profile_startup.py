@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so every import is actually measured
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+phases = {}
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phases['settings'] = time.perf_counter() - start
+mark = time.perf_counter()
+django.setup()
+phases['django.setup'] = time.perf_counter() - mark
+mark = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+phases['middleware'] = time.perf_counter() - mark
+if sys.argv[1] == 'warmup':
+    from core.warmup import warmup
+    for name, seconds in warmup(connect=sys.argv[2] == 'connect').items():
+        phases['warmup: ' + name] = seconds
+phases['total'] = time.perf_counter() - start
+print(json.dumps(phases))
+'''
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Measure worker cold start: time per startup phase and per imported module (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help='Modules (or packages) listed')
+        parser.add_argument(
+            '--sort',
+            choices=['cumulative', 'self'],
+            default='cumulative',
+            help='cumulative includes the imports a module triggers; self is its own time',
+        )
+        parser.add_argument(
+            '--by-package',
+            action='store_true',
+            help='Sum self time per top-level package instead of listing modules',
+        )
+        parser.add_argument('--no-warmup', action='store_true', help='Skip core.warmup.warmup()')
+        parser.add_argument('--no-db', action='store_true', help='Do not open database connections in warmup')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'healthcare_project.settings'))
+        result = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT,
+                'none' if options['no_warmup'] else 'warmup',
+                'none' if options['no_db'] else 'connect',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = self.parse_imports(result.stderr)
+
+        self.stdout.write('Phase                          ms')
+        for name, seconds in phases.items():
+            self.stdout.write(f'{name:<26}{seconds * 1000:>8.1f}')
+
+        self.stdout.write('')
+        if options['by_package']:
+            totals = defaultdict(int)
+            for module, self_us, _, _ in imports:
+                totals[module.split('.')[0]] += self_us
+            rows = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:options['limit']]
+            self.stdout.write('Package                              self ms')
+            for package, self_us in rows:
+                self.stdout.write(f'{package:<36}{self_us / 1000:>8.1f}')
+        else:
+            index = 2 if options['sort'] == 'cumulative' else 1
+            rows = sorted(imports, key=lambda row: row[index], reverse=True)[:options['limit']]
+            self.stdout.write('Module                                            self ms   cumulative ms')
+            for module, self_us, cumulative_us, depth in rows:
+                self.stdout.write(f'{module:<48}{self_us / 1000:>9.1f}{cumulative_us / 1000:>16.1f}')
+
+        self.stdout.write(f'{len(imports)} module(s) imported')
+
+    def parse_imports(self, output):
+        """
+        (module, self us, cumulative us, nesting depth) per -X importtime line.
+        """
+        imports = []
+        for line in output.splitlines():
+            match = _IMPORT_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+        return imports
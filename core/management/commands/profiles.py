@@ -0,0 +1,78 @@
+import io
+import pstats
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from core.profiling import list_profiles, profile_path, prune
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls', 'filename', 'name')
+
+
+class Command(BaseCommand):
+    help = 'List, dump or clear the request profiles stored in PROFILE_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'dump', 'clear'])
+        parser.add_argument('profile_id', nargs='?', help='Profile to dump (default: the newest)')
+        parser.add_argument(
+            '--format',
+            choices=['stats', 'collapsed', 'pstats'],
+            default='stats',
+            help='stats: pstats report; collapsed: flamegraph stacks; pstats: raw file (needs --output)',
+        )
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative', help='pstats report order')
+        parser.add_argument('--limit', type=int, default=40, help='Functions shown in the pstats report')
+        parser.add_argument('--output', help='Write the dump to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'list':
+            self.list()
+        elif options['action'] == 'clear':
+            self.stdout.write(self.style.SUCCESS(f'Deleted {prune(0)} profile(s)'))
+        else:
+            self.dump(options)
+
+    def list(self):
+        profiles = list_profiles()
+        for profile in profiles:
+            created = datetime.fromtimestamp(profile['created_at'], timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self.stdout.write(
+                f"{profile['id']}  {created}  {profile['mode']:<8}  {profile['duration_ms']:>9.1f} ms  "
+                f"{profile['status']}  {profile['method']} {profile['view']}  {profile['path']}"
+            )
+        self.stdout.write(f'{len(profiles)} profile(s)')
+
+    def dump(self, options):
+        profile_id = options['profile_id']
+        if profile_id is None:
+            profiles = list_profiles()
+            if not profiles:
+                raise CommandError('No profiles stored')
+            profile_id = profiles[0]['id']
+
+        output_format = options['format']
+        extension = 'collapsed' if output_format == 'collapsed' else 'pstats'
+        path = profile_path(profile_id, extension)
+        if path is None:
+            if extension == 'pstats' and profile_path(profile_id, 'collapsed'):
+                raise CommandError(f'Profile {profile_id} was sampled; only --format collapsed is available')
+            raise CommandError(f'Profile {profile_id} does not exist')
+
+        if output_format == 'pstats':
+            if not options['output']:
+                raise CommandError('--format pstats writes a binary file and needs --output')
+            data = path.read_bytes()
+        elif output_format == 'collapsed':
+            data = path.read_text()
+        else:
+            report = io.StringIO()
+            stats = pstats.Stats(str(path), stream=report)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+            data = report.getvalue()
+
+        if options['output']:
+            mode = 'wb' if isinstance(data, bytes) else 'w'
+            with open(options['output'], mode) as handle:
+                handle.write(data)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {profile_id} to {options['output']}"))
+        else:
+            self.stdout.write(data, ending='')
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.purge import purge_mappings
+from doctors.models import Doctor
+from patients.models import Patient
+
+
+class Command(BaseCommand):
+    help = 'Permanently remove soft-deleted patients and doctors, deleting their mappings in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=0,
+            help='Only purge rows soft-deleted at least this many days ago',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Mappings deleted per transaction',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches to limit lock pressure',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        totals = {}
+        for model, parent in ((Patient, 'patient'), (Doctor, 'doctor')):
+            rows = mappings = 0
+            pending = model.objects.filter(is_deleted=True, deleted_at__lte=cutoff).values_list('pk', flat=True)
+            for pk in pending.iterator():
+                mappings += purge_mappings(parent, pk, options['batch_size'], options['sleep'])
+                with transaction.atomic():
+                    # Only small dependents (if any) are left to cascade here
+                    model.objects.filter(pk=pk, is_deleted=True).delete()
+                rows += 1
+            totals[model._meta.verbose_name_plural] = (rows, mappings)
+
+        for name, (rows, mappings) in totals.items():
+            self.stdout.write(f'{name}: purged {rows} row(s) and {mappings} mapping(s)')
+        self.stdout.write(self.style.SUCCESS('Purge complete'))
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import Task
+from core.queue import enqueue, make_executor, registry, run_once, task_stats
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the database queue on a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads')
+        parser.add_argument('--batch-size', type=int, default=100, help='Tasks claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the due tasks and exit')
+        parser.add_argument(
+            '--keep-done-days',
+            type=int,
+            default=7,
+            help='Delete completed tasks older than this many days',
+        )
+        parser.add_argument('--stats', action='store_true', help='Print queue statistics and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in task_stats().items():
+                self.stdout.write(f'{key}: {value}')
+            return
+
+        self.stdout.write(f"Worker started with {options['threads']} thread(s); tasks: {', '.join(sorted(registry))}")
+        executor = make_executor(options['threads'])
+        last_cleanup = None
+        try:
+            while True:
+                # Housekeeping runs first, so a --once run also drains the purge
+                if last_cleanup is None or time.monotonic() - last_cleanup > 3600:
+                    cutoff = timezone.now() - timedelta(days=options['keep_done_days'])
+                    Task.objects.filter(status='done', updated_at__lt=cutoff).delete()
+                    # Batched, so purges queued by several workers run as one DELETE
+                    enqueue('core.purge_idempotency_keys', on_commit=False)
+                    last_cleanup = time.monotonic()
+
+                processed = run_once(executor, options['batch_size'])
+                if processed:
+                    self.stdout.write(f'Processed {processed} task(s)')
+
+                if options['once'] and not processed:
+                    break
+                if not processed:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
+        finally:
+            executor.shutdown(wait=True)
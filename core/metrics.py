@@ -0,0 +1,193 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Every exported metric: name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by URL name, method and status code'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by URL name'),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled'),
+    'db_queries_total': ('counter', 'Database queries executed, by URL name'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in database queries, by URL name'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss)'),
+    'auth_failures_total': ('counter', 'Rejected requests by reason (unauthenticated, forbidden, login_failed)'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_FILE_PREFIX = 'metrics-'
+
+
+class Registry:
+    """
+    In-process metric values. Updates are a dict lookup and an addition
+    under a lock, so instrumenting every request and query stays cheap.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        # Non-cumulative bucket counts (the last one is +Inf), then the sum
+        index = bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def get(self, name, **labels):
+        with self._lock:
+            return self._values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'values': [[name, list(labels), value] for (name, labels), value in self._values.items()],
+                'histograms': [[name, list(labels), list(h)] for (name, labels), h in self._histograms.items()],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._histograms.clear()
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+
+_last_flush = 0.0
+
+
+def _directory():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def flush(force=False):
+    """
+    Write this process's snapshot to METRICS_MULTIPROC_DIR so whichever
+    gunicorn worker serves /metrics can report every worker. Writes happen
+    at most once per METRICS_FLUSH_INTERVAL unless forced, and replace the
+    file atomically so readers never see a partial snapshot.
+    """
+    global _last_flush
+    directory = _directory()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    path = os.path.join(directory, f'{_FILE_PREFIX}{os.getpid()}.json')
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(registry.snapshot(), handle)
+    os.replace(temporary, path)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshots():
+    """
+    Snapshots of every process as (snapshot, alive) pairs.
+    """
+    directory = _directory()
+    if not directory:
+        return [(registry.snapshot(), True)]
+    flush(force=True)
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, f'{_FILE_PREFIX}*.json')):
+        try:
+            pid = int(os.path.basename(path)[len(_FILE_PREFIX):-len('.json')])
+            with open(path) as handle:
+                snapshots.append((json.load(handle), _process_alive(pid)))
+        except (OSError, ValueError):
+            # Being replaced or not one of ours
+            continue
+    return snapshots
+
+
+def collect():
+    """
+    Merge the snapshots of all processes. Counters and histograms of exited
+    workers are kept so totals never go backwards; gauges only count live ones.
+    """
+    values, histograms = {}, {}
+    for snapshot, alive in _snapshots():
+        for name, labels, value in snapshot['values']:
+            if METRICS[name][0] == 'gauge' and not alive:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            values[key] = values.get(key, 0) + value
+        for name, labels, buckets in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.setdefault(key, [0] * len(buckets))
+            for index, value in enumerate(buckets):
+                merged[index] += value
+    return values, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    values, histograms = collect()
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), buckets in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), buckets[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels((*labels, ("le", bound)))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(buckets[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        else:
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
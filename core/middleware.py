@@ -0,0 +1,151 @@
+import time
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from . import metrics, profiling
+from .throttling import TokenBucketThrottle
+
+
+class RateLimitMiddleware:
+    """
+    Apply TokenBucketThrottle before REST framework authenticates and add the
+    RateLimit-Limit/Remaining/Reset headers it records.
+
+    A throttled client with a valid token is answered with a 429 here,
+    without the user lookup DRF's authentication would make first. Requests
+    whose client cannot be told without the database are left to the
+    throttle inside the view.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            response['RateLimit-Limit'] = str(rate_limit['limit'])
+            response['RateLimit-Remaining'] = str(rate_limit['remaining'])
+            response['RateLimit-Reset'] = str(rate_limit['reset'])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            return None
+        throttle_class = next(
+            (cls for cls in view_class.throttle_classes if issubclass(cls, TokenBucketThrottle)), None
+        )
+        if throttle_class is None:
+            return None
+
+        throttle = throttle_class()
+        client_key = throttle.get_early_client_key(request)
+        if client_key is None:
+            return None
+        view = view_class(**getattr(view_func, 'view_initkwargs', {}))
+        if throttle.take(request, throttle.get_scope(view), client_key):
+            return None
+
+        throttled = Throttled(throttle.wait())
+        response = JsonResponse({'detail': str(throttled.detail)}, status=throttled.status_code)
+        if throttled.wait:
+            response['Retry-After'] = '%d' % throttled.wait
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record request counts, latency, in-flight requests, database queries
+    and authentication failures per URL name (see core.metrics).
+    Install first in MIDDLEWARE so the timing covers the whole stack.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = {'count': 0, 'time': 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries['count'] += 1
+                queries['time'] += time.perf_counter() - start
+
+        metrics.inc('http_requests_in_flight')
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                response = self.get_response(request)
+        finally:
+            metrics.inc('http_requests_in_flight', -1)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        metrics.inc('http_requests_total', view=view, method=request.method, status=str(response.status_code))
+        metrics.observe('http_request_duration_seconds', duration, view=view)
+        if queries['count']:
+            metrics.inc('db_queries_total', queries['count'], view=view)
+            metrics.inc('db_query_duration_seconds_total', queries['time'], view=view)
+
+        if view == 'login' and response.status_code in (400, 401):
+            metrics.inc('auth_failures_total', reason='login_failed')
+        elif response.status_code == 401:
+            metrics.inc('auth_failures_total', reason='unauthenticated')
+        elif response.status_code == 403:
+            metrics.inc('auth_failures_total', reason='forbidden')
+
+        metrics.flush()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a view on demand (see core.profiling).
+
+    Staff users send "X-Profile: cprofile" (or "sample") to profile one
+    request; the response carries X-Profile-Id. Views listed in
+    PROFILE_SAMPLE_RATES are also profiled for that fraction of requests
+    with the low-overhead stack sampler. Install after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        mode = self.requested_mode(request)
+        if mode is None and profiling.should_sample(request, view_func):
+            mode = 'sample'
+        if mode is None:
+            return None
+
+        response, profile_id = profiling.profile_view(mode, view_func, request, *view_args, **view_kwargs)
+        if 'HTTP_X_PROFILE' in request.META:
+            response['X-Profile-Id'] = profile_id
+        return response
+
+    def requested_mode(self, request):
+        """
+        The X-Profile mode, if the header is present and sent by a staff user.
+        API clients authenticate with JWT, which DRF only checks inside the
+        view, so the token is verified here.
+        """
+        mode = request.META.get('HTTP_X_PROFILE', '').strip().lower()
+        if not mode:
+            return None
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            try:
+                authenticated = JWTAuthentication().authenticate(request)
+            except (AuthenticationFailed, InvalidToken):
+                return None
+            user = authenticated[0] if authenticated else None
+        if user is None or not user.is_staff:
+            return None
+        return mode if mode in profiling.MODES else 'cprofile'
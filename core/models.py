@@ -0,0 +1,143 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a POST sent with an Idempotency-Key header.
+    A retry with the same key replays the stored response instead of
+    running the view again.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    
+    # Empty until the original request has finished
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # When the running request took the key; an unfinished claim older than
+    # IDEMPOTENCY_CLAIM_LEASE is treated as abandoned and can be taken over
+    claimed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['user', 'key']
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user} - {self.key} ({self.status_code or 'in progress'})"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an import_records run. Saved in the same transaction as
+    each loaded chunk, so a resumed run starts exactly after the last
+    committed chunk.
+    """
+    name = models.CharField(max_length=500, unique=True)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    loaded = models.PositiveBigIntegerField(default=0)
+    rejected = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.rows_done} rows done)"
+
+
+class Task(models.Model):
+    """
+    A unit of background work stored in the database and executed by run_worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Retry bookkeeping
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    
+    # Set while a worker owns the task; claimed_at is renewed while it runs
+    claim_token = models.CharField(max_length=64, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['name', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class OutboxEvent(models.Model):
+    """
+    A change to a patient, doctor or mapping, written in the same transaction
+    as the change itself and delivered to webhook subscribers later.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+        ('archived', 'Archived'),
+    ]
+
+    aggregate_type = models.CharField(max_length=30)
+    aggregate_id = models.BigIntegerField()
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['aggregate_type', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.aggregate_type}.{self.event_type} #{self.aggregate_id}"
+
+
+class WebhookSubscription(models.Model):
+    """
+    A downstream consumer of outbox events with its own delivery cursor.
+    """
+    name = models.CharField(max_length=100)
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=255, blank=True, help_text="Used to sign deliveries (HMAC-SHA256)")
+    aggregate_types = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Event sources to deliver, e.g. [\"patient\", \"mapping\"]; empty means all"
+    )
+    
+    # Delivery cursor: id of the last event acknowledged by the subscriber
+    last_event_id = models.BigIntegerField(default=0)
+    last_delivered_at = models.DateTimeField(blank=True, null=True)
+    failure_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.url})"
@@ -0,0 +1,42 @@
+from .models import OutboxEvent
+
+
+def serialize_instance(instance):
+    """
+    Flatten a model instance's concrete fields into a JSON-friendly dict,
+    limited to the model's OUTBOX_FIELDS when it declares them.
+    """
+    allowed = getattr(instance, 'OUTBOX_FIELDS', None)
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__ and (allowed is None or field.attname in allowed)
+    }
+
+
+def record_event(aggregate_type, instance, event_type):
+    """
+    Write an outbox event for a change. Must be called inside the same
+    transaction as the change so the event exists if and only if the change does.
+    """
+    return OutboxEvent.objects.create(
+        aggregate_type=aggregate_type,
+        aggregate_id=instance.pk,
+        event_type=event_type,
+        payload=serialize_instance(instance),
+    )
+
+
+def record_events(aggregate_type, instances, event_type):
+    """
+    Bulk version of record_event for bulk loads.
+    """
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            aggregate_type=aggregate_type,
+            aggregate_id=instance.pk,
+            event_type=event_type,
+            payload=serialize_instance(instance),
+        )
+        for instance in instances
+    ], batch_size=1000)
@@ -0,0 +1,191 @@
+import cProfile
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+
+# Values accepted in the X-Profile request header
+MODES = ('cprofile', 'sample')
+
+_sequence = itertools.count()
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread records the stack of one
+    thread every `interval` seconds. Its cost does not grow with the number
+    of function calls, so it is cheap enough for sampled production traffic.
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                name = getattr(code, 'co_qualname', code.co_name)
+                frames.append(f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if frames:
+                self.stacks[';'.join(reversed(frames))] += 1
+
+    def collapsed(self):
+        """
+        Stacks in the collapsed format read by flamegraph.pl and speedscope:
+        "outer;inner;leaf <samples>" per line.
+        """
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+
+def sample_rate(request, view_func):
+    """
+    PROFILE_SAMPLE_RATES entry for the view, keyed by URL name
+    ('mapping-list-create') or view function name ('mapping_list_create').
+    """
+    rates = settings.PROFILE_SAMPLE_RATES
+    if not rates:
+        return 0.0
+    match = request.resolver_match
+    function = getattr(getattr(view_func, 'cls', None), '__name__', None) or view_func.__name__
+    return rates.get(match.url_name if match else None, rates.get(function, 0.0))
+
+
+def should_sample(request, view_func):
+    rate = sample_rate(request, view_func)
+    return rate > 0 and random.random() < rate
+
+
+def profile_view(mode, view_func, request, *args, **kwargs):
+    """
+    Run and render the view under the profiler and store the result.
+    'cprofile' records every call (pstats) and also samples stacks for the
+    flamegraph; 'sample' only samples stacks. Returns (response, profile_id).
+    """
+    sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+
+    def run():
+        response = view_func(request, *args, **kwargs)
+        render = getattr(response, 'render', None)
+        return render() if callable(render) else response
+
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        response = profiler.runcall(run) if profiler is not None else run()
+    finally:
+        duration = time.perf_counter() - start
+        sampler.stop()
+
+    match = request.resolver_match
+    user = getattr(request, 'user', None)
+    profile_id = save_profile(
+        {
+            'view': match.url_name if match else None,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'mode': mode,
+            'user': user.get_username() if user is not None and user.is_authenticated else None,
+            'created_at': time.time(),
+            'samples': sum(sampler.stacks.values()),
+        },
+        profiler=profiler,
+        collapsed=sampler.collapsed(),
+    )
+    return response, profile_id
+
+
+def _directory():
+    return Path(settings.PROFILE_DIR)
+
+
+def _write(path, data):
+    temporary = path.with_name(path.name + '.tmp')
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def save_profile(meta, profiler=None, collapsed=''):
+    """
+    Store one profile in the PROFILE_DIR ring buffer and drop the oldest
+    ones beyond PROFILE_MAX_ENTRIES. The .json metadata is written last,
+    so a profile is only listed once all of its files exist.
+    """
+    directory = _directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f'{time.time_ns():020d}-{os.getpid()}-{next(_sequence)}'
+    if profiler is not None:
+        profiler.dump_stats(str(directory / f'{profile_id}.pstats'))
+    _write(directory / f'{profile_id}.collapsed', collapsed.encode())
+    _write(directory / f'{profile_id}.json', json.dumps(dict(meta, id=profile_id)).encode())
+    prune(settings.PROFILE_MAX_ENTRIES)
+    return profile_id
+
+
+def list_profiles():
+    """
+    Metadata of the stored profiles, newest first.
+    """
+    directory = _directory()
+    profiles = []
+    for path in sorted(directory.glob('*.json'), reverse=True) if directory.is_dir() else []:
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Pruned by another process meanwhile
+            continue
+    return profiles
+
+
+def profile_path(profile_id, extension):
+    """
+    Path of one of a profile's files, or None if it does not exist.
+    """
+    if '/' in profile_id or profile_id.startswith('.'):
+        return None
+    path = _directory() / f'{profile_id}.{extension}'
+    return path if path.exists() else None
+
+
+def delete_profile(profile_id):
+    # Metadata first, so a half-deleted profile is never listed
+    for extension in ('json', 'pstats', 'collapsed'):
+        try:
+            (_directory() / f'{profile_id}.{extension}').unlink()
+        except FileNotFoundError:
+            pass
+
+
+def prune(keep):
+    """
+    Delete all but the newest `keep` profiles.
+    """
+    directory = _directory()
+    if not directory.is_dir():
+        return 0
+    profile_ids = sorted(path.stem for path in directory.glob('*.json'))
+    stale = profile_ids[:max(len(profile_ids) - keep, 0)]
+    for profile_id in stale:
+        delete_profile(profile_id)
+    return len(stale)
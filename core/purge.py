@@ -0,0 +1,35 @@
+import time
+from django.db import transaction
+from mappings.models import ArchivedMapping, PatientDoctorMapping
+
+# Soft-deletable parent -> mapping column pointing at it
+PURGE_RELATIONS = {
+    'patient': 'patient_id',
+    'doctor': 'doctor_id',
+}
+
+
+def purge_mappings(parent, pk, batch_size=500, pause=0):
+    """
+    Delete the mappings (hot and archived) of a soft-deleted patient or
+    doctor a batch at a time, so no single transaction holds locks on a
+    large number of rows.
+    Returns the number of mappings deleted.
+    """
+    relation = PURGE_RELATIONS[parent]
+    deleted = 0
+    for model in (PatientDoctorMapping, ArchivedMapping):
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    model.objects.filter(**{relation: pk})
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                # Goes through the collector so counter signals still fire
+                model.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            if pause:
+                time.sleep(pause)
+    return deleted
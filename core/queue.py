@@ -0,0 +1,233 @@
+import logging
+import traceback
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Task name -> TaskDefinition
+registry = {}
+
+# Seconds without a heartbeat after which a running task is presumed
+# abandoned, and how often a worker renews the claims of tasks it is running
+STALE_AFTER = 600
+HEARTBEAT_INTERVAL = 60
+
+
+class TaskDefinition:
+    def __init__(self, name, func, batch, max_attempts, backoff):
+        self.name = name
+        self.func = func
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def retry_delay(self, attempts):
+        """
+        Exponential backoff: backoff, 2*backoff, 4*backoff... capped at one hour.
+        """
+        return min(self.backoff * 2 ** (attempts - 1), 3600)
+
+
+def task(name, batch=False, max_attempts=5, backoff=5):
+    """
+    Register a function as a background task.
+
+    With batch=True the function receives a list of payloads, so every
+    pending task of that name claimed together is handled in one call.
+    Otherwise it receives a single payload dict.
+    """
+    def decorator(func):
+        registry[name] = TaskDefinition(name, func, batch, max_attempts, backoff)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, on_commit=True):
+    """
+    Queue a task for the worker.
+
+    By default the row is written only after the current transaction commits,
+    so a rolled-back request never leaves work behind. With on_commit=False
+    the row is written immediately, inside the caller's transaction.
+    """
+    if name not in registry:
+        raise KeyError(f"Unknown task '{name}'")
+
+    def create():
+        Task.objects.create(
+            name=name,
+            payload=payload or {},
+            max_attempts=registry[name].max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+    if on_commit:
+        transaction.on_commit(create)
+    else:
+        create()
+
+
+def claim_tasks(limit, stale_after=STALE_AFTER):
+    """
+    Claim up to limit due tasks for this worker.
+
+    Claims are made with a conditional UPDATE on status, so concurrent
+    workers never run the same task. A worker renews its claims while the
+    tasks run (see wait_renewing), so only tasks of a crashed worker go
+    stale_after seconds without a heartbeat and become claimable again.
+    """
+    now = timezone.now()
+    Task.objects.filter(
+        status='running', claimed_at__lt=now - timedelta(seconds=stale_after)
+    ).update(status='pending', claim_token=None)
+
+    due = list(
+        Task.objects.filter(status='pending', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not due:
+        return []
+
+    token = uuid.uuid4().hex
+    Task.objects.filter(pk__in=due, status='pending').update(
+        status='running', claim_token=token, claimed_at=now
+    )
+    return list(Task.objects.filter(claim_token=token, status='running'))
+
+
+def renew_claims(token):
+    """
+    Heartbeat: push back the staleness deadline of tasks still running under a claim.
+    """
+    return Task.objects.filter(claim_token=token, status='running').update(claimed_at=timezone.now())
+
+
+def wait_renewing(futures, token, interval=HEARTBEAT_INTERVAL):
+    """
+    Wait for the futures, renewing the claim every interval seconds until
+    they are all done, so long-running tasks are never reclaimed.
+    """
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=interval)
+        for future in done:
+            future.result()
+        if pending:
+            renew_claims(token)
+
+
+def _finish(tasks, error=None):
+    """
+    Mark tasks done, or schedule a retry / mark them failed after an error.
+
+    Only tasks still held under the claim they were run with are updated:
+    if a task was reclaimed after all, the new owner's outcome wins.
+    """
+    now = timezone.now()
+    if error is None:
+        finished = Task.objects.filter(
+            pk__in=[t.pk for t in tasks], claim_token=tasks[0].claim_token
+        ).update(status='done', claim_token=None, last_error=None, updated_at=now)
+        if finished < len(tasks):
+            logger.warning('%d task(s) were reclaimed before finishing', len(tasks) - finished)
+        return
+
+    for t in tasks:
+        definition = registry.get(t.name)
+        attempts = t.attempts + 1
+        if definition is None or attempts >= t.max_attempts:
+            changes = {'status': 'failed'}
+        else:
+            changes = {
+                'status': 'pending',
+                'run_after': now + timedelta(seconds=definition.retry_delay(attempts)),
+            }
+        if not Task.objects.filter(pk=t.pk, claim_token=t.claim_token).update(
+            attempts=attempts, last_error=error, claim_token=None, updated_at=now, **changes
+        ):
+            logger.warning('Task %s was reclaimed before it failed', t)
+
+
+def execute(tasks):
+    """
+    Run a group of tasks that share a name (one call for batch tasks).
+    """
+    definition = registry.get(tasks[0].name)
+    try:
+        if definition is None:
+            raise KeyError(f"Unknown task '{tasks[0].name}'")
+        if definition.batch:
+            definition.func([t.payload for t in tasks])
+        else:
+            for t in tasks:
+                try:
+                    definition.func(t.payload)
+                except Exception:
+                    logger.exception('Task %s failed', t)
+                    _finish([t], traceback.format_exc())
+                else:
+                    _finish([t])
+            return
+    except Exception:
+        logger.exception('Task batch %s failed', tasks[0].name)
+        _finish(tasks, traceback.format_exc())
+    else:
+        _finish(tasks)
+    finally:
+        close_old_connections()
+
+
+def run_once(executor, limit=100):
+    """
+    Claim due tasks, run them on the thread pool grouped by name, and wait
+    while renewing their claim. Returns the number of tasks processed.
+    """
+    tasks = claim_tasks(limit)
+    if not tasks:
+        return 0
+    groups = defaultdict(list)
+    for t in tasks:
+        groups[t.name].append(t)
+
+    jobs = []
+    for name, group in groups.items():
+        definition = registry.get(name)
+        if definition is not None and definition.batch:
+            jobs.append(group)
+        else:
+            jobs.extend([t] for t in group)
+
+    wait_renewing([executor.submit(execute, job) for job in jobs], tasks[0].claim_token)
+    return len(tasks)
+
+
+def task_stats():
+    """
+    Queue depth per status and task name, plus the age of the oldest due task.
+    """
+    by_status = dict(Task.objects.values_list('status').annotate(total=Count('id')).order_by())
+    by_name = defaultdict(dict)
+    for name, task_status, total in Task.objects.values_list('name', 'status').annotate(total=Count('id')).order_by():
+        by_name[name][task_status] = total
+
+    oldest = Task.objects.filter(status='pending', run_after__lte=timezone.now()).aggregate(
+        oldest=Min('run_after')
+    )['oldest']
+    return {
+        'by_status': {key: by_status.get(key, 0) for key, _ in Task.STATUS_CHOICES},
+        'by_name': dict(by_name),
+        'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0,
+        'registered': sorted(registry),
+    }
+
+
+def make_executor(threads):
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix='task-worker')
@@ -0,0 +1,54 @@
+import hashlib
+import json
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+
+def choices_list(choices):
+    return [{'value': value, 'label': label} for value, label in choices]
+
+
+class ReferenceDocument:
+    """
+    Static reference data encoded once into JSON bytes with a content hash.
+
+    Requests carrying ?v=<version> matching the current hash get an
+    immutable, year-long cacheable response; other requests get the same
+    bytes with an ETag to revalidate cheaply (304 when unchanged).
+    """
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+        self.version = hashlib.sha256(self.body).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+
+    def respond(self, request):
+        if self.etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = self.etag
+        response['Reference-Version'] = self.version
+        if request.GET.get('v') == self.version:
+            response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+def reference_view(document, doc=None):
+    """
+    Build a public GET/HEAD view serving a ReferenceDocument.
+    It needs no authentication and does no database work.
+    """
+    @require_safe
+    def view(request):
+        return document.respond(request)
+    view.__doc__ = doc
+    # Needs no user, so core.batch may run it as a plain Django view
+    view.auth_free = True
+    return view
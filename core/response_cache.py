@@ -0,0 +1,101 @@
+import hashlib
+import random
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from . import metrics
+
+CACHE_PREFIX = 'response-cache'
+
+# Generation scope shared by every list that embeds doctor details
+DOCTORS_SCOPE = 'doctors'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def _generation_key(scope):
+    return f'{CACHE_PREFIX}:gen:{scope}'
+
+
+def _new_epoch():
+    """
+    Starting value for a generation counter that is missing from the cache.
+    Lost generations restart at a random value so entries cached under an
+    earlier generation can never become valid again.
+    """
+    return random.getrandbits(48)
+
+
+def bump_generation(scope):
+    """
+    Invalidate every cached response that depends on a scope in O(1).
+    Generations live in the default cache so all processes see the bump.
+    """
+    key = _generation_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_epoch(), timeout=None)
+
+
+def schedule_bump(scope):
+    transaction.on_commit(lambda: bump_generation(scope))
+
+
+def get_generations(scopes):
+    """
+    Return the current generation of each scope with one cache round trip.
+    """
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_epoch(), timeout=None)
+            found[key] = cache.get(key)
+        generations.append(found[key])
+    return generations
+
+
+def cache_response(namespace, depends=()):
+    """
+    Cache a view's GET responses per user.
+
+    The key combines the user's generation, the generation of each scope in
+    `depends` and the query string, so a write bumps one counter instead of
+    deleting keys. Hits return the stored JSON bytes without touching the
+    database. Bodies are kept in the RESPONSE_CACHE_ALIAS cache, which is
+    bounded by MAX_ENTRIES and evicts least recently used entries.
+    Place below @api_view/@permission_classes so the user is authenticated.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.accepted_renderer.format != 'json':
+                return view_func(request, *args, **kwargs)
+
+            scopes = [user_scope(request.user.pk), *depends]
+            generations = get_generations(scopes)
+            query = hashlib.sha1(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+            key = ':'.join([
+                CACHE_PREFIX, namespace, str(request.user.pk),
+                *(str(generation) for generation in generations), query
+            ])
+            responses = caches[settings.RESPONSE_CACHE_ALIAS]
+
+            body = responses.get(key)
+            metrics.inc('cache_requests_total', cache='responses', result='miss' if body is None else 'hit')
+            if body is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                body = JSONRenderer().render(response.data)
+                responses.set(key, body, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+            return HttpResponse(body, content_type='application/json')
+        return wrapper
+    return decorator
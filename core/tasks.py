@@ -0,0 +1,25 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import IdempotencyKey
+from .purge import purge_mappings
+from .queue import task
+
+
+@task('core.purge_idempotency_keys', batch=True, max_attempts=3)
+def purge_idempotency_keys(payloads):
+    """
+    Delete stored idempotent responses older than IDEMPOTENCY_KEY_TTL.
+    Batched, so any number of queued purges collapse into one DELETE.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+
+
+@task('core.purge_mappings')
+def purge_soft_deleted_mappings(payload):
+    """
+    Remove a soft-deleted patient's or doctor's mappings in the background,
+    so the doctor load counters drop without cascading inside the request.
+    """
+    purge_mappings(payload['parent'], payload['id'])
@@ -0,0 +1,138 @@
+import re
+from collections import Counter
+from datetime import date
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+from doctors.models import Doctor
+from mappings.models import PatientDoctorMapping
+from patients.models import Patient
+from .throttling import TokenBucketThrottle
+
+# Row counts every query-count test is parametrized over
+ROW_COUNTS = (1, 10, 100)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def normalize_sql(sql):
+    """
+    Replace literals so the same statement issued for different rows
+    compares equal.
+    """
+    return _LITERALS.sub('?', sql)
+
+
+def make_patient(user, index, **fields):
+    values = {
+        'first_name': f'Patient{index}',
+        'last_name': 'Test',
+        'email': f'patient{index}.{user.pk}@example.com',
+        'phone': '555-0100',
+        'date_of_birth': date(1980, 1, index % 28 + 1),
+        'gender': 'MFO'[index % 3],
+        'address': '1 Main Street',
+        'city': 'Austin',
+        'state': 'TX',
+        'zip_code': '78701',
+        'blood_group': 'A+',
+    }
+    values.update(fields)
+    return Patient.objects.create(created_by=user, **values)
+
+
+def make_doctor(user, index, **fields):
+    values = {
+        'first_name': f'Doctor{index}',
+        'last_name': 'Test',
+        'email': f'doctor{index}.{user.pk}@example.com',
+        'phone': '555-0200',
+        'license_number': f'LIC-{user.pk}-{index}',
+        'specialization': 'cardiology',
+        'experience_years': index % 30,
+        'qualification': 'MD',
+        'hospital_name': 'General Hospital',
+        'hospital_address': '2 Main Street',
+        'city': 'Austin',
+        'state': 'TX',
+        'consultation_fee': 100 + index,
+        'availability': 'Mon-Fri 9:00-17:00',
+    }
+    values.update(fields)
+    return Doctor.objects.create(created_by=user, **values)
+
+
+def make_mapping(user, patient, doctor, **fields):
+    return PatientDoctorMapping.objects.create(
+        created_by=user, patient=patient, doctor=doctor, **fields
+    )
+
+
+class IsolatedAPITestCase(APITestCase):
+    """
+    APITestCase that starts every test with empty caches and rate-limit
+    buckets, so cached responses and throttles do not leak between tests.
+    """
+    def setUp(self):
+        super().setUp()
+        self.clear_caches()
+
+    def clear_caches(self):
+        for alias in caches:
+            caches[alias].clear()
+        TokenBucketThrottle._local_buckets.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class QueryCountTestCase(IsolatedAPITestCase):
+    """
+    Base class for query-count regression tests.
+
+    assertConstantQueries grows the data set through ROW_COUNTS and checks
+    that a request issues the same number of queries each time, so a
+    serializer change that adds per-row queries fails the suite. On failure
+    the captured SQL is printed with the repeated statements marked.
+    """
+    row_counts = ROW_COUNTS
+
+    def assertConstantQueries(self, grow, request, expected_status=200):
+        """
+        grow(n) must bring the data set up to n rows; request() performs the
+        request and returns the response. on_commit callbacks raised while
+        growing are run, and caches and rate-limit buckets are cleared before
+        each measurement so every run is a cold request.
+        """
+        baseline = None
+        for rows in self.row_counts:
+            with self.subTest(rows=rows):
+                with self.captureOnCommitCallbacks(execute=True):
+                    grow(rows)
+                self.clear_caches()
+                with CaptureQueriesContext(connection) as context:
+                    response = request()
+                self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+
+                queries = [query['sql'] for query in context.captured_queries]
+                if baseline is None:
+                    baseline = queries
+                    continue
+                if len(queries) != len(baseline):
+                    self.fail(self._format_failure(rows, baseline, queries))
+
+    def _format_failure(self, rows, baseline, queries):
+        expected = Counter(normalize_sql(sql) for sql in baseline)
+        actual = Counter(normalize_sql(sql) for sql in queries)
+        lines = [
+            f'{len(queries)} queries with {rows} rows, expected {len(baseline)} '
+            f'(as with {self.row_counts[0]} row(s)):'
+        ]
+        for number, sql in enumerate(queries, 1):
+            key = normalize_sql(sql)
+            marker = '>>' if actual[key] > expected[key] else '  '
+            lines.append(f'{marker} {number}. {sql}')
+        return '\n'.join(lines)
@@ -0,0 +1,944 @@
+import csv
+import hashlib
+import hmac
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+from types import SimpleNamespace
+import time
+from datetime import timedelta
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import LiveServerTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from doctors.availability import availability_index
+from doctors.models import Doctor, DoctorAvailability
+from doctors.recommendations import recommendation_index
+from patients.models import Patient, PatientCounter
+from patients.serializers import PatientSerializer
+from . import health, metrics, profiling
+from .idempotency import _own_claim
+from .queue import TaskDefinition, claim_tasks, enqueue, execute, make_executor, registry, wait_renewing
+from .reference import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, ReferenceDocument
+from .management.commands import import_records
+from .models import IdempotencyKey, ImportCheckpoint, OutboxEvent, Task, WebhookSubscription
+from .tasks import purge_idempotency_keys
+from .throttling import TokenBucketThrottle
+from .webhooks import deliver
+from .warmup import warmup
+from .testing import IsolatedAPITestCase, make_doctor, make_mapping, make_patient
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def scrape(client):
+    """
+    Fetch /metrics and parse it the way Prometheus would:
+    {(name, frozenset(labels)): value}.
+    """
+    response = client.get('/metrics')
+    assert response.status_code == 200, response.status_code
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    samples = {}
+    for line in response.content.decode().splitlines():
+        if not line or line.startswith('#'):
+            continue
+        name, labels, value = _SAMPLE.match(line).groups()
+        samples[(name, frozenset(_LABEL.findall(labels or '')))] = float(value)
+    return samples
+
+
+def sample(samples, name, **labels):
+    return samples.get((name, frozenset(labels.items())), 0)
+
+
+class MetricsTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+
+    def test_request_counts_latency_and_queries(self):
+        make_patient(self.user, 1)
+        self.client.get('/api/patients/')
+        self.client.get('/api/patients/')
+
+        samples = scrape(self.client)
+        self.assertEqual(
+            sample(samples, 'http_requests_total', view='patient-list-create', method='GET', status='200'), 2
+        )
+        self.assertEqual(
+            sample(samples, 'http_request_duration_seconds_count', view='patient-list-create'), 2
+        )
+        self.assertEqual(
+            sample(samples, 'http_request_duration_seconds_bucket', view='patient-list-create', le='+Inf'), 2
+        )
+        # The second request is served from the response cache
+        self.assertEqual(sample(samples, 'cache_requests_total', cache='responses', result='miss'), 1)
+        self.assertEqual(sample(samples, 'cache_requests_total', cache='responses', result='hit'), 1)
+        self.assertGreater(sample(samples, 'db_queries_total', view='patient-list-create'), 0)
+        self.assertEqual(sample(samples, 'http_requests_in_flight'), 1)
+
+    def test_auth_failures(self):
+        anonymous = self.client_class()
+        anonymous.get('/api/patients/')
+        anonymous.post('/api/auth/login/', {'username': 'owner', 'password': 'wrong'}, format='json')
+
+        samples = scrape(self.client)
+        self.assertEqual(sample(samples, 'auth_failures_total', reason='unauthenticated'), 1)
+        self.assertEqual(sample(samples, 'auth_failures_total', reason='login_failed'), 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_multiprocess_directory(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            # A worker that has exited: its counters still count, its gauges do not
+            exited = {
+                'values': [
+                    ['http_requests_total', [['method', 'GET'], ['status', '200'], ['view', 'doctor-list-create']], 3],
+                    ['http_requests_in_flight', [], 5],
+                ],
+                'histograms': [
+                    ['http_request_duration_seconds', [['view', 'doctor-list-create']],
+                     [3] + [0] * len(metrics.LATENCY_BUCKETS) + [0.003]],
+                ],
+            }
+            with open(os.path.join(directory, 'metrics-999999999.json'), 'w') as handle:
+                json.dump(exited, handle)
+            self.client.get('/api/doctors/')
+
+            samples = scrape(self.client)
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+
+        self.assertEqual(
+            sample(samples, 'http_requests_total', view='doctor-list-create', method='GET', status='200'), 4
+        )
+        self.assertEqual(sample(samples, 'http_request_duration_seconds_count', view='doctor-list-create'), 4)
+        self.assertEqual(sample(samples, 'http_requests_in_flight'), 1)
+
+
+class ProfilingTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        override = override_settings(PROFILE_DIR=self.directory.name, PROFILE_SAMPLE_RATES={})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = User.objects.create_user('staff', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user('owner', password='pass12345')
+
+    def get(self, user, path, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return self.client_class().get(path, HTTP_AUTHORIZATION=f'Bearer {token}', **headers)
+
+    def test_staff_header_profiles_request(self):
+        make_patient(self.staff, 1)
+        response = self.get(self.staff, '/api/patients/', HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+        profile_id = response['X-Profile-Id']
+        [profile] = profiling.list_profiles()
+        self.assertEqual(profile['id'], profile_id)
+        self.assertEqual(profile['view'], 'patient-list-create')
+        self.assertEqual(profile['mode'], 'cprofile')
+        self.assertIsNotNone(profiling.profile_path(profile_id, 'pstats'))
+        self.assertIsNotNone(profiling.profile_path(profile_id, 'collapsed'))
+
+        output = StringIO()
+        call_command('profiles', 'dump', profile_id, stdout=output)
+        self.assertIn('patient_list_create', output.getvalue())
+
+    def test_header_ignored_for_non_staff(self):
+        response = self.get(self.user, '/api/patients/', HTTP_X_PROFILE='cprofile')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_sample_rate(self):
+        with override_settings(PROFILE_SAMPLE_RATES={'patient_list_create': 1.0}):
+            response = self.get(self.user, '/api/patients/')
+            self.get(self.user, '/api/doctors/')
+        self.assertNotIn('X-Profile-Id', response)
+        [profile] = profiling.list_profiles()
+        self.assertEqual(profile['mode'], 'sample')
+        self.assertIsNone(profiling.profile_path(profile['id'], 'pstats'))
+
+    def test_ring_buffer(self):
+        with override_settings(PROFILE_MAX_ENTRIES=2):
+            ids = [
+                self.get(self.staff, '/api/doctors/', HTTP_X_PROFILE='sample')['X-Profile-Id']
+                for _ in range(3)
+            ]
+        self.assertEqual([profile['id'] for profile in profiling.list_profiles()], ids[:0:-1])
+        self.assertEqual(len(os.listdir(self.directory.name)), 4)
+
+
+class StartupTests(IsolatedAPITestCase):
+    def test_warmup(self):
+        timings = warmup()
+        self.assertEqual(set(timings), {'urls', 'serializers', 'database'})
+
+    def test_warmup_survives_an_unreachable_database(self):
+        with mock.patch.object(connection, 'ensure_connection', side_effect=OperationalError('refused')):
+            with self.assertLogs('core.warmup', 'WARNING') as logs:
+                timings = warmup()
+        self.assertIn('database', timings)
+        self.assertIn("could not connect to database 'default'", logs.output[0])
+
+    def test_profile_startup(self):
+        output = StringIO()
+        call_command('profile_startup', '--no-db', '--limit', '5', stdout=output)
+        self.assertIn('django.setup', output.getvalue())
+        self.assertIn('warmup: urls', output.getvalue())
+        self.assertRegex(output.getvalue(), r'\d+ module\(s\) imported')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], RATE_LIMITS={})
+class LoadTestCommandTests(LiveServerTestCase):
+    def test_mixed_workload_against_live_server(self):
+        # One virtual user: the live server's threads share the in-memory
+        # SQLite connection, so overlapping requests would collide on it
+        output = StringIO()
+        call_command(
+            'loadtest', '--url', self.live_server_url, '--duration', '1', '--concurrency', '1',
+            '--users', '1', '--doctors', '2', '--json', stdout=output,
+        )
+        report = json.loads(output.getvalue())['scenarios']
+        self.assertEqual(set(report), {'login', 'browse', 'patients', 'mappings'})
+        self.assertGreater(sum(row['requests'] for row in report.values()), 0)
+        for name, row in report.items():
+            self.assertEqual(row['errors'], 0, (name, row['statuses']))
+        self.assertFalse(User.objects.filter(username__startswith='loadtest-').exists())
+
+
+class AdminScalingTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        self.client.force_login(self.admin)
+        self.patients = [make_patient(self.admin, index, last_name=name) for index, name in enumerate(
+            ['Smith', 'Smithers', 'Jones']
+        )]
+        self.doctor = make_doctor(self.admin, 1)
+        make_mapping(self.admin, self.patients[0], self.doctor)
+
+    def search(self, path, term):
+        response = self.client.get(path, {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return {obj.pk for obj in response.context['cl'].result_list}
+
+    def test_exact_and_prefix_search(self):
+        path = '/admin/patients/patient/'
+        self.assertEqual(self.search(path, 'smi'), {self.patients[0].pk, self.patients[1].pk})
+        self.assertEqual(self.search(path, 'SMITHE'), {self.patients[1].pk})
+        self.assertEqual(self.search(path, self.patients[2].email.upper()), {self.patients[2].pk})
+        # Exact fields do not match on a prefix, and nothing matches mid-word
+        self.assertEqual(self.search(path, self.patients[2].email[:-1]), set())
+        self.assertEqual(self.search(path, 'mith'), set())
+
+    def test_changelists_skip_full_count_and_cache_filter_choices(self):
+        for path in ['/admin/patients/patient/', '/admin/doctors/doctor/', '/admin/mappings/patientdoctormapping/']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 200)
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['cl'].full_result_count)
+                self.assertFalse([q['sql'] for q in context.captured_queries if 'DISTINCT' in q['sql']])
+
+    def test_mapping_form_uses_autocomplete(self):
+        response = self.client.get('/admin/mappings/patientdoctormapping/add/')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, f'<option value="{self.patients[2].pk}">')
+
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'mappings', 'model_name': 'patientdoctormapping', 'field_name': 'patient', 'term': 'jon',
+        })
+        self.assertEqual([int(item['id']) for item in response.json()['results']], [self.patients[2].pk])
+
+
+def read_csv_gz(path):
+    with gzip.open(path, 'rt', newline='') as handle:
+        return list(csv.DictReader(handle))
+
+
+class ExportSnapshotTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.patients = [make_patient(self.user, index) for index in range(3)]
+        self.doctor = make_doctor(self.user, 1)
+        self.mappings = [make_mapping(self.user, patient, self.doctor) for patient in self.patients]
+
+    def export(self, *args):
+        call_command(
+            'export_snapshot', '--output-dir', self.directory.name, '--format', 'csv', *args, stdout=StringIO()
+        )
+        snapshots = sorted(path for path in os.listdir(self.directory.name) if path != 'snapshot_state.json')
+        return os.path.join(self.directory.name, snapshots[-1])
+
+    def ids(self, snapshot, name, column='id'):
+        return sorted(int(row[column]) for row in read_csv_gz(os.path.join(snapshot, f'{name}.csv.gz')))
+
+    def test_full_snapshot_leaves_out_soft_deleted_rows(self):
+        self.patients[0].soft_delete()
+        snapshot = self.export()
+        self.assertEqual(self.ids(snapshot, 'patients'), [patient.pk for patient in self.patients[1:]])
+        self.assertEqual(self.ids(snapshot, 'mappings'), [mapping.pk for mapping in self.mappings[1:]])
+        self.assertEqual(self.ids(snapshot, 'doctors'), [self.doctor.pk])
+        self.assertFalse(os.path.exists(os.path.join(snapshot, 'patients_removed.csv.gz')))
+
+    def test_incremental_snapshot_reports_removed_rows(self):
+        first = self.export()
+        self.patients[1].city = 'Dallas'
+        self.patients[1].save()
+        self.patients[0].soft_delete()
+        deleted_id = self.mappings[2].pk
+        self.mappings[2].delete()
+        self.mappings[1].status = 'completed'
+        self.mappings[1].save()
+        call_command('archive_mappings', '--older-than-days', '-1', stdout=StringIO())
+
+        second = self.export('--incremental')
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.ids(second, 'patients'), [self.patients[1].pk])
+        self.assertEqual(self.ids(second, 'patients_removed', 'aggregate_id'), [self.patients[0].pk])
+        self.assertEqual(self.ids(second, 'mappings'), [])
+        removed = {
+            int(row['aggregate_id']): row['event_type']
+            for row in read_csv_gz(os.path.join(second, 'mappings_removed.csv.gz'))
+        }
+        self.assertEqual(removed, {self.mappings[1].pk: 'archived', deleted_id: 'deleted'})
+
+    def test_snapshots_in_the_same_second_do_not_collide(self):
+        self.assertNotEqual(self.export(), self.export())
+        self.assertEqual(len(os.listdir(self.directory.name)), 3)
+
+
+class ImportRecordsTests(IsolatedAPITestCase):
+    ROWS = [
+        ('Ann', 'ann@example.com', '1980-01-01'),
+        ('Bad', 'not-an-email', '1980-01-02'),
+        ('Cid', 'cid@example.com', '1980-01-03'),
+        ('Dup', 'ann@example.com', '1980-01-04'),
+        ('Eve', 'eve@example.com', '1980-01-05'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('importer', password='pass12345')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'patients.csv')
+        with open(self.path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'gender',
+                             'address', 'city', 'state', 'zip_code'])
+            for first_name, email, birth_date in self.ROWS:
+                writer.writerow([first_name, 'Import', email, '555-0100', birth_date, 'F',
+                                 '1 Main Street', 'Austin', 'TX', '78701'])
+
+    def run_import(self):
+        call_command(
+            'import_records', 'patients', self.path, '--created-by', 'importer',
+            '--chunk-size', '2', '--workers', '1', stdout=StringIO(),
+        )
+
+    def rejects(self):
+        with open(f'{self.path}.rejects.csv', newline='') as handle:
+            return {int(row['row_number']): json.loads(row['errors']) for row in csv.DictReader(handle)}
+
+    def test_import_validates_and_reports_rejects(self):
+        self.run_import()
+        self.assertEqual(
+            sorted(Patient.objects.values_list('first_name', flat=True)), ['Ann', 'Cid', 'Eve']
+        )
+        rejects = self.rejects()
+        self.assertEqual(set(rejects), {2, 4})
+        self.assertIn('email', rejects[2])
+        self.assertIn('already exists', rejects[4]['email'][0])
+        self.assertEqual(PatientCounter.get_count(self.user.pk), 3)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def crash_on_second_chunk(self, committed):
+        """
+        Run the import and kill it while loading the second chunk: after its
+        transaction committed, or before.
+        """
+        load = import_records.Command.load
+        calls = []
+
+        def crashing_load(command, *args):
+            calls.append(args)
+            if len(calls) != 2:
+                return load(command, *args)
+            if committed:
+                load(command, *args)
+                raise RuntimeError('worker killed')
+            with transaction.atomic():
+                load(command, *args)
+                raise RuntimeError('worker killed')
+
+        with mock.patch.object(import_records.Command, 'load', crashing_load):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+
+    def assertResumed(self):
+        self.run_import()
+        self.assertEqual(
+            sorted(Patient.objects.values_list('first_name', flat=True)), ['Ann', 'Cid', 'Eve']
+        )
+        self.assertEqual(set(self.rejects()), {2, 4})
+        with open(f'{self.path}.rejects.csv') as handle:
+            self.assertEqual(len(handle.readlines()), 3)
+
+    def test_resume_after_committed_chunk(self):
+        self.crash_on_second_chunk(committed=True)
+        # The checkpoint committed with the chunk, so Cid is not re-imported as a duplicate
+        self.assertEqual(ImportCheckpoint.objects.get().rows_done, 4)
+        self.assertResumed()
+
+    def test_resume_after_rolled_back_chunk(self):
+        self.crash_on_second_chunk(committed=False)
+        self.assertEqual(ImportCheckpoint.objects.get().rows_done, 2)
+        self.assertEqual(list(Patient.objects.values_list('first_name', flat=True)), ['Ann'])
+        # Row 4 was already reported; the resume reports it once, not twice
+        self.assertResumed()
+
+    def import_doctor(self):
+        path = os.path.join(self.directory.name, 'doctors.ndjson')
+        with open(path, 'w') as handle:
+            handle.write(json.dumps({
+                'first_name': 'Dee', 'last_name': 'Import', 'email': 'dee@example.com', 'phone': '555-0400',
+                'license_number': 'IMP-1', 'specialization': 'cardiology', 'experience_years': 5,
+                'qualification': 'MD', 'hospital_name': 'City Hospital', 'hospital_address': '4 Main Street',
+                'city': 'Austin', 'state': 'TX', 'consultation_fee': '150.00',
+                'availability': 'Mon-Fri 9:00-17:00',
+            }) + '\n')
+        call_command(
+            'import_records', 'doctors', path, '--created-by', 'importer', '--workers', '1', stdout=StringIO()
+        )
+
+    def test_doctor_import_reaches_the_availability_index(self):
+        self.assertEqual(availability_index.find(1, 600), set())
+        self.import_doctor()
+        self.assertEqual(DoctorAvailability.objects.count(), 5)
+        doctor_id = DoctorAvailability.objects.values_list('doctor_id', flat=True).first()
+        self.assertEqual(availability_index.find(1, 600), {doctor_id})
+
+    def test_doctor_import_reaches_the_recommendation_index(self):
+        self.assertEqual(recommendation_index.recommend('cardiology', 'TX'), [])
+        self.import_doctor()
+        doctor_id = Doctor.objects.get(license_number='IMP-1').pk
+        ranked = recommendation_index.recommend('cardiology', 'TX')
+        self.assertEqual([candidate.doctor_id for _, _, candidate in ranked], [doctor_id])
+
+
+class HealthTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        health.reset()
+        self.addCleanup(health.reset)
+
+    def test_healthz_touches_nothing(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_probe_is_cached(self):
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200, response.json())
+        checks = response.json()['checks']
+        self.assertEqual(response.json()['status'], 'ready')
+        self.assertTrue(checks['database']['ok'])
+        self.assertEqual(checks['migrations']['pending'], 0)
+        self.assertTrue(checks['cache']['ok'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/readyz').status_code, 200)
+
+    @override_settings(READINESS_MAX_IN_FLIGHT=2)
+    def test_readyz_degraded_when_saturated(self):
+        self.assertEqual(self.client.get('/readyz').status_code, 200)
+        metrics.inc('http_requests_in_flight', 2)
+        self.addCleanup(metrics.inc, 'http_requests_in_flight', -2)
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'degraded')
+        self.assertEqual(response.json()['checks']['capacity']['in_flight'], 2)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_readyz_unavailable_without_cache(self):
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'unavailable')
+        self.assertFalse(response.json()['checks']['cache']['ok'])
+
+
+class IdempotencyTests(IsolatedAPITestCase):
+    PATIENT = {
+        'first_name': 'New', 'last_name': 'Patient', 'email': 'new@example.com',
+        'phone': '555-0300', 'date_of_birth': '1990-05-01', 'gender': 'F',
+        'address': '3 Main Street', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def post(self, key='key-1', **changes):
+        return self.client.post(
+            '/api/patients/', {**self.PATIENT, **changes}, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def interrupt(self, age=0):
+        """
+        Leave the key as a worker that died mid-request would: claimed,
+        without a response, and with its patient rolled back.
+        """
+        Patient.objects.all().delete()
+        IdempotencyKey.objects.update(
+            status_code=None, response_body=None, claimed_at=timezone.now() - timedelta(seconds=age)
+        )
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post()
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):
+            retry = self.post()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Patient.objects.count(), 1)
+
+    def test_key_reused_for_a_different_body_is_rejected(self):
+        self.post()
+        response = self.post(city='Dallas')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Patient.objects.count(), 1)
+
+    def test_retry_while_in_progress_conflicts(self):
+        self.post()
+        self.interrupt()
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(Patient.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY_CLAIM_LEASE=60)
+    def test_abandoned_claim_is_taken_over_after_the_lease(self):
+        self.post()
+        self.interrupt(age=61)
+        response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Patient.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+        self.assertEqual(self.post()['Idempotent-Replayed'], 'true')
+
+    @override_settings(IDEMPOTENCY_CLAIM_LEASE=60)
+    def test_late_finish_does_not_release_the_new_claim(self):
+        self.post()
+        self.interrupt(age=61)
+        record = IdempotencyKey.objects.get()
+        self.post()
+        # The original request finishing late must not release the new claim
+        self.assertEqual(_own_claim(record).delete()[0], 0)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_worker_schedules_the_expired_key_purge(self):
+        self.post()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        with mock.patch('core.management.commands.run_worker.run_once', return_value=0):
+            call_command('run_worker', '--once', '--threads', '1', stdout=StringIO())
+        task = Task.objects.get(name='core.purge_idempotency_keys', status='pending')
+        purge_idempotency_keys([task.payload])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class TaskQueueTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        definitions = {
+            'tests.record': TaskDefinition('tests.record', self.calls.append, False, 3, 5),
+            'tests.fail': TaskDefinition('tests.fail', self.fail_task, False, 2, 5),
+        }
+        patcher = mock.patch.dict(registry, definitions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Tasks run in the test thread; keep its connection open
+        patcher = mock.patch('core.queue.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail_task(self, payload):
+        raise RuntimeError('boom')
+
+    def age_claims(self, seconds):
+        Task.objects.update(claimed_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_claim_run_and_finish(self):
+        enqueue('tests.record', {'n': 1}, on_commit=False)
+        tasks = claim_tasks(10)
+        self.assertEqual(claim_tasks(10), [])
+        execute(tasks)
+        self.assertEqual(self.calls, [{'n': 1}])
+        self.assertEqual(Task.objects.get().status, 'done')
+
+    def test_failed_task_backs_off_then_fails(self):
+        enqueue('tests.fail', on_commit=False)
+        before = timezone.now()
+        with self.assertLogs('core.queue', 'ERROR'):
+            execute(claim_tasks(10))
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts, task.claim_token), ('pending', 1, None))
+        self.assertIn('RuntimeError: boom', task.last_error)
+        self.assertGreaterEqual(task.run_after, before + timedelta(seconds=5))
+        self.assertEqual(claim_tasks(10), [])
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('core.queue', 'ERROR'):
+            execute(claim_tasks(10))
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), ('failed', 2))
+
+    def test_heartbeat_keeps_a_long_task_claimed(self):
+        enqueue('tests.record', on_commit=False)
+        token = claim_tasks(10)[0].claim_token
+        self.age_claims(601)
+        executor = make_executor(1)
+        self.addCleanup(executor.shutdown)
+        # A stand-in for a long task that does not touch the database
+        wait_renewing([executor.submit(time.sleep, 0.1)], token, interval=0.01)
+        self.assertEqual(claim_tasks(10, stale_after=600), [])
+        self.assertEqual(Task.objects.get().claim_token, token)
+
+    def test_reclaimed_task_is_not_finished_by_its_first_worker(self):
+        enqueue('tests.record', on_commit=False)
+        first = claim_tasks(10)
+        self.age_claims(601)
+        second = claim_tasks(10, stale_after=600)
+        self.assertEqual([t.pk for t in second], [t.pk for t in first])
+
+        with self.assertLogs('core.queue', 'WARNING') as logs:
+            execute(first)
+        self.assertIn('1 task(s) were reclaimed before finishing', logs.output[0])
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.claim_token), ('running', second[0].claim_token))
+        execute(second)
+        self.assertEqual(Task.objects.get().status, 'done')
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """
+    Local stand-in for a subscriber. Answers with the queued replies
+    (a status code, or 'garbage' for an invalid status line), then 200.
+    """
+    def __init__(self):
+        self.replies = []
+        self.received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers['Content-Length']))
+                self.received.append((dict(handler.headers), json.loads(body), body))
+                reply = self.replies.pop(0) if self.replies else 200
+                if reply == 'garbage':
+                    handler.wfile.write(b'garbage\r\n\r\n')
+                    return
+                handler.send_response(reply)
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hook'
+
+    def events(self):
+        return [event['id'] for _, body, _ in self.received for event in body['events']]
+
+
+class WebhookDeliveryTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.receiver = WebhookReceiver()
+        self.addCleanup(self.receiver.server_close)
+        self.addCleanup(self.receiver.shutdown)
+        self.subscription = WebhookSubscription.objects.create(
+            name='crm', url=self.receiver.url, secret='s3cret', aggregate_types=['patient']
+        )
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.patients = [
+            make_patient(self.user, index, medical_history='Asthma', allergies='Peanuts') for index in range(3)
+        ]
+        self.events = list(OutboxEvent.objects.filter(aggregate_type='patient').order_by('id'))
+        sleeps = mock.patch('core.webhooks.time.sleep')
+        self.sleep = sleeps.start()
+        self.addCleanup(sleeps.stop)
+
+    def deliver(self, **options):
+        delivered = deliver(self.subscription.pk, retries=2, backoff=1.0, timeout=5, **options)
+        self.subscription.refresh_from_db()
+        return delivered
+
+    def test_delivers_signed_batches_without_the_medical_record(self):
+        make_doctor(self.user, 0)
+        self.assertEqual(self.deliver(), 3)
+        self.assertEqual(self.receiver.events(), [event.id for event in self.events])
+        self.assertEqual(self.subscription.last_event_id, OutboxEvent.objects.order_by('id').last().id)
+
+        headers, body, raw = self.receiver.received[0]
+        signature = hmac.new(b's3cret', raw, hashlib.sha256).hexdigest()
+        self.assertEqual(headers['X-Webhook-Signature'], f'sha256={signature}')
+        data = body['events'][0]['data']
+        self.assertEqual(data['email'], self.patients[0].email)
+        self.assertFalse({'medical_history', 'allergies', 'address'} & set(data))
+        self.assertEqual(self.deliver(), 0)
+
+    def test_retries_with_backoff(self):
+        self.receiver.replies = [500, 'garbage']
+        self.assertEqual(self.deliver(), 3)
+        self.assertEqual(len(self.receiver.received), 3)
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [1.0, 2.0])
+        self.assertEqual(self.subscription.failure_count, 0)
+
+    def test_failed_round_keeps_the_cursor_and_counts_failures(self):
+        for round_number in (1, 2):
+            self.receiver.replies = [503, 503, 'garbage']
+            self.assertEqual(self.deliver(), 0)
+            self.assertEqual(self.subscription.last_event_id, 0)
+            self.assertEqual(self.subscription.failure_count, round_number)
+        self.assertEqual(self.deliver(), 3)
+        self.assertEqual(self.subscription.failure_count, 0)
+
+    def test_event_committed_out_of_order_is_not_skipped(self):
+        # The middle event's transaction has not committed yet: its id is
+        # taken but the row is not visible
+        late = self.events[1]
+        OutboxEvent.objects.filter(pk=late.pk).delete()
+        self.assertEqual(self.deliver(), 1)
+        self.assertEqual(self.subscription.last_event_id, self.events[0].id)
+
+        late.save(force_insert=True)
+        self.assertEqual(self.deliver(), 2)
+        self.assertEqual(self.receiver.events(), [event.id for event in self.events])
+
+    def test_rolled_back_gap_is_skipped_after_the_visibility_window(self):
+        OutboxEvent.objects.filter(pk=self.events[1].pk).delete()
+        self.assertEqual(self.deliver(visibility_window=60), 1)
+        OutboxEvent.objects.filter(pk=self.events[2].pk).update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(self.deliver(visibility_window=60), 1)
+        self.assertEqual(self.receiver.events(), [self.events[0].id, self.events[2].id])
+
+
+@override_settings(RATE_LIMITS={'default': None, 'patient_list_create': '60/min:3'})
+class ThrottleTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.other = User.objects.create_user('other', password='pass12345')
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def exhaust(self, client):
+        return [client.get('/api/patients/').status_code for _ in range(4)]
+
+    def test_bucket_per_user_with_headers(self):
+        client = self.token_client(self.user)
+        response = client.get('/api/patients/')
+        self.assertEqual(
+            (response['RateLimit-Limit'], response['RateLimit-Remaining'], response['RateLimit-Reset']),
+            ('3', '2', '1'),
+        )
+        self.assertEqual(self.exhaust(client)[-1], 429)
+        response = client.get('/api/patients/')
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.token_client(self.other).get('/api/patients/').status_code, 200)
+
+    def test_throttled_request_touches_no_database(self):
+        client = self.token_client(self.user)
+        self.assertEqual(self.exhaust(client)[-1], 429)
+        with self.assertNumQueries(0):
+            response = client.get('/api/patients/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+
+    def test_invalid_token_is_rejected_before_throttling(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual([client.get('/api/patients/').status_code for _ in range(4)], [401] * 4)
+
+    def test_client_key_is_the_token_user_id_claim(self):
+        request = APIRequestFactory().get('/api/patients/')
+        request.auth = AccessToken.for_user(self.other)
+        request.user = self.user
+        self.assertEqual(TokenBucketThrottle().get_client_key(request), f'user:{self.other.pk}')
+
+        request.auth = None
+        self.assertEqual(TokenBucketThrottle().get_client_key(request), f'user:{self.user.pk}')
+
+    # Slow refill: password hashing must not earn the client a token back
+    @override_settings(RATE_LIMITS={'default': None, 'login': '3/hour'})
+    def test_anonymous_clients_are_keyed_by_ip(self):
+        statuses = [
+            self.client.post('/api/auth/login/', {'username': 'owner', 'password': 'wrong'}).status_code
+            for _ in range(4)
+        ]
+        self.assertEqual(statuses[-1], 429)
+        self.assertNotEqual(statuses[0], 429)
+
+    @override_settings(RATE_LIMIT_CACHE='default')
+    def test_shared_buckets_count_every_request(self):
+        view = SimpleNamespace(throttle_scope='patient_list_create')
+
+        def request_once():
+            request = SimpleNamespace(auth={'user_id': self.user.pk}, _request=SimpleNamespace())
+            results.append(TokenBucketThrottle().allow_request(request, view))
+
+        # Threads with their own throttles stand in for several processes
+        results = []
+        with mock.patch('core.throttling.time.time', return_value=1200.0):
+            threads = [threading.Thread(target=request_once) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results.count(True), 3)
+            self.assertEqual(self.token_client(self.other).get('/api/patients/').status_code, 200)
+
+        # The next window starts with a full allowance
+        with mock.patch('core.throttling.time.time', return_value=1203.0):
+            self.assertEqual(self.token_client(self.user).get('/api/patients/').status_code, 200)
+
+
+class BatchTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.other = User.objects.create_user('other', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.patient = make_patient(self.user, 0)
+        self.foreign = make_patient(self.other, 0)
+
+    def batch(self, *items, **options):
+        response = self.client.post('/api/batch/', {'requests': list(items), **options}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(item['status'], item['body']) for item in response.json()['responses']]
+
+    def test_items_run_as_the_batch_user(self):
+        responses = self.batch(
+            {'method': 'GET', 'path': f'/api/patients/{self.patient.pk}/'},
+            {'method': 'GET', 'path': f'/api/patients/{self.foreign.pk}/'},
+            {'method': 'PUT', 'path': f'/api/patients/{self.patient.pk}/', 'body': {'city': 'Dallas'}},
+        )
+        self.assertEqual([status for status, _ in responses], [200, 404, 200])
+        self.assertEqual(responses[0][1]['email'], self.patient.email)
+        self.assertEqual(Patient.objects.get(pk=self.patient.pk).city, 'Dallas')
+
+    def test_only_api_views_can_be_batched(self):
+        responses = self.batch(
+            {'method': 'GET', 'path': '/admin/'},
+            {'method': 'GET', 'path': '/metrics'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}},
+            {'method': 'GET', 'path': '/nowhere/'},
+            {'method': 'GET', 'path': '/api/patients/'},
+        )
+        self.assertEqual([status for status, _ in responses], [400, 400, 400, 404, 200])
+        self.assertEqual(responses[0][1], {'error': '/admin/ cannot be used in a batch'})
+
+    def test_reference_endpoints_can_be_batched(self):
+        responses = self.batch(
+            {'method': 'GET', 'path': '/api/patients/'},
+            {'method': 'GET', 'path': '/api/doctors/'},
+            {'method': 'GET', 'path': '/api/doctors/specializations/'},
+            {'method': 'GET', 'path': '/api/mappings/status-choices/'},
+            {'method': 'GET', 'path': '/api/reference/'},
+        )
+        self.assertEqual([status for status, _ in responses], [200, 200, 200, 200, 200])
+        self.assertIn({'value': 'cardiology', 'label': 'Cardiology'}, responses[4][1]['specializations'])
+
+    def test_failing_item_gets_its_own_500(self):
+        with mock.patch.object(PatientSerializer, 'to_representation', side_effect=RuntimeError('boom')):
+            with self.assertLogs('core.batch', 'ERROR'):
+                responses = self.batch(
+                    {'method': 'GET', 'path': f'/api/patients/{self.patient.pk}/'},
+                    {'method': 'GET', 'path': '/api/doctors/'},
+                )
+        self.assertEqual(responses[0], (500, {'error': 'Internal server error'}))
+        self.assertEqual(responses[1][0], 200)
+
+    def test_atomic_batches_are_read_only(self):
+        response = self.client.post('/api/batch/', {
+            'requests': [{'method': 'DELETE', 'path': f'/api/patients/{self.patient.pk}/'}], 'atomic': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.batch({'method': 'GET', 'path': '/api/patients/'}, atomic=True)[0][0], 200)
+
+
+class ReferenceTests(IsolatedAPITestCase):
+    def test_etag_round_trip(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/reference/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], REVALIDATE_CACHE_CONTROL)
+        self.assertEqual(response['ETag'], f'"{response["Reference-Version"]}"')
+        self.assertIn({'value': 'cardiology', 'label': 'Cardiology'}, response.json()['specializations'])
+
+        revalidated = self.client.get('/api/reference/', HTTP_IF_NONE_MATCH=f'"stale", {response["ETag"]}')
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+        changed = self.client.get('/api/reference/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.content, response.content)
+
+    def test_versioned_url_is_immutable(self):
+        version = self.client.get('/api/reference/')['Reference-Version']
+        response = self.client.get('/api/reference/', {'v': version})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        stale = self.client.get('/api/reference/', {'v': 'old'})
+        self.assertEqual(stale['Cache-Control'], REVALIDATE_CACHE_CONTROL)
+
+    def test_version_follows_the_content(self):
+        self.assertEqual(ReferenceDocument({'a': 1, 'b': 2}).version, ReferenceDocument({'b': 2, 'a': 1}).version)
+        self.assertNotEqual(ReferenceDocument({'a': 1}).version, ReferenceDocument({'a': 2}).version)
+
+    def test_only_safe_methods(self):
+        self.assertEqual(self.client.head('/api/reference/').status_code, 200)
+        self.assertEqual(self.client.post('/api/reference/').status_code, 405)
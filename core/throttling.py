@@ -0,0 +1,183 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+PERIODS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+
+# Local buckets are pruned once this many clients are tracked
+MAX_LOCAL_BUCKETS = 50000
+
+
+def parse_rate(rate):
+    """
+    Parse "<requests>/<period>[:<burst>]", e.g. "20/min" or "20/min:40".
+    Returns (capacity, tokens refilled per second).
+    """
+    rate, _, burst = rate.partition(':')
+    requests, _, period = rate.partition('/')
+    requests = int(requests)
+    seconds = PERIODS[period.strip().lower()]
+    return int(burst or requests), requests / seconds
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket rate limit per client and view.
+
+    The scope is the view's throttle_scope or, for function views, the view
+    function name (e.g. 'login', 'doctor_list_create'), looked up in
+    settings.RATE_LIMITS with a 'default' fallback. Clients are identified
+    by the user id claim of the validated access token, by user id for
+    other authentication, otherwise by IP address.
+
+    Buckets live in a plain per-process dict, so the common path takes no
+    locks and does no I/O. Setting RATE_LIMIT_CACHE to a cache alias shares
+    limits between processes instead; there a bucket is approximated by a
+    fixed window allowing its capacity once every capacity / refill seconds,
+    counted with atomic cache.add/incr so concurrent processes cannot lose
+    each other's requests.
+
+    REST framework authenticates, loading the user, before it runs
+    throttles, so RateLimitMiddleware applies this throttle ahead of the
+    view where the client key needs no database access; allow_request then
+    lets the request through.
+    """
+    _local_buckets = {}
+
+    def __init__(self):
+        self.limit = None
+        self.wait_seconds = None
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None) or view.__class__.__name__
+
+    def get_rate(self, scope):
+        limits = getattr(settings, 'RATE_LIMITS', {})
+        return limits.get(scope, limits.get('default'))
+
+    def get_client_key(self, request):
+        token = getattr(request, 'auth', None)
+        user_id = token.get(jwt_settings.USER_ID_CLAIM) if hasattr(token, 'get') else None
+        if user_id is not None:
+            return f'user:{user_id}'
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_early_client_key(self, request):
+        """
+        The client key for a plain Django request, if it can be told without
+        authenticating: the user id claim of a valid access token, or the IP
+        address of a request without an Authorization header. Returns None
+        for an invalid token, which the view will reject anyway.
+        """
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        if header is None:
+            return f'ip:{self.get_ident(request)}'
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        try:
+            token = authentication.get_validated_token(raw_token)
+        except InvalidToken:
+            return None
+        user_id = token.get(jwt_settings.USER_ID_CLAIM)
+        return None if user_id is None else f'user:{user_id}'
+
+    def _take_local(self, key, capacity, refill):
+        """
+        Take a token from this process's bucket.
+        Returns (allowed, tokens left, seconds until full, seconds to wait).
+        """
+        now = time.monotonic()
+        bucket = self._local_buckets.get(key)
+        if bucket is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        if len(self._local_buckets) >= MAX_LOCAL_BUCKETS:
+            self._prune()
+        self._local_buckets[key] = (tokens, now, capacity, refill)
+        wait = 0 if allowed else (1 - tokens) / refill
+        return allowed, tokens, (capacity - tokens) / refill, wait
+
+    def _take_shared(self, cache, key, capacity, refill):
+        """
+        Count a request in the current shared window.
+        Returns (allowed, requests left, seconds until reset, seconds to wait).
+        """
+        window = capacity / refill
+        now = time.time()
+        index = int(now // window)
+        window_key = f'{key}:{index}'
+        timeout = int(window) + 1
+        cache.add(window_key, 0, timeout=timeout)
+        try:
+            used = cache.incr(window_key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(window_key, 1, timeout=timeout)
+            used = 1
+        reset = (index + 1) * window - now
+        allowed = used <= capacity
+        return allowed, max(0, capacity - used), reset, 0 if allowed else reset
+
+    def _prune(self):
+        """
+        Drop buckets that have refilled completely; they carry no state.
+        """
+        now = time.monotonic()
+        for key, (tokens, updated, capacity, refill) in list(self._local_buckets.items()):
+            if tokens + (now - updated) * refill >= capacity:
+                self._local_buckets.pop(key, None)
+
+    def allow_request(self, request, view):
+        # RateLimitMiddleware already spent this request's token
+        if getattr(request._request, 'rate_limit', None) is not None:
+            return True
+        return self.take(request._request, self.get_scope(view), self.get_client_key(request))
+
+    def take(self, request, scope, client_key):
+        """
+        Spend one of the client's requests for scope. request is the Django
+        HttpRequest; the remaining allowance is recorded on it as
+        rate_limit for RateLimitMiddleware.
+        """
+        rate = self.get_rate(scope)
+        if rate is None:
+            return True
+
+        capacity, refill = parse_rate(rate)
+        key = f'ratelimit:{scope}:{client_key}'
+        alias = getattr(settings, 'RATE_LIMIT_CACHE', None)
+        if alias:
+            allowed, tokens, reset, wait = self._take_shared(caches[alias], key, capacity, refill)
+        else:
+            allowed, tokens, reset, wait = self._take_local(key, capacity, refill)
+
+        self.limit = capacity
+        self.wait_seconds = wait
+        request.rate_limit = {
+            'limit': capacity,
+            'remaining': int(tokens),
+            'reset': int(reset + 0.999),
+        }
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
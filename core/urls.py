@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('batch/', views.batch, name='batch'),
+    path('reference/', views.reference, name='reference'),
+    path('tasks/stats/', views.task_queue_stats, name='task-queue-stats'),
+]
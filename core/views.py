@@ -0,0 +1,121 @@
+from contextlib import nullcontext
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from doctors.models import Doctor, DoctorAvailability
+from mappings.models import PatientDoctorMapping
+from patients.models import Patient
+from . import health, metrics
+from .batch import SAFE_METHODS, run_subrequest
+from .queue import task_stats
+from .reference import ReferenceDocument, choices_list, reference_view
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def task_queue_stats(request):
+    """
+    Get background task queue statistics (staff only).
+    """
+    return Response(task_stats())
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    """
+    Run several API requests in one round trip.
+
+    Body: {"requests": [{"method": "GET", "path": "/api/patients/1/"}, ...],
+           "atomic": false}
+    Authentication happens once for the whole batch and every item runs on
+    the same database connection. With "atomic": true (GET-only batches)
+    all items read from a single transaction.
+    """
+    items = request.data.get('requests')
+    if not isinstance(items, list) or not items:
+        return Response({
+            'error': 'requests must be a non-empty list'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        return Response({
+            'error': f'A batch can contain at most {settings.BATCH_MAX_REQUESTS} requests'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(item, dict) for item in items):
+        return Response({
+            'error': 'Each request must be an object with method and path'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    atomic = bool(request.data.get('atomic', False))
+    if atomic and any(str(item.get('method', 'GET')).upper() not in SAFE_METHODS for item in items):
+        return Response({
+            'error': 'Atomic batches may only contain GET requests'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic() if atomic else nullcontext():
+        responses = [run_subrequest(request, item, batch) for item in items]
+
+    return Response({
+        'count': len(responses),
+        'responses': responses
+    })
+
+
+REFERENCE = ReferenceDocument({
+    'specializations': choices_list(Doctor.SPECIALIZATION_CHOICES),
+    'status_choices': choices_list(PatientDoctorMapping.STATUS_CHOICES),
+    'genders': choices_list(Patient.GENDER_CHOICES),
+    'weekdays': choices_list(DoctorAvailability.WEEKDAY_CHOICES),
+})
+
+reference = reference_view(
+    REFERENCE,
+    doc="""
+    Get every enumeration used by the API in one response.
+    Fetch once per deploy: request /api/reference/?v=<Reference-Version>
+    to get an immutable, long-cacheable copy.
+    """
+)
+
+
+@require_safe
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. When METRICS_TOKEN is set the scraper must
+    send it as "Authorization: Bearer <token>".
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@require_safe
+def healthz(request):
+    """
+    Liveness probe: answers as long as the process can serve requests.
+    Touches no database, cache or authentication.
+    """
+    return JsonResponse({'status': 'ok'})
+
+
+@require_safe
+def readyz(request):
+    """
+    Readiness probe: database connectivity, pending migrations, cache
+    reachability and saturation. Answers 503 when the instance should be
+    taken out of rotation. Dependency checks are cached per process for
+    READINESS_PROBE_INTERVAL seconds.
+    """
+    readiness, checks = health.readiness()
+    return JsonResponse(
+        {'status': readiness, 'checks': checks},
+        status=200 if readiness == 'ready' else 503,
+        headers={'Cache-Control': 'no-store'},
+    )
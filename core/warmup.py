@@ -0,0 +1,79 @@
+import logging
+import time
+from importlib import import_module
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+from django.utils.module_loading import module_has_submodule
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+# DRF settings holding classes that are imported on first use
+API_CLASS_SETTINGS = (
+    'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_RENDERER_CLASSES',
+    'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_THROTTLE_CLASSES',
+    'DEFAULT_PAGINATION_CLASS',
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+)
+
+
+def project_serializers():
+    """
+    Serializer classes defined in the serializers module of each local app.
+    """
+    for app_config in apps.get_app_configs():
+        if not app_config.path.startswith(str(settings.BASE_DIR)):
+            continue
+        if not module_has_submodule(app_config.module, 'serializers'):
+            continue
+        module = import_module(f'{app_config.name}.serializers')
+        for value in vars(module).values():
+            if (isinstance(value, type) and issubclass(value, serializers.BaseSerializer)
+                    and value.__module__ == module.__name__):
+                yield value
+
+
+def warmup(connect=True):
+    """
+    Do the lazy one-off work Django and DRF otherwise leave to the first
+    requests of every worker: import the URLconf and views and build the
+    resolver caches, import the DRF default classes, build each serializer's
+    field map (which also fills the model _meta caches) and open the
+    database connections; a database that cannot be reached is logged, not
+    raised. Returns the seconds spent per step.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    resolver = get_resolver()
+    resolver.reverse_dict  # populates the resolver, importing every view
+    timings['urls'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in API_CLASS_SETTINGS:
+        getattr(api_settings, name)
+    for serializer_class in project_serializers():
+        try:
+            serializer_class().fields
+        except Exception:
+            # Serializers that need arguments are simply left cold
+            logger.debug('Could not warm up %s', serializer_class.__name__, exc_info=True)
+    timings['serializers'] = time.perf_counter() - start
+
+    if connect:
+        start = time.perf_counter()
+        for connection in connections.all():
+            try:
+                connection.ensure_connection()
+            except DatabaseError:
+                # The worker still starts; requests connect (or fail) on their own
+                logger.warning('Warmup could not connect to database %r', connection.alias, exc_info=True)
+        timings['database'] = time.perf_counter() - start
+
+    return timings
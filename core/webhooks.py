@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import http.client
+import json
+import time
+import urllib.error
+import urllib.request
+from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboxEvent, WebhookSubscription
+
+
+def pending_events(subscription, limit, visibility_window=60):
+    """
+    Return (events, cursor): the subscriber's next events and the id its
+    cursor may move to once they are acknowledged.
+
+    Ids are taken when an event is inserted but the event only becomes
+    visible when its transaction commits, so a missing id may belong to a
+    transaction that has not committed yet. The scan stops at such a gap
+    until the event after it is visibility_window seconds old; the gap's
+    transaction started before that event, so by then it is taken to have
+    rolled back.
+    """
+    settled = timezone.now() - timedelta(seconds=visibility_window)
+    rows = (
+        OutboxEvent.objects.filter(id__gt=subscription.last_event_id)
+        .order_by('id')
+        .values_list('id', 'aggregate_type', 'created_at')[:limit]
+    )
+    cursor = subscription.last_event_id
+    wanted = []
+    for event_id, aggregate_type, created_at in rows:
+        if event_id != cursor + 1 and created_at > settled:
+            break
+        cursor = event_id
+        if not subscription.aggregate_types or aggregate_type in subscription.aggregate_types:
+            wanted.append(event_id)
+    events = list(OutboxEvent.objects.filter(pk__in=wanted).order_by('id')) if wanted else []
+    return events, cursor
+
+
+def build_body(subscription, events):
+    return json.dumps({
+        'subscription': subscription.name,
+        'events': [
+            {
+                'id': event.id,
+                'type': f'{event.aggregate_type}.{event.event_type}',
+                'aggregate_id': event.aggregate_id,
+                'created_at': event.created_at,
+                'data': event.payload,
+            }
+            for event in events
+        ],
+    }, cls=DjangoJSONEncoder).encode()
+
+
+def post(subscription, body, timeout):
+    """
+    POST one batch. Any 2xx response acknowledges every event in it.
+    """
+    request = urllib.request.Request(subscription.url, data=body, method='POST')
+    request.add_header('Content-Type', 'application/json')
+    if subscription.secret:
+        signature = hmac.new(subscription.secret.encode(), body, hashlib.sha256).hexdigest()
+        request.add_header('X-Webhook-Signature', f'sha256={signature}')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if not 200 <= response.status < 300:
+            raise urllib.error.HTTPError(subscription.url, response.status, 'Unexpected status', response.headers, None)
+
+
+def deliver(subscription_id, batch_size=100, max_batches=10, retries=3, backoff=1.0, timeout=10,
+            visibility_window=60):
+    """
+    Deliver pending events to one subscriber in order, advancing its cursor
+    after each acknowledged batch. Stops at the first batch that still fails
+    after retries, so delivery resumes from the same event next time.
+    Returns the number of events delivered.
+    """
+    subscription = WebhookSubscription.objects.get(pk=subscription_id)
+    delivered = 0
+    for _ in range(max_batches):
+        events, cursor = pending_events(subscription, batch_size, visibility_window)
+        if cursor == subscription.last_event_id:
+            break
+
+        changes = {'last_event_id': cursor}
+        if events:
+            body = build_body(subscription, events)
+            for attempt in range(retries + 1):
+                try:
+                    post(subscription, body, timeout)
+                    break
+                except (urllib.error.URLError, http.client.HTTPException, OSError) as error:
+                    if attempt == retries:
+                        WebhookSubscription.objects.filter(pk=subscription.pk).update(
+                            failure_count=F('failure_count') + 1,
+                            last_error=str(error) or repr(error),
+                        )
+                        return delivered
+                    time.sleep(backoff * 2 ** attempt)
+            changes.update(last_delivered_at=timezone.now(), failure_count=0, last_error=None)
+
+        # Move the cursor only if nobody else advanced it meanwhile; a batch
+        # with none of the subscriber's event types just moves the cursor
+        WebhookSubscription.objects.filter(
+            pk=subscription.pk, last_event_id=subscription.last_event_id
+        ).update(**changes)
+        subscription.last_event_id = cursor
+        delivered += len(events)
+    return delivered
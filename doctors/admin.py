@@ -1,16 +1,39 @@
 from django.contrib import admin
-from .models import Doctor
+from core.admin_mixins import CachedAllValuesFieldListFilter, ScalableModelAdmin
+from .models import Doctor, DoctorAvailability
+
+
+class DoctorAvailabilityInline(admin.TabularInline):
+    """
+    Read-only view of the slots parsed from the availability text.
+    """
+    model = DoctorAvailability
+    extra = 0
+    can_delete = False
+    readonly_fields = ['weekday', 'start_time', 'end_time']
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(ScalableModelAdmin):
     """
     Admin configuration for Doctor model.
+    Searches are exact (email, license) or prefix (names) so they use the Upper() indexes.
     """
+    inlines = [DoctorAvailabilityInline]
     list_display = ['full_name', 'specialization', 'hospital_name', 'city', 'consultation_fee', 'is_active', 'created_by']
-    list_filter = ['specialization', 'city', 'is_active', 'created_at']
-    search_fields = ['first_name', 'last_name', 'email', 'license_number', 'hospital_name']
-    readonly_fields = ['created_at', 'updated_at']
+    list_filter = [
+        'specialization', ('city', CachedAllValuesFieldListFilter), 'is_active', 'is_deleted', 'created_at'
+    ]
+    search_fields = ['=email', '=license_number', '^last_name', '^first_name']
+    actions = ['restore_selected']
+    raw_id_fields = ['created_by']
+    readonly_fields = [
+        'active_mapping_count', 'inactive_mapping_count', 'completed_mapping_count',
+        'created_at', 'updated_at'
+    ]
     
     fieldsets = (
         ('Personal Information', {
@@ -25,8 +48,19 @@ class DoctorAdmin(admin.ModelAdmin):
         ('Consultation Details', {
             'fields': ('consultation_fee', 'availability', 'bio')
         }),
+        ('Patient Load', {
+            'fields': ('active_mapping_count', 'inactive_mapping_count', 'completed_mapping_count')
+        }),
         ('System Information', {
-            'fields': ('created_by', 'is_active', 'created_at', 'updated_at'),
+            'fields': ('created_by', 'is_active', 'is_deleted', 'deleted_at', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+
+    @admin.action(description='Restore selected soft-deleted doctors')
+    def restore_selected(self, request, queryset):
+        restored = 0
+        for obj in queryset.filter(is_deleted=True):
+            obj.restore()
+            restored += 1
+        self.message_user(request, f'Restored {restored} doctor(s).')
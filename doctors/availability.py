@@ -0,0 +1,227 @@
+import re
+from datetime import time
+from .indexing import DoctorIndex
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+DAY_ALIASES = {name[:3]: index for index, name in enumerate(WEEKDAYS)}
+DAY_ALIASES.update({'tues': 1, 'wednes': 2, 'thur': 3, 'thurs': 3})
+DAY_GROUPS = {
+    'weekdays': range(0, 5),
+    'weekends': range(5, 7),
+    'weekend': range(5, 7),
+    'daily': range(0, 7),
+    'everyday': range(0, 7),
+    'every day': range(0, 7),
+    'all days': range(0, 7),
+    '7 days': range(0, 7),
+}
+
+END_OF_DAY = time(23, 59, 59)
+MINUTES_PER_DAY = 24 * 60
+BUCKET_MINUTES = 30
+
+_DAY = r'(?:mon|tue|tues|wed|wednes|thu|thur|thurs|fri|sat|sun)[a-z]*\.?'
+_TIME = r'(\d{1,2})(?:[:.](\d{2}))?\s*([ap])?\.?m?\.?'
+_RANGE_SEPARATOR = r'\s*(?:-|–|—|to|until|till|through|thru)\s*'
+
+TOKEN_PATTERN = re.compile(
+    rf'(?P<time_range>{_TIME}{_RANGE_SEPARATOR}{_TIME})'
+    rf'|(?P<day_range>(?P<first_day>{_DAY}){_RANGE_SEPARATOR}(?P<last_day>{_DAY}))'
+    rf'|(?P<day>{_DAY})'
+    rf'|(?P<group>{"|".join(sorted(map(re.escape, DAY_GROUPS), key=len, reverse=True))})',
+    re.IGNORECASE,
+)
+
+
+def _weekday(token):
+    word = token.lower().rstrip('.')
+    for length in (6, 5, 4, 3):
+        if word[:length] in DAY_ALIASES:
+            return DAY_ALIASES[word[:length]]
+    return None
+
+
+def _to_minutes(hour, minute, meridiem):
+    hour = int(hour) % 12 + (12 if meridiem == 'p' else 0) if meridiem else int(hour)
+    return hour * 60 + int(minute or 0)
+
+
+def _time_range(match):
+    """
+    Convert a matched time range to (start, end) minutes after midnight.
+    """
+    start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = [
+        value.lower() if value and value.isalpha() else value
+        for value in match.group(2, 3, 4, 5, 6, 7)
+    ]
+    if int(start_hour) > 24 or int(end_hour) > 24:
+        return None
+
+    if end_meridiem and not start_meridiem:
+        # "9-5pm" means 9am-5pm, "1-5pm" means 1pm-5pm
+        start_meridiem = end_meridiem
+        if _to_minutes(start_hour, start_minute, start_meridiem) > _to_minutes(end_hour, end_minute, end_meridiem):
+            start_meridiem = 'a'
+
+    start = _to_minutes(start_hour, start_minute, start_meridiem)
+    end = _to_minutes(end_hour, end_minute, end_meridiem)
+    if not start_meridiem and not end_meridiem and end <= start and start < 12 * 60 and end + 12 * 60 > start:
+        # "9-5" written without am/pm
+        end += 12 * 60
+    return start, min(end, MINUTES_PER_DAY)
+
+
+def parse_availability(text):
+    """
+    Parse free-text working hours such as "Mon-Fri 9:00-17:00, Sat 10am-2pm"
+    into sorted (weekday, start_minute, end_minute) intervals.
+
+    Each time range applies to the days listed before it. Intervals that
+    cross midnight are split at midnight. Text that cannot be understood
+    yields an empty list.
+    """
+    intervals = set()
+    days, ranges = set(), []
+
+    def flush():
+        for weekday in days:
+            for start, end in ranges:
+                if end > start:
+                    intervals.add((weekday, start, end))
+                elif end < start:
+                    intervals.add((weekday, start, MINUTES_PER_DAY))
+                    if end:
+                        intervals.add(((weekday + 1) % 7, 0, end))
+
+    for match in TOKEN_PATTERN.finditer(text or ''):
+        if match.group('time_range'):
+            parsed = _time_range(match)
+            if parsed:
+                ranges.append(parsed)
+            continue
+
+        if ranges:
+            flush()
+            days, ranges = set(), []
+
+        if match.group('day_range'):
+            first, last = _weekday(match.group('first_day')), _weekday(match.group('last_day'))
+            if first is not None and last is not None:
+                days.update((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+        elif match.group('day'):
+            weekday = _weekday(match.group('day'))
+            if weekday is not None:
+                days.add(weekday)
+        else:
+            days.update(DAY_GROUPS[match.group('group').lower()])
+
+    flush()
+    return sorted(intervals)
+
+
+def minutes_to_time(minutes):
+    if minutes >= MINUTES_PER_DAY:
+        return END_OF_DAY
+    return time(minutes // 60, minutes % 60)
+
+
+def time_to_minutes(value):
+    if value == END_OF_DAY:
+        return MINUTES_PER_DAY
+    return value.hour * 60 + value.minute
+
+
+def sync_availability_slots(doctor):
+    """
+    Replace a doctor's structured slots with those parsed from doctor.availability.
+    """
+    from .models import DoctorAvailability
+    DoctorAvailability.objects.filter(doctor=doctor).delete()
+    DoctorAvailability.objects.bulk_create([
+        DoctorAvailability(
+            doctor=doctor,
+            weekday=weekday,
+            start_time=minutes_to_time(start),
+            end_time=minutes_to_time(end),
+        )
+        for weekday, start, end in parse_availability(doctor.availability)
+    ])
+
+
+class AvailabilityIndex(DoctorIndex):
+    """
+    In-memory index of active doctors' weekly slots.
+
+    Slots are bucketed by (weekday, half hour) and specialization, so a lookup
+    only inspects the slots overlapping the requested half hour of that
+    specialization.
+    """
+    cache_prefix = 'doctor-availability'
+
+    def _clear(self):
+        self._buckets = {}      # (weekday, bucket) -> {specialization: {slot}}
+        self._doctors = {}      # doctor_id -> (specialization, city lower-cased)
+        self._slots = {}        # doctor_id -> [(weekday, start, end)]
+
+    def _bucket_keys(self, weekday, start, end):
+        for bucket in range(start // BUCKET_MINUTES, (end - 1) // BUCKET_MINUTES + 1):
+            yield weekday, bucket
+
+    def _add(self, doctor_id, specialization, city, slots):
+        self._doctors[doctor_id] = (specialization, city.lower())
+        self._slots[doctor_id] = slots
+        for slot in slots:
+            for key in self._bucket_keys(*slot):
+                self._buckets.setdefault(key, {}).setdefault(specialization, set()).add((doctor_id,) + slot)
+
+    def _remove(self, doctor_id):
+        meta = self._doctors.pop(doctor_id, None)
+        for slot in self._slots.pop(doctor_id, []):
+            for key in self._bucket_keys(*slot):
+                self._buckets.get(key, {}).get(meta[0], set()).discard((doctor_id,) + slot)
+
+    def _load(self, doctor_filter):
+        from .models import Doctor, DoctorAvailability
+        slots = {}
+        rows = DoctorAvailability.objects.filter(
+            **{f'doctor__{key}': value for key, value in doctor_filter.items()}
+        ).values_list('doctor_id', 'weekday', 'start_time', 'end_time')
+        for doctor_id, weekday, start_time, end_time in rows.iterator(chunk_size=10000):
+            slots.setdefault(doctor_id, []).append(
+                (weekday, time_to_minutes(start_time), time_to_minutes(end_time))
+            )
+
+        doctors = Doctor.objects.filter(**doctor_filter).values_list('id', 'specialization', 'city')
+        for doctor_id, specialization, city in doctors.iterator(chunk_size=10000):
+            self._add(doctor_id, specialization, city, slots.get(doctor_id, []))
+
+    def _load_all(self):
+        self._load({'is_active': True, 'is_deleted': False})
+
+    def _reindex(self, doctor_ids):
+        for doctor_id in doctor_ids:
+            self._remove(doctor_id)
+        self._load({'is_active': True, 'is_deleted': False, 'pk__in': list(doctor_ids)})
+
+    def find(self, weekday, minute, specialization=None, city=None):
+        """
+        Return the ids of active doctors working at the given weekday and minute.
+        """
+        self.ensure_current()
+        city = city.lower() if city else None
+        found = set()
+        # Under the lock, so a concurrent re-index cannot change the buckets
+        # or drop a doctor's entry mid-lookup
+        with self._lock:
+            by_specialization = self._buckets.get((weekday, minute // BUCKET_MINUTES), {})
+            if specialization:
+                groups = [by_specialization.get(specialization, ())]
+            else:
+                groups = list(by_specialization.values())
+            for group in groups:
+                for doctor_id, _, start, end in group:
+                    if start <= minute < end and (city is None or city in self._doctors[doctor_id][1]):
+                        found.add(doctor_id)
+        return found
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,101 @@
+import random
+import threading
+from django.core.cache import cache
+from django.db import transaction
+
+
+class DoctorIndex:
+    """
+    Base class for per-process, in-memory indexes over doctors.
+
+    The index is built lazily on first use and kept current per doctor.
+    Every change is recorded in the shared cache as (version -> doctor id),
+    so a process that falls behind re-indexes only the doctors changed since
+    its version, and falls back to a full rebuild if it is too far behind or
+    the change log has expired.
+
+    The version starts from a random value whenever the cache has lost it,
+    so a flushed cache cannot be mistaken for a version a process already
+    holds.
+
+    Subclasses implement _clear(), _load_all() and _reindex(doctor_ids).
+    """
+    cache_prefix = None
+    max_replay = 1000
+    change_log_timeout = 3600
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+
+    @property
+    def _version_key(self):
+        return f'{self.cache_prefix}:version'
+
+    def _change_key(self, version):
+        return f'{self.cache_prefix}:change:{version}'
+
+    def _shared_version(self):
+        return cache.get_or_set(self._version_key, self._new_epoch, timeout=None)
+
+    @staticmethod
+    def _new_epoch():
+        return random.getrandbits(48)
+
+    def record_change(self, doctor_id):
+        """
+        Publish that a doctor changed so every process re-indexes it.
+        """
+        try:
+            version = cache.incr(self._version_key)
+        except ValueError:
+            # Lost from the cache: start a new epoch, which forces a rebuild
+            version = self._new_epoch()
+            cache.set(self._version_key, version, timeout=None)
+        cache.set(self._change_key(version), doctor_id, timeout=self.change_log_timeout)
+
+    def schedule_refresh(self, doctor_id):
+        transaction.on_commit(lambda: self.record_change(doctor_id))
+
+    def invalidate(self):
+        """
+        Force every process to rebuild on its next lookup.
+        """
+        with self._lock:
+            cache.set(self._version_key, self._shared_version() + self.max_replay + 1, timeout=None)
+            self._version = None
+
+    def rebuild(self):
+        with self._lock:
+            version = self._shared_version()
+            self._clear()
+            self._load_all()
+            self._version = version
+
+    def ensure_current(self):
+        """
+        Bring this process's copy up to date with the shared change log.
+        """
+        shared = self._shared_version()
+        if self._version == shared:
+            return
+        with self._lock:
+            if self._version is None or not 0 < shared - self._version <= self.max_replay:
+                self.rebuild()
+                return
+            keys = [self._change_key(version) for version in range(self._version + 1, shared + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) != len(keys):
+                self.rebuild()
+                return
+            self._reindex(set(changes.values()))
+            self._version = shared
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _load_all(self):
+        raise NotImplementedError
+
+    def _reindex(self, doctor_ids):
+        raise NotImplementedError
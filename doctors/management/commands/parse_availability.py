@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from doctors.availability import availability_index, minutes_to_time, parse_availability
+from doctors.models import Doctor, DoctorAvailability
+
+
+class Command(BaseCommand):
+    help = 'Parse every doctor\'s free-text availability into structured weekly slots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Doctors processed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        parsed = unparsed = 0
+
+        doctors = Doctor.objects.values_list('id', 'availability').order_by('id')
+        batch = []
+        for row in doctors.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                counts = self.sync_batch(batch)
+                parsed, unparsed = parsed + counts[0], unparsed + counts[1]
+                batch = []
+        if batch:
+            counts = self.sync_batch(batch)
+            parsed, unparsed = parsed + counts[0], unparsed + counts[1]
+
+        availability_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Parsed availability for {parsed} doctor(s); {unparsed} could not be parsed'
+        ))
+
+    def sync_batch(self, batch):
+        slots = []
+        unparsed = 0
+        for doctor_id, text in batch:
+            intervals = parse_availability(text)
+            if not intervals:
+                unparsed += 1
+            slots.extend(
+                DoctorAvailability(
+                    doctor_id=doctor_id,
+                    weekday=weekday,
+                    start_time=minutes_to_time(start),
+                    end_time=minutes_to_time(end),
+                )
+                for weekday, start, end in intervals
+            )
+
+        with transaction.atomic():
+            DoctorAvailability.objects.filter(doctor_id__in=[doctor_id for doctor_id, _ in batch]).delete()
+            DoctorAvailability.objects.bulk_create(slots, batch_size=1000)
+        return len(batch) - unparsed, unparsed
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
+from django.utils import timezone
+from core.concurrency import VersionedModelMixin
+from core.outbox import record_event
 
 
-class Doctor(models.Model):
+class Doctor(VersionedModelMixin, models.Model):
     """
     Doctor model to store doctor information.
     Doctors can be assigned to patients.
@@ -47,14 +51,33 @@ class Doctor(models.Model):
     availability = models.TextField(help_text="Working hours and days")
     bio = models.TextField(blank=True, null=True)
     
+    # Denormalized mapping counters (maintained by the mappings app)
+    active_mapping_count = models.PositiveIntegerField(default=0, editable=False)
+    inactive_mapping_count = models.PositiveIntegerField(default=0, editable=False)
+    completed_mapping_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # System fields
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doctors')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Optimistic concurrency; every update is conditional on and increments it
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    # Soft delete; rows are removed later by the purge_deleted command
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    deleted_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            # Exact and prefix admin searches compare UPPER(column)
+            models.Index(Upper('email'), name='doctor_email_upper_idx'),
+            models.Index(Upper('license_number'), name='doctor_license_upper_idx'),
+            models.Index(Upper('last_name'), name='doctor_last_name_upper_idx'),
+            models.Index(Upper('first_name'), name='doctor_first_name_upper_idx'),
+        ]
 
     def __str__(self):
         return f"Dr. {self.first_name} {self.last_name} - {self.specialization}"
@@ -62,3 +85,99 @@ class Doctor(models.Model):
     @property
     def full_name(self):
         return f"Dr. {self.first_name} {self.last_name}"
+
+    # Fields mirrored by the in-memory availability and recommendation indexes
+    INDEXED_FIELDS = (
+        'availability', 'specialization', 'city', 'state',
+        'experience_years', 'consultation_fee', 'is_active', 'is_deleted'
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so saves only re-index on real changes
+        instance._loaded_index_values = tuple(instance.__dict__.get(name) for name in cls.INDEXED_FIELDS)
+        instance._loaded_is_deleted = instance.__dict__.get('is_deleted')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the doctor, rebuilding the structured availability slots when the
+        free-text availability changes, re-indexing the doctor when any
+        indexed field changes, and writing an outbox event.
+        """
+        from .availability import availability_index, sync_availability_slots
+        from .recommendations import recommendation_index
+        adding = self._state.adding
+        was_deleted = getattr(self, '_loaded_is_deleted', None)
+        previous = getattr(self, '_loaded_index_values', None)
+        current = tuple(getattr(self, name) for name in self.INDEXED_FIELDS)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous is None or previous[0] != current[0]:
+                sync_availability_slots(self)
+            if previous != current:
+                availability_index.schedule_refresh(self.pk)
+                recommendation_index.schedule_refresh(self.pk)
+
+            if adding:
+                event_type = 'created'
+            elif self.is_deleted and not was_deleted:
+                event_type = 'deleted'
+            else:
+                event_type = 'updated'
+            record_event('doctor', self, event_type)
+        self._loaded_index_values = current
+        self._loaded_is_deleted = self.is_deleted
+
+    def soft_delete(self):
+        """
+        Hide the doctor with a single-row update. is_active is left alone so
+        restore() brings back a deliberately inactive doctor as inactive.
+        Related mappings are removed later in batches by purge_deleted.
+        """
+        self.is_deleted = True
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+
+    def restore(self):
+        """
+        Undo a soft delete that has not been purged yet. The doctor keeps
+        the is_active flag it had before the delete. The email and license
+        number stay reserved while the doctor is deleted, so they cannot
+        clash. Mappings already removed by the background purge are not
+        brought back.
+        """
+        self.is_deleted = False
+        self.deleted_at = None
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+
+
+class DoctorAvailability(models.Model):
+    """
+    A weekly working interval for a doctor, parsed from Doctor.availability.
+    Intervals crossing midnight are stored as two rows.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='availability_slots')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField(help_text="Exclusive; 23:59:59 means until midnight")
+
+    class Meta:
+        ordering = ['doctor', 'weekday', 'start_time']
+        indexes = [
+            models.Index(fields=['weekday', 'start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} - {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
@@ -0,0 +1,90 @@
+import heapq
+from collections import namedtuple
+from .indexing import DoctorIndex
+
+Candidate = namedtuple('Candidate', ['doctor_id', 'city', 'experience_years', 'consultation_fee', 'active_patients'])
+
+# Relative weight of each ranking signal; every signal is scaled to 0..1
+WEIGHTS = {
+    'proximity': 0.35,
+    'load': 0.30,
+    'experience': 0.20,
+    'fee': 0.15,
+}
+EXPERIENCE_CAP = 30         # years beyond this add nothing
+FEE_SCALE = 500             # fee at which the fee signal drops to 0.5
+LOAD_SCALE = 10             # active patients at which the load signal drops to 0.5
+
+
+def score_candidate(candidate, city):
+    """
+    Score a candidate for a patient in the given (lower-cased) city.
+    Returns (total, breakdown).
+    """
+    breakdown = {
+        'proximity': 1.0 if city and candidate.city == city else 0.0,
+        'load': 1 / (1 + candidate.active_patients / LOAD_SCALE),
+        'experience': min(candidate.experience_years, EXPERIENCE_CAP) / EXPERIENCE_CAP,
+        'fee': 1 / (1 + candidate.consultation_fee / FEE_SCALE),
+    }
+    total = sum(WEIGHTS[name] * value for name, value in breakdown.items())
+    return round(total, 4), {name: round(value, 4) for name, value in breakdown.items()}
+
+
+class RecommendationIndex(DoctorIndex):
+    """
+    In-memory candidate lists of active doctors keyed by (specialization, state).
+
+    A recommendation only scores the doctors in the patient's bucket, so its
+    cost depends on the bucket size, not on the total number of doctors.
+    Doctor edits and active-mapping changes re-index just that doctor.
+    """
+    cache_prefix = 'doctor-recommendations'
+
+    def _clear(self):
+        self._buckets = {}      # (specialization, state lower-cased) -> {doctor_id: Candidate}
+        self._locations = {}    # doctor_id -> bucket key
+
+    def _load(self, doctor_filter):
+        from .models import Doctor
+        rows = Doctor.objects.filter(**doctor_filter).values_list(
+            'id', 'specialization', 'state', 'city', 'experience_years',
+            'consultation_fee', 'active_mapping_count'
+        )
+        for doctor_id, specialization, state, city, experience, fee, active in rows.iterator(chunk_size=10000):
+            key = (specialization, state.strip().lower())
+            self._buckets.setdefault(key, {})[doctor_id] = Candidate(
+                doctor_id, city.strip().lower(), experience, float(fee), active
+            )
+            self._locations[doctor_id] = key
+
+    def _load_all(self):
+        self._load({'is_active': True, 'is_deleted': False})
+
+    def _reindex(self, doctor_ids):
+        for doctor_id in doctor_ids:
+            key = self._locations.pop(doctor_id, None)
+            if key is not None:
+                self._buckets[key].pop(doctor_id, None)
+        self._load({'is_active': True, 'is_deleted': False, 'pk__in': list(doctor_ids)})
+
+    def recommend(self, specialization, state, city=None, exclude=(), limit=10):
+        """
+        Return up to limit (score, breakdown, candidate) tuples, best first.
+        """
+        self.ensure_current()
+        city = city.strip().lower() if city else None
+        # Copy the bucket under the lock; scoring runs outside it
+        with self._lock:
+            bucket = self._buckets.get((specialization, (state or '').strip().lower()), {})
+            candidates = list(bucket.values())
+
+        scored = (
+            score_candidate(candidate, city) + (candidate,)
+            for candidate in candidates
+            if candidate.doctor_id not in exclude
+        )
+        return heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[2].doctor_id))
+
+
+recommendation_index = RecommendationIndex()
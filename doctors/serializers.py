@@ -1,5 +1,17 @@
 from rest_framework import serializers
-from .models import Doctor
+from core.concurrency import ChangedFieldsUpdateMixin
+from .models import Doctor, DoctorAvailability
+
+
+class DoctorAvailabilitySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a structured weekly availability slot.
+    """
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+
+    class Meta:
+        model = DoctorAvailability
+        fields = ['weekday', 'weekday_display', 'start_time', 'end_time']
 
 
 class DoctorSerializer(serializers.ModelSerializer):
@@ -10,6 +22,7 @@ class DoctorSerializer(serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     created_by = serializers.StringRelatedField(read_only=True)
     specialization_display = serializers.CharField(source='get_specialization_display', read_only=True)
+    availability_slots = DoctorAvailabilitySerializer(many=True, read_only=True)
 
     class Meta:
         model = Doctor
@@ -17,32 +30,50 @@ class DoctorSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
             'license_number', 'specialization', 'specialization_display',
             'experience_years', 'qualification', 'hospital_name', 'hospital_address',
-            'city', 'state', 'consultation_fee', 'availability', 'bio',
-            'created_by', 'created_at', 'updated_at', 'is_active'
+            'city', 'state', 'consultation_fee', 'availability', 'availability_slots', 'bio',
+            'active_mapping_count', 'inactive_mapping_count', 'completed_mapping_count',
+            'created_by', 'created_at', 'updated_at', 'is_active', 'version'
+        ]
+        read_only_fields = [
+            'id', 'active_mapping_count', 'inactive_mapping_count', 'completed_mapping_count',
+            'created_by', 'created_at', 'updated_at', 'version'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        # Uniqueness is checked by the validate_* methods, which report soft-deleted holders
+        extra_kwargs = {'email': {'validators': []}, 'license_number': {'validators': []}}
 
     def validate_email(self, value):
         """
         Check that the email is unique, except for the current instance.
+        Soft-deleted doctors keep theirs until purge_deleted removes them.
         """
         instance = getattr(self, 'instance', None)
         if instance and instance.email == value:
             return value
         
-        if Doctor.objects.filter(email=value).exists():
+        is_deleted = Doctor.objects.filter(email=value).values_list('is_deleted', flat=True).first()
+        if is_deleted:
+            raise serializers.ValidationError(
+                "A deleted doctor still holds this email until it is purged."
+            )
+        if is_deleted is not None:
             raise serializers.ValidationError("A doctor with this email already exists.")
         return value
 
     def validate_license_number(self, value):
         """
         Check that the license number is unique, except for the current instance.
+        Soft-deleted doctors keep theirs until purge_deleted removes them.
         """
         instance = getattr(self, 'instance', None)
         if instance and instance.license_number == value:
             return value
         
-        if Doctor.objects.filter(license_number=value).exists():
+        is_deleted = Doctor.objects.filter(license_number=value).values_list('is_deleted', flat=True).first()
+        if is_deleted:
+            raise serializers.ValidationError(
+                "A deleted doctor still holds this license number until it is purged."
+            )
+        if is_deleted is not None:
             raise serializers.ValidationError("A doctor with this license number already exists.")
         return value
 
@@ -54,10 +85,10 @@ class DoctorCreateSerializer(DoctorSerializer):
     pass
 
 
-class DoctorUpdateSerializer(DoctorSerializer):
+class DoctorUpdateSerializer(ChangedFieldsUpdateMixin, DoctorSerializer):
     """
     Serializer for updating existing doctors.
-    Makes all fields optional for partial updates.
+    Makes all fields optional for partial updates and writes only changed fields.
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
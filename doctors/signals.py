@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.outbox import record_event
+from core.response_cache import DOCTORS_SCOPE, schedule_bump
+from .availability import availability_index
+from .models import Doctor
+from .recommendations import recommendation_index
+
+
+@receiver(post_delete, sender=Doctor)
+def remove_from_doctor_indexes(sender, instance, **kwargs):
+    """
+    Drop a deleted doctor from the in-memory indexes once the delete is committed.
+    """
+    availability_index.schedule_refresh(instance.pk)
+    recommendation_index.schedule_refresh(instance.pk)
+    # Soft-deleted doctors already published their 'deleted' event
+    if not instance.is_deleted:
+        record_event('doctor', instance, 'deleted')
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidate_doctor_responses(sender, instance, **kwargs):
+    """
+    Drop every cached list that embeds doctor details once the write is committed.
+    """
+    schedule_bump(DOCTORS_SCOPE)
@@ -1,3 +1,260 @@
-from django.test import TestCase
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from core.testing import IsolatedAPITestCase, QueryCountTestCase, make_doctor, make_mapping, make_patient
+from .availability import availability_index, parse_availability
+from .models import Doctor
+from .recommendations import recommendation_index
 
-# Create your tests here.
+
+class DoctorQueryCountTests(QueryCountTestCase):
+    """
+    Doctor endpoints must issue a constant number of queries
+    regardless of how many doctors exist.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.patient = make_patient(self.user, 0)
+        self.doctors = []
+
+    def grow(self, rows):
+        while len(self.doctors) < rows:
+            self.doctors.append(make_doctor(self.user, len(self.doctors)))
+
+    def grow_with_mappings(self, rows):
+        while len(self.doctors) < rows:
+            doctor = make_doctor(self.user, len(self.doctors))
+            make_mapping(self.user, self.patient, doctor)
+            self.doctors.append(doctor)
+
+    def test_doctor_list(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/doctors/'))
+
+    def test_doctor_detail(self):
+        self.assertConstantQueries(
+            self.grow, lambda: self.client.get(f'/api/doctors/{self.doctors[-1].pk}/')
+        )
+
+    def test_doctor_create(self):
+        created = []
+
+        def create():
+            created.append(len(created))
+            return self.client.post('/api/doctors/', {
+                'first_name': 'New', 'last_name': 'Doctor', 'email': f'new{len(created)}@example.com',
+                'phone': '555-0400', 'license_number': f'NEW-{len(created)}', 'specialization': 'neurology',
+                'experience_years': 5, 'qualification': 'MD', 'hospital_name': 'City Hospital',
+                'hospital_address': '4 Main Street', 'city': 'Austin', 'state': 'TX',
+                'consultation_fee': '150.00', 'availability': 'Mon-Fri 9:00-17:00',
+            }, format='json')
+        self.assertConstantQueries(self.grow, create, expected_status=201)
+
+    def test_doctor_update(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.put(
+                f'/api/doctors/{self.doctors[-1].pk}/', {'availability': 'Sat 10am-2pm'}, format='json'
+            )
+        )
+
+    def test_doctor_delete(self):
+        self.assertConstantQueries(
+            self.grow, lambda: self.client.delete(f'/api/doctors/{self.doctors[-1].pk}/'), expected_status=204
+        )
+
+    def test_doctor_stats(self):
+        self.assertConstantQueries(
+            self.grow_with_mappings,
+            lambda: self.client.get(f'/api/doctors/{self.doctors[0].pk}/stats/')
+        )
+
+    def test_doctor_available(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.get('/api/doctors/available/?day=monday&time=10:00&limit=200')
+        )
+
+    def test_doctor_recommend(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.get(
+                f'/api/doctors/recommend/?patient_id={self.patient.pk}&specialization=cardiology&limit=50'
+            )
+        )
+
+    def test_doctor_specializations(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/doctors/specializations/'))
+
+
+class ParseAvailabilityTests(SimpleTestCase):
+    def test_day_range(self):
+        self.assertEqual(parse_availability('Mon-Fri 9:00-17:00'), [(day, 540, 1020) for day in range(5)])
+
+    def test_meridiem_and_bare_hours(self):
+        self.assertEqual(parse_availability('Sat 10am-2pm'), [(5, 600, 840)])
+        self.assertEqual(parse_availability('Tue 9-5'), [(1, 540, 1020)])
+
+    def test_day_groups_and_wrapping_day_ranges(self):
+        self.assertEqual(parse_availability('Weekends 9am-1pm'), [(5, 540, 780), (6, 540, 780)])
+        self.assertEqual(parse_availability('Fri-Mon 8-12'), [(0, 480, 720), (4, 480, 720), (5, 480, 720), (6, 480, 720)])
+
+    def test_ranges_apply_to_the_days_before_them(self):
+        self.assertEqual(
+            parse_availability('Mon, Wed 9-12, Fri 14:00-18:00'),
+            [(0, 540, 720), (2, 540, 720), (4, 840, 1080)],
+        )
+
+    def test_interval_crossing_midnight_is_split(self):
+        self.assertEqual(parse_availability('Mon 22:00-02:00'), [(0, 1320, 1440), (1, 0, 120)])
+
+    def test_unparseable_text(self):
+        self.assertEqual(parse_availability('by appointment'), [])
+        self.assertEqual(parse_availability(None), [])
+
+
+class AvailabilityIndexTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.weekday = make_doctor(self.user, 1, availability='Mon-Fri 9:00-17:00')
+        self.weekend = make_doctor(self.user, 2, availability='Sat 10am-2pm', city='Dallas')
+        self.neurologist = make_doctor(self.user, 3, availability='Mon-Fri 9:00-17:00', specialization='neurology')
+
+    def test_find_by_slot_specialization_and_city(self):
+        self.assertEqual(availability_index.find(0, 10 * 60), {self.weekday.pk, self.neurologist.pk})
+        self.assertEqual(availability_index.find(0, 17 * 60), set())
+        self.assertEqual(availability_index.find(0, 10 * 60, specialization='neurology'), {self.neurologist.pk})
+        self.assertEqual(availability_index.find(5, 11 * 60, city='DALLAS'), {self.weekend.pk})
+        self.assertEqual(availability_index.find(5, 11 * 60, city='Austin'), set())
+
+    def test_index_follows_committed_changes(self):
+        self.assertEqual(availability_index.find(5, 11 * 60), {self.weekend.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.weekday.availability = 'Sat 9:00-12:00'
+            self.weekday.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.weekend.soft_delete()
+        self.assertEqual(availability_index.find(5, 11 * 60), {self.weekday.pk})
+        self.assertEqual(availability_index.find(0, 10 * 60), {self.neurologist.pk})
+
+    def test_available_limit_is_at_least_one(self):
+        for limit in ('0', '-5'):
+            response = self.client.get('/api/doctors/available/', {'day': 'monday', 'time': '10:00', 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], 2)
+            self.assertEqual(len(response.json()['doctors']), 1)
+
+
+class RecommendationTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.patient = make_patient(self.user, 0)
+        # Identical except for their load, so load alone decides the order
+        self.doctors = [
+            make_doctor(self.user, index, experience_years=10, consultation_fee=100) for index in range(3)
+        ]
+        self.others = [make_patient(self.user, index) for index in range(1, 6)]
+
+    def assign(self, doctor, patients):
+        with self.captureOnCommitCallbacks(execute=True):
+            for patient in patients:
+                make_mapping(self.user, patient, doctor)
+
+    def ranking(self, **params):
+        response = self.client.get(
+            '/api/doctors/recommend/', {'patient_id': self.patient.pk, 'specialization': 'cardiology', **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [item['doctor']['id'] for item in response.json()['recommendations']]
+
+    def test_least_loaded_doctor_ranks_first(self):
+        self.assign(self.doctors[0], self.others[:3])
+        self.assign(self.doctors[1], self.others[:1])
+        self.assertEqual(self.ranking(), [self.doctors[2].pk, self.doctors[1].pk, self.doctors[0].pk])
+
+    def test_index_follows_committed_changes(self):
+        self.assertEqual(self.ranking()[0], self.doctors[0].pk)
+        self.assign(self.doctors[0], self.others[:2])
+        self.assertEqual(self.ranking()[0], self.doctors[1].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctors[1].state = 'CA'
+            self.doctors[1].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctors[2].soft_delete()
+        self.assertEqual(self.ranking(), [self.doctors[0].pk])
+        self.assertEqual(
+            [candidate.doctor_id for _, _, candidate in recommendation_index.recommend('cardiology', 'ca')],
+            [self.doctors[1].pk],
+        )
+
+    def test_recommend_limit_is_at_least_one(self):
+        self.assertEqual(len(self.ranking(limit=0)), 1)
+
+
+class DoctorSoftDeleteTests(IsolatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.doctor = make_doctor(self.user, 0)
+
+    def register(self, **changes):
+        return self.client.post('/api/doctors/', {
+            'first_name': 'New', 'last_name': 'Doctor', 'email': 'new@example.com',
+            'phone': '555-0400', 'license_number': 'NEW-1', 'specialization': 'cardiology',
+            'experience_years': 5, 'qualification': 'MD', 'hospital_name': 'City Hospital',
+            'hospital_address': '4 Main Street', 'city': 'Austin', 'state': 'TX',
+            'consultation_fee': '150.00', 'availability': 'Mon-Fri 9:00-17:00', **changes,
+        }, format='json')
+
+    def test_deleted_doctor_is_hidden(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/doctors/{self.doctor.pk}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/doctors/{self.doctor.pk}/').status_code, 404)
+        self.assertEqual(availability_index.find(0, 10 * 60), set())
+
+    def test_deleted_doctor_keeps_its_email_and_license_until_purged(self):
+        self.doctor.soft_delete()
+        response = self.register(email=self.doctor.email, license_number=self.doctor.license_number)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'email': ['A deleted doctor still holds this email until it is purged.'],
+            'license_number': ['A deleted doctor still holds this license number until it is purged.'],
+        })
+        self.assertEqual(self.register(license_number=self.doctor.license_number).status_code, 400)
+
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(Doctor.objects.filter(pk=self.doctor.pk).exists())
+        response = self.register(email=self.doctor.email, license_number=self.doctor.license_number)
+        self.assertEqual(response.status_code, 201)
+
+    def test_live_duplicate_is_rejected(self):
+        response = self.register(license_number=self.doctor.license_number)
+        self.assertEqual(response.json(), {'license_number': ['A doctor with this license number already exists.']})
+
+    def test_restore_brings_the_doctor_back(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.soft_delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Doctor.objects.get(pk=self.doctor.pk).restore()
+        self.assertEqual(self.client.get(f'/api/doctors/{self.doctor.pk}/').json()['is_active'], True)
+        self.assertEqual(availability_index.find(0, 10 * 60), {self.doctor.pk})
+
+    def test_restore_keeps_an_inactive_doctor_inactive(self):
+        Doctor.objects.filter(pk=self.doctor.pk).update(is_active=False)
+        doctor = Doctor.objects.get(pk=self.doctor.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.soft_delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Doctor.objects.get(pk=self.doctor.pk).restore()
+        doctor.refresh_from_db()
+        self.assertEqual((doctor.is_active, doctor.is_deleted), (False, False))
+        self.assertEqual(self.client.get(f'/api/doctors/{self.doctor.pk}/').status_code, 404)
+        self.assertEqual(availability_index.find(0, 10 * 60), set())
@@ -4,5 +4,8 @@ from . import views
 urlpatterns = [
     path('doctors/', views.doctor_list_create, name='doctor-list-create'),
     path('doctors/<int:pk>/', views.doctor_detail, name='doctor-detail'),
+    path('doctors/<int:pk>/stats/', views.doctor_stats, name='doctor-stats'),
+    path('doctors/available/', views.doctor_available, name='doctor-available'),
+    path('doctors/recommend/', views.doctor_recommend, name='doctor-recommend'),
     path('doctors/specializations/', views.doctor_specializations, name='doctor-specializations'),
 ]
@@ -3,7 +3,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from core.concurrency import VersionConflict, check_if_match, precondition_failed, version_etag
+from core.idempotency import idempotent
+from core.queue import enqueue
+from core.reference import ReferenceDocument, choices_list, reference_view
+from .availability import WEEKDAYS, availability_index
+from patients.models import Patient
 from .models import Doctor
+from .recommendations import recommendation_index
 from .serializers import (
     DoctorSerializer, 
     DoctorCreateSerializer, 
@@ -14,6 +21,7 @@ from .serializers import (
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def doctor_list_create(request):
     """
     GET: List all active doctors (public list for all users)
@@ -21,7 +29,7 @@ def doctor_list_create(request):
     """
     if request.method == 'GET':
         # Get all active doctors (not filtered by user)
-        doctors = Doctor.objects.filter(is_active=True)
+        doctors = Doctor.objects.filter(is_active=True, is_deleted=False)
         
         # Filter by specialization if provided
         specialization = request.query_params.get('specialization', None)
@@ -60,46 +68,192 @@ def doctor_detail(request, pk):
     GET: Retrieve a specific doctor (public access)
     PUT: Update a specific doctor (only creator can update)
     DELETE: Delete a specific doctor (only creator can delete)
+
+    GET returns the row version as ETag; PUT and DELETE honour If-Match and
+    answer 412 when the doctor was changed since that version.
     """
     # For GET request, allow access to any active doctor
     if request.method == 'GET':
-        doctor = get_object_or_404(Doctor, pk=pk, is_active=True)
+        doctor = get_object_or_404(Doctor, pk=pk, is_active=True, is_deleted=False)
         serializer = DoctorSerializer(doctor)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': version_etag(doctor)})
     
     # For PUT and DELETE, only allow access to doctors created by the current user
     else:
-        doctor = get_object_or_404(Doctor, pk=pk, created_by=request.user)
+        doctor = get_object_or_404(Doctor, pk=pk, created_by=request.user, is_deleted=False)
+        conflict = check_if_match(request, doctor)
+        if conflict:
+            return conflict
         
         if request.method == 'PUT':
             serializer = DoctorUpdateSerializer(doctor, data=request.data, partial=True)
             if serializer.is_valid():
-                updated_doctor = serializer.save()
+                try:
+                    updated_doctor = serializer.save()
+                except VersionConflict:
+                    return precondition_failed(doctor)
                 response_serializer = DoctorSerializer(updated_doctor)
                 return Response({
                     'message': 'Doctor updated successfully',
                     'doctor': response_serializer.data
-                })
+                }, headers={'ETag': version_etag(updated_doctor)})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         elif request.method == 'DELETE':
             doctor_name = doctor.full_name
-            doctor.delete()
+            try:
+                doctor.soft_delete()
+            except VersionConflict:
+                return precondition_failed(doctor)
+            enqueue('core.purge_mappings', {'parent': 'doctor', 'id': doctor.pk})
             return Response({
                 'message': f'Doctor {doctor_name} deleted successfully'
             }, status=status.HTTP_204_NO_CONTENT)
 
 
+SPECIALIZATIONS = ReferenceDocument({
+    'specializations': choices_list(Doctor.SPECIALIZATION_CHOICES)
+})
+
+doctor_specializations = reference_view(
+    SPECIALIZATIONS,
+    doc="""
+    Get list of all available specializations.
+    Served from pre-encoded bytes with an ETag; public and cacheable.
+    """
+)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def doctor_specializations(request):
+def doctor_stats(request, pk):
     """
-    Get list of all available specializations.
+    Get the precomputed mapping counters for an active doctor.
+    Reads a single row, so the cost does not grow with the number of mappings.
+    """
+    stats = get_object_or_404(
+        Doctor.objects.values(
+            'id', 'active_mapping_count', 'inactive_mapping_count', 'completed_mapping_count'
+        ),
+        pk=pk,
+        is_active=True,
+        is_deleted=False
+    )
+    return Response({
+        'doctor': stats['id'],
+        'active_patients': stats['active_mapping_count'],
+        'inactive_patients': stats['inactive_mapping_count'],
+        'completed_patients': stats['completed_mapping_count'],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def doctor_available(request):
     """
-    specializations = [
-        {'value': choice[0], 'label': choice[1]} 
-        for choice in Doctor.SPECIALIZATION_CHOICES
-    ]
+    Find active doctors working at a given day and time.
+    Query params: day (monday-sunday or 0-6), time (HH:MM), specialization, city.
+    Answered from the in-memory availability index; only the returned page
+    of doctors is read from the database.
+    """
+    day = request.query_params.get('day', '').strip().lower()
+    time_value = request.query_params.get('time', '').strip()
+
+    if day.isdigit() and int(day) < 7:
+        weekday = int(day)
+    else:
+        weekday = next((index for index, name in enumerate(WEEKDAYS) if day and name.startswith(day[:3])), None)
+    if weekday is None:
+        return Response({
+            'error': 'day must be a weekday name (e.g. tuesday) or a number 0-6 (Monday=0)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        hour, minute = (int(part) for part in time_value.split(':'))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError
+    except ValueError:
+        return Response({
+            'error': 'time must be in HH:MM format'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 50)), 200))
+    except ValueError:
+        limit = 50
+
+    doctor_ids = sorted(availability_index.find(
+        weekday,
+        hour * 60 + minute,
+        specialization=request.query_params.get('specialization') or None,
+        city=request.query_params.get('city') or None,
+    ))
+    doctors = Doctor.objects.filter(pk__in=doctor_ids[:limit], is_active=True, is_deleted=False).order_by('id')
+    serializer = DoctorListSerializer(doctors, many=True)
+    return Response({
+        'day': WEEKDAYS[weekday],
+        'time': f'{hour:02d}:{minute:02d}',
+        'count': len(doctor_ids),
+        'doctors': serializer.data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def doctor_recommend(request):
+    """
+    Recommend active doctors for one of the user's patients.
+    Query params: patient_id, specialization, limit.
+    Doctors in the patient's state are ranked by same-city proximity,
+    current active-patient load, experience and consultation fee.
+    """
+    patient_id = request.query_params.get('patient_id', '')
+    specialization = request.query_params.get('specialization', '')
+    if not patient_id.isdigit():
+        return Response({
+            'error': 'patient_id is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if specialization not in dict(Doctor.SPECIALIZATION_CHOICES):
+        return Response({
+            'error': 'A valid specialization is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+
+    patient = get_object_or_404(
+        Patient.objects.only('id', 'city', 'state'),
+        pk=patient_id,
+        created_by=request.user,
+        is_deleted=False
+    )
+    # Skip doctors the patient is already actively assigned to
+    assigned = set(
+        patient.doctor_mappings.filter(status='active').values_list('doctor_id', flat=True)
+    )
+
+    ranked = recommendation_index.recommend(
+        specialization, patient.state, patient.city, exclude=assigned, limit=limit
+    )
+    doctors = Doctor.objects.in_bulk([candidate.doctor_id for _, _, candidate in ranked])
+
+    recommendations = []
+    for score, breakdown, candidate in ranked:
+        doctor = doctors.get(candidate.doctor_id)
+        if doctor is None or not doctor.is_active or doctor.is_deleted:
+            continue
+        recommendations.append({
+            'doctor': DoctorListSerializer(doctor).data,
+            'active_patients': candidate.active_patients,
+            'score': score,
+            'score_breakdown': breakdown,
+        })
+
     return Response({
-        'specializations': specializations
+        'patient': patient.id,
+        'specialization': specialization,
+        'count': len(recommendations),
+        'recommendations': recommendations
     })
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,8 +28,11 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1').split(','
 
 # Application definition
 
+# API-only workers can set ENABLE_ADMIN=False to skip importing the admin
+# and every app's admin.py at startup
+ENABLE_ADMIN = config('ENABLE_ADMIN', default=True, cast=bool)
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -46,9 +49,14 @@ INSTALLED_APPS = [
     'patients',
     'doctors',
     'mappings',
+    'core',
 ]
 
+if ENABLE_ADMIN:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +65,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RateLimitMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'healthcare_project.urls'
@@ -79,6 +89,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'healthcare_project.wsgi.application'
 
+# Prime URL resolvers, serializers and DB connections when the WSGI
+# application is loaded, before the worker accepts requests (core.warmup).
+# Off by default: with gunicorn --preload it would open connections before
+# forking; enable it for non-preloaded workers or use a post_fork hook
+WARMUP_ON_START = config('WARMUP_ON_START', default=False, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -101,6 +117,10 @@ if DATABASE_URL and DATABASE_URL.startswith('postgresql://'):
             'PASSWORD': url.password,
             'HOST': url.hostname,
             'PORT': port,
+            # Keep connections open between requests so the ones opened by
+            # the startup warmup are reused (0 closes them after each request)
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'sslmode': 'require',
             },
@@ -115,6 +135,34 @@ else:
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+
+# Shared cache (generation counters, analytics, index change logs).
+# Set REDIS_URL when running more than one process; the in-memory
+# fallback is per process and only suitable for development.
+REDIS_URL = config('REDIS_URL', default=None)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    # Per-process store for cached list responses. LocMemCache evicts the
+    # least recently used entries once MAX_ENTRIES is exceeded.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': config('RESPONSE_CACHE_MAX_ENTRIES', default=5000, cast=int),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -168,6 +216,9 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.TokenBucketThrottle',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
@@ -214,3 +265,65 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Rate Limiting (token bucket per client and view)
+# Format: "<requests>/<second|minute|hour|day>[:<burst>]", keyed by view name
+RATE_LIMITS = {
+    'default': config('RATE_LIMIT_DEFAULT', default='600/min:100'),
+    'register': config('RATE_LIMIT_REGISTER', default='10/hour:5'),
+    'login': config('RATE_LIMIT_LOGIN', default='20/min:10'),
+    'patient_list_create': config('RATE_LIMIT_PATIENT_LIST', default='120/min:30'),
+    'doctor_list_create': config('RATE_LIMIT_DOCTOR_LIST', default='120/min:30'),
+    'mapping_list_create': config('RATE_LIMIT_MAPPING_LIST', default='120/min:30'),
+}
+# Cache alias for sharing buckets across processes (default: per-process buckets)
+RATE_LIMIT_CACHE = config('RATE_LIMIT_CACHE', default=None)
+
+# Maximum number of sub-requests accepted by /api/batch/
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+
+# Idempotency-Key Configuration
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)  # seconds
+# Seconds before an unfinished request's claim on a key may be taken over
+IDEMPOTENCY_CLAIM_LEASE = config('IDEMPOTENCY_CLAIM_LEASE', default=60, cast=int)
+
+# Response Cache Configuration (patient and mapping lists)
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=600, cast=int)  # seconds
+
+# Analytics Configuration
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=300, cast=int)  # seconds
+
+# Compressed Text Configuration (Patient.allergies, Patient.medical_history)
+COMPRESSED_TEXT_MIN_LENGTH = config('COMPRESSED_TEXT_MIN_LENGTH', default=1024, cast=int)  # characters
+COMPRESSED_TEXT_CODEC = config('COMPRESSED_TEXT_CODEC', default='zlib')  # 'zlib' or 'zstd' (needs zstandard)
+
+# Metrics Configuration (/metrics, Prometheus text format)
+# With several gunicorn workers, point this at an empty directory shared by
+# them (wiped before each start) so every scrape reports all workers
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default=None)
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=1.0, cast=float)  # seconds
+# Bearer token required by /metrics; empty leaves it open (restrict at the proxy)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Profiling Configuration (X-Profile header from staff, or sampled per view)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_MAX_ENTRIES = config('PROFILE_MAX_ENTRIES', default=50, cast=int)  # ring buffer size
+PROFILE_SAMPLE_INTERVAL = config('PROFILE_SAMPLE_INTERVAL', default=0.001, cast=float)  # seconds
+# Fraction of requests profiled per view, e.g. "mapping_list_create=0.01,doctor-detail=0.05"
+PROFILE_SAMPLE_RATES = {
+    view: float(rate)
+    for view, rate in (item.split('=', 1) for item in config('PROFILE_SAMPLE_RATES', default='', cast=Csv()))
+}
+
+# Admin Configuration (changelists over large tables, see core.admin_mixins)
+# Below this many planner-estimated rows the changelist counts exactly
+ADMIN_EXACT_COUNT_LIMIT = config('ADMIN_EXACT_COUNT_LIMIT', default=10000, cast=int)
+ADMIN_FILTER_CACHE_TIMEOUT = config('ADMIN_FILTER_CACHE_TIMEOUT', default=300, cast=int)  # seconds
+
+# Health Check Configuration (/healthz liveness, /readyz readiness)
+READINESS_PROBE_INTERVAL = config('READINESS_PROBE_INTERVAL', default=5, cast=float)  # seconds
+# /readyz reports "degraded" (503) at this many concurrent requests per process (0: no limit)
+READINESS_MAX_IN_FLIGHT = config('READINESS_MAX_IN_FLIGHT', default=0, cast=int)
+# ... or when this fraction of PostgreSQL max_connections is in use
+READINESS_MAX_DB_CONNECTION_USAGE = config('READINESS_MAX_DB_CONNECTION_USAGE', default=0.9, cast=float)
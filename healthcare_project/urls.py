@@ -14,13 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
+from core.views import healthz, metrics_view, readyz
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
     path('api/auth/', include('authentication.urls')),
     path('api/', include('patients.urls')),
     path('api/', include('doctors.urls')),
     path('api/', include('mappings.urls')),
+    path('api/', include('core.urls')),
 ]
+
+if settings.ENABLE_ADMIN:
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
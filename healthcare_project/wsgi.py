@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthcare_project.settings')
 
 application = get_wsgi_application()
+
+# Off by default; with gunicorn --preload leave it off and call
+# core.warmup.warmup() from a post_fork hook instead, so database
+# connections are not opened before forking and shared between workers
+if settings.WARMUP_ON_START:
+    from core.warmup import warmup
+    warmup()
@@ -1,18 +1,21 @@
 from django.contrib import admin
-from .models import PatientDoctorMapping
+from core.admin_mixins import CachedRelatedOnlyFieldListFilter, EstimatedCountPaginator, ScalableModelAdmin
+from patients.models import Patient
+from .models import ArchivedMapping, MappingHistory, PatientDoctorMapping
 
 
 @admin.register(PatientDoctorMapping)
-class PatientDoctorMappingAdmin(admin.ModelAdmin):
+class PatientDoctorMappingAdmin(ScalableModelAdmin):
     """
     Admin configuration for PatientDoctorMapping model.
+    Patients and doctors are picked with autocomplete widgets rather than
+    a <select> listing every row.
     """
     list_display = ['patient', 'doctor', 'status', 'assigned_date', 'created_by']
-    list_filter = ['status', 'assigned_date', 'created_by']
-    search_fields = [
-        'patient__first_name', 'patient__last_name',
-        'doctor__first_name', 'doctor__last_name'
-    ]
+    list_filter = ['status', 'assigned_date', ('created_by', CachedRelatedOnlyFieldListFilter)]
+    search_fields = ['=patient__email', '^patient__last_name', '^doctor__last_name']
+    autocomplete_fields = ['patient', 'doctor']
+    raw_id_fields = ['created_by']
     readonly_fields = ['assigned_date', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -29,4 +32,48 @@ class PatientDoctorMappingAdmin(admin.ModelAdmin):
         """
         Optimize queries by selecting related objects.
         """
-        return super().get_queryset(request).select_related('patient', 'doctor', 'created_by')
+        return super().get_queryset(request).select_related('patient', 'doctor', 'created_by').defer(
+            *(f'patient__{name}' for name in Patient.HEAVY_FIELDS)
+        )
+
+
+@admin.register(MappingHistory)
+class MappingHistoryAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the append-only mapping status history.
+    """
+    list_display = ['mapping_id', 'patient_id', 'doctor_id', 'from_status', 'to_status', 'changed_at']
+    list_filter = ['to_status']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_fields = ['=mapping_id', '=patient_id', '=doctor_id']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedMapping)
+class ArchivedMappingAdmin(admin.ModelAdmin):
+    """
+    Read-only view of mappings moved out by archive_mappings.
+    """
+    list_display = ['id', 'patient', 'doctor', 'status', 'assigned_date', 'archived_at']
+    list_filter = ['status']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['patient', 'doctor', 'created_by']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('patient', 'doctor')
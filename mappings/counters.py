@@ -0,0 +1,27 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from doctors.models import Doctor
+from doctors.recommendations import recommendation_index
+
+# Mapping status -> denormalized counter column on Doctor
+STATUS_COUNTER_FIELDS = {
+    'active': 'active_mapping_count',
+    'inactive': 'inactive_mapping_count',
+    'completed': 'completed_mapping_count',
+}
+
+
+def adjust_doctor_counter(doctor_id, status, delta):
+    """
+    Atomically add delta to the doctor's counter for the given mapping status.
+    The counter never goes below zero: rows counted before the counters
+    existed (or after drift) are fixed by rebuild_counters, not by failing
+    the write that uncounts them.
+    """
+    field = STATUS_COUNTER_FIELDS.get(status)
+    if field is None or not delta:
+        return
+    Doctor.objects.filter(pk=doctor_id).update(**{field: Greatest(F(field) + delta, 0)})
+    if status == 'active':
+        # Active load is a ranking signal for recommendations
+        recommendation_index.schedule_refresh(doctor_id)
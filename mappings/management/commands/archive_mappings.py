@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.outbox import record_events
+from core.response_cache import bump_generation, user_scope
+from mappings.models import ArchivedMapping, PatientDoctorMapping
+
+ARCHIVABLE_STATUSES = ('completed', 'inactive')
+COLUMNS = (
+    'id', 'patient_id', 'doctor_id', 'assigned_date', 'status', 'notes',
+    'created_by_id', 'created_at', 'updated_at'
+)
+
+
+class Command(BaseCommand):
+    help = 'Move completed/inactive mappings older than N days from the hot mapping table to ArchivedMapping'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=90,
+            help='Archive mappings whose last change is at least this many days old',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Mappings moved per transaction',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches to limit lock pressure',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        batch_size = options['batch_size']
+        archived = 0
+        users = set()
+
+        while True:
+            moved = self.archive_batch(cutoff, batch_size)
+            if not moved:
+                break
+            archived += len(moved)
+            users.update(moved)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        for user_id in users:
+            bump_generation(user_scope(user_id))
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} mapping(s)'))
+
+    def archive_batch(self, cutoff, batch_size):
+        """
+        Copy one batch into the archive, record an 'archived' outbox event per
+        row and delete the batch from the hot table in a single transaction.
+        An id that is already archived fails the whole batch rather than
+        deleting a row that was not copied. The selected rows are locked
+        until the transaction ends. Returns the created_by ids of the moved
+        rows.
+        """
+        with transaction.atomic():
+            rows = list(
+                PatientDoctorMapping.objects
+                .filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+                # Lock the batch so a concurrent status change cannot land
+                # between this read and the delete; rows being edited right
+                # now are skipped and picked up by a later run
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values(*COLUMNS)[:batch_size]
+            )
+            if not rows:
+                return []
+            archived = ArchivedMapping.objects.bulk_create(
+                [ArchivedMapping(**row) for row in rows],
+                batch_size=batch_size,
+            )
+            # Downstream consumers learn of the removal from these events,
+            # since the DELETE below fires no signals
+            record_events('mapping', archived, 'archived')
+            # A plain DELETE: archived rows stay counted and have already
+            # been recorded in MappingHistory, so no signals should fire
+            PatientDoctorMapping.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(
+                PatientDoctorMapping.objects.db
+            )
+        return [row['created_by_id'] for row in rows]
@@ -0,0 +1,108 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from mappings.models import MappingHistory
+
+
+def month_start(value, offset=0):
+    months = value.year * 12 + value.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'PostgreSQL only: partition the mapping history table by month on changed_at '
+        'and create partitions ahead of time. Run monthly (e.g. from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Number of future monthly partitions to keep created',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('Partitioning requires PostgreSQL; nothing to do.')
+            return
+
+        table = MappingHistory._meta.db_table
+        with transaction.atomic():
+            if not self.is_partitioned(table):
+                first = self.convert(table)
+            else:
+                first = month_start(timezone.now())
+            created = self.create_partitions(table, first, month_start(timezone.now(), options['months_ahead']))
+
+        self.stdout.write(self.style.SUCCESS(f'{created} partition(s) created for {table}'))
+
+    def is_partitioned(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relkind FROM pg_class c WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+                [table],
+            )
+            row = cursor.fetchone()
+        return row is not None and row[0] == 'p'
+
+    def convert(self, table):
+        """
+        Replace the plain table with a partitioned one holding the same rows.
+        The primary key must include the partition key, so it becomes
+        (id, changed_at). Returns the first month that needs a partition.
+        """
+        legacy = f'{table}_legacy'
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+            cursor.execute(
+                f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                f'PARTITION BY RANGE (changed_at)'
+            )
+            cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+            cursor.execute(f'SELECT MIN(changed_at) FROM {qn(legacy)}')
+            oldest = cursor.fetchone()[0]
+            first = month_start(oldest or timezone.now())
+            self.create_partitions(table, first, month_start(timezone.now()))
+            cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}')
+            cursor.execute(f'DROP TABLE {qn(legacy)}')
+            # Added once the legacy table (and its constraint names) is gone
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, changed_at)')
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                f"FROM {qn(table)}",
+                [table],
+            )
+
+        # Recreate the model's indexes on the partitioned parent; PostgreSQL
+        # propagates them to every partition
+        with connection.schema_editor(atomic=False) as editor:
+            for index in MappingHistory._meta.indexes:
+                editor.add_index(MappingHistory, index)
+        return first
+
+    def create_partitions(self, table, first, last):
+        """
+        Create one partition per month from first through last (inclusive).
+        """
+        qn = connection.ops.quote_name
+        created = 0
+        current = first
+        with connection.cursor() as cursor:
+            while current <= last:
+                following = month_start(current, 1)
+                name = f'{table}_y{current.year}m{current.month:02d}'
+                cursor.execute("SELECT to_regclass(%s)", [name])
+                if cursor.fetchone()[0] is None:
+                    cursor.execute(
+                        f'CREATE TABLE {qn(name)} PARTITION OF {qn(table)} '
+                        f'FOR VALUES FROM (%s) TO (%s)',
+                        [current.isoformat(), following.isoformat()],
+                    )
+                    created += 1
+                current = following
+        return created
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from doctors.models import Doctor
+from doctors.recommendations import recommendation_index
+from patients.models import Patient, PatientCounter
+from mappings.counters import STATUS_COUNTER_FIELDS
+from mappings.models import ArchivedMapping, PatientDoctorMapping
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized doctor mapping counters and per-user patient counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing any changes',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        with transaction.atomic():
+            doctors_fixed = self.rebuild_doctor_counters(dry_run)
+            users_fixed = self.rebuild_patient_counters(dry_run)
+            if dry_run:
+                transaction.set_rollback(True)
+
+        if doctors_fixed and not dry_run:
+            # bulk_update bypasses the per-doctor refresh; active load is a ranking signal
+            recommendation_index.invalidate()
+
+        verb = 'Found' if dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} drift on {doctors_fixed} doctor(s) and {users_fixed} user(s)'
+        ))
+
+    def rebuild_doctor_counters(self, dry_run):
+        """
+        Compare every doctor's counters against GROUP BYs over hot and archived mappings.
+        """
+        expected = {}
+        # Archived mappings stay counted, so both tables are grouped
+        for model in (PatientDoctorMapping, ArchivedMapping):
+            rows = (
+                model.objects
+                .values('doctor_id', 'status')
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            for row in rows:
+                field = STATUS_COUNTER_FIELDS.get(row['status'])
+                if field:
+                    counts = expected.setdefault(row['doctor_id'], {})
+                    counts[field] = counts.get(field, 0) + row['total']
+
+        fields = list(STATUS_COUNTER_FIELDS.values())
+        stale = []
+        for doctor in Doctor.objects.only('id', *fields).iterator(chunk_size=2000):
+            counts = expected.get(doctor.id, {})
+            changed = False
+            for field in fields:
+                value = counts.get(field, 0)
+                if getattr(doctor, field) != value:
+                    setattr(doctor, field, value)
+                    changed = True
+            if changed:
+                stale.append(doctor)
+
+        if stale and not dry_run:
+            Doctor.objects.bulk_update(stale, fields, batch_size=1000)
+        return len(stale)
+
+    def rebuild_patient_counters(self, dry_run):
+        """
+        Compare every user's patient counter against a GROUP BY over patients.
+        """
+        expected = dict(
+            Patient.objects.filter(is_deleted=False).values('created_by_id')
+            .annotate(total=Count('id'))
+            .order_by()
+            .values_list('created_by_id', 'total')
+        )
+        existing = dict(PatientCounter.objects.values_list('user_id', 'patient_count'))
+
+        stale = [
+            PatientCounter(user_id=user_id, patient_count=expected.get(user_id, 0))
+            for user_id in User.objects.values_list('id', flat=True).iterator()
+            if existing.get(user_id, 0) != expected.get(user_id, 0)
+        ]
+
+        if stale and not dry_run:
+            PatientCounter.objects.bulk_create(
+                stale,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['patient_count'],
+            )
+        return len(stale)
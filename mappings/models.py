@@ -1,10 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 from patients.models import Patient
 from doctors.models import Doctor
+from core.concurrency import VersionedModelMixin
+from core.outbox import record_event
+from .counters import adjust_doctor_counter
 
 
-class PatientDoctorMapping(models.Model):
+class PatientDoctorMapping(VersionedModelMixin, models.Model):
     """
     Model to map patients to doctors.
     This represents the relationship between a patient and their assigned doctors.
@@ -28,15 +32,53 @@ class PatientDoctorMapping(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mappings')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Optimistic concurrency; every update is conditional on and increments it
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         # Ensure a patient can't be assigned to the same doctor multiple times with active status
         unique_together = ['patient', 'doctor', 'status']
         ordering = ['-created_at']
+        indexes = [
+            # Finds archivable rows for the archive_mappings command
+            models.Index(fields=['status', 'updated_at']),
+            # Admin changelist order
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.patient.full_name} -> {self.doctor.full_name} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which doctor counter this row is currently counted in
+        if 'doctor_id' in instance.__dict__ and 'status' in instance.__dict__:
+            instance._counted_as = (instance.doctor_id, instance.status)
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the mapping, move it between the doctor's status counters,
+        append status transitions to MappingHistory and write an outbox
+        event, all in the same transaction.
+        """
+        adding = self._state.adding
+        previous = getattr(self, '_counted_as', None)
+        with transaction.atomic():
+            if previous is None and not self._state.adding:
+                previous = type(self).objects.filter(pk=self.pk).values_list('doctor_id', 'status').first()
+            super().save(*args, **kwargs)
+            current = (self.doctor_id, self.status)
+            if previous != current:
+                if previous is not None:
+                    adjust_doctor_counter(*previous, -1)
+                adjust_doctor_counter(*current, 1)
+            if previous is None or previous[1] != self.status:
+                MappingHistory.record(self, previous[1] if previous else None)
+            record_event('mapping', self, 'created' if adding else 'updated')
+        self._counted_as = current
+
     def clean(self):
         """
         Custom validation to ensure the patient belongs to the user creating the mapping.
@@ -44,3 +86,72 @@ class PatientDoctorMapping(models.Model):
         from django.core.exceptions import ValidationError
         if self.patient.created_by != self.created_by:
             raise ValidationError("You can only assign doctors to your own patients.")
+
+
+class MappingHistory(models.Model):
+    """
+    Append-only log of mapping status transitions.
+
+    Rows reference mappings by id only, so history outlives archival and
+    deletion of the mapping. On PostgreSQL the table can be partitioned by
+    month on changed_at with the partition_mapping_history command.
+    """
+    mapping_id = models.BigIntegerField()
+    patient_id = models.BigIntegerField()
+    doctor_id = models.BigIntegerField()
+    from_status = models.CharField(max_length=20, blank=True, null=True)
+    to_status = models.CharField(max_length=20)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        verbose_name_plural = 'mapping history'
+        indexes = [
+            models.Index(fields=['mapping_id', 'changed_at'], name='mappinghistory_mapping_idx'),
+            models.Index(fields=['patient_id', 'changed_at'], name='mappinghistory_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"Mapping {self.mapping_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    @classmethod
+    def record(cls, mapping, from_status):
+        return cls.objects.create(
+            mapping_id=mapping.pk,
+            patient_id=mapping.patient_id,
+            doctor_id=mapping.doctor_id,
+            from_status=from_status,
+            to_status=mapping.status,
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Mapping history is append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Mapping history is append-only')
+
+
+class ArchivedMapping(models.Model):
+    """
+    Completed or inactive mappings moved out of the hot mapping table by
+    the archive_mappings command. Keeps the original id and columns.
+    Archived rows still count towards the doctor's status counters.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='archived_mappings')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_mappings')
+    assigned_date = models.DateField()
+    status = models.CharField(max_length=20, choices=PatientDoctorMapping.STATUS_CHOICES)
+    notes = models.TextField(blank=True, null=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_mappings')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived mapping {self.pk} ({self.status})"
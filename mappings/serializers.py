@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from core.concurrency import ChangedFieldsUpdateMixin
 from .models import PatientDoctorMapping
 from patients.models import Patient
 from doctors.models import Doctor
-from patients.serializers import PatientSerializer
+from patients.serializers import PatientSummarySerializer
 from doctors.serializers import DoctorListSerializer
 
 
@@ -11,7 +12,7 @@ class PatientDoctorMappingSerializer(serializers.ModelSerializer):
     Serializer for PatientDoctorMapping model.
     Includes nested patient and doctor information.
     """
-    patient_details = PatientSerializer(source='patient', read_only=True)
+    patient_details = PatientSummarySerializer(source='patient', read_only=True)
     doctor_details = DoctorListSerializer(source='doctor', read_only=True)
     created_by = serializers.StringRelatedField(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -21,9 +22,9 @@ class PatientDoctorMappingSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'patient', 'doctor', 'patient_details', 'doctor_details',
             'assigned_date', 'status', 'status_display', 'notes',
-            'created_by', 'created_at', 'updated_at'
+            'created_by', 'created_at', 'updated_at', 'version'
         ]
-        read_only_fields = ['id', 'assigned_date', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'assigned_date', 'created_by', 'created_at', 'updated_at', 'version']
 
     def validate(self, attrs):
         """
@@ -35,10 +36,16 @@ class PatientDoctorMappingSerializer(serializers.ModelSerializer):
         
         # Check if the patient belongs to the current user
         request = self.context.get('request')
-        if request and patient.created_by != request.user:
+        if request and patient.created_by_id != request.user.pk:
             raise serializers.ValidationError("You can only assign doctors to your own patients.")
         
+        # Check that the patient has not been deleted
+        if patient.is_deleted:
+            raise serializers.ValidationError("Cannot assign a doctor to a deleted patient.")
+        
         # Check if the doctor is active
+        if doctor.is_deleted:
+            raise serializers.ValidationError("Cannot assign a deleted doctor.")
         if not doctor.is_active:
             raise serializers.ValidationError("Cannot assign an inactive doctor.")
         
@@ -65,6 +72,8 @@ class PatientDoctorMappingCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating new patient-doctor mappings.
     """
+    patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.light())
+
     class Meta:
         model = PatientDoctorMapping
         fields = ['patient', 'doctor', 'status', 'notes']
@@ -79,10 +88,16 @@ class PatientDoctorMappingCreateSerializer(serializers.ModelSerializer):
         
         # Check if the patient belongs to the current user
         request = self.context.get('request')
-        if request and patient.created_by != request.user:
+        if request and patient.created_by_id != request.user.pk:
             raise serializers.ValidationError("You can only assign doctors to your own patients.")
         
+        # Check that the patient has not been deleted
+        if patient.is_deleted:
+            raise serializers.ValidationError("Cannot assign a doctor to a deleted patient.")
+        
         # Check if the doctor is active
+        if doctor.is_deleted:
+            raise serializers.ValidationError("Cannot assign a deleted doctor.")
         if not doctor.is_active:
             raise serializers.ValidationError("Cannot assign an inactive doctor.")
         
@@ -99,9 +114,10 @@ class PatientDoctorMappingCreateSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class PatientDoctorMappingUpdateSerializer(serializers.ModelSerializer):
+class PatientDoctorMappingUpdateSerializer(ChangedFieldsUpdateMixin, serializers.ModelSerializer):
     """
     Serializer for updating existing mappings.
+    Writes only the fields that changed.
     """
     class Meta:
         model = PatientDoctorMapping
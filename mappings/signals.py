@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.outbox import record_event
+from core.response_cache import schedule_bump, user_scope
+from .counters import adjust_doctor_counter
+from .models import ArchivedMapping, PatientDoctorMapping
+
+
+@receiver(post_delete, sender=PatientDoctorMapping)
+def decrement_doctor_counter(sender, instance, **kwargs):
+    """
+    Keep the doctor's status counters in sync when a mapping is deleted,
+    including deletes cascaded from a patient or doctor.
+    post_delete runs inside the deletion transaction.
+    """
+    doctor_id, status = getattr(instance, '_counted_as', (instance.doctor_id, instance.status))
+    adjust_doctor_counter(doctor_id, status, -1)
+    record_event('mapping', instance, 'deleted')
+
+
+@receiver(post_save, sender=PatientDoctorMapping)
+@receiver(post_delete, sender=PatientDoctorMapping)
+def invalidate_mapping_responses(sender, instance, **kwargs):
+    """
+    Drop the creator's cached mapping list once the write is committed.
+    """
+    schedule_bump(user_scope(instance.created_by_id))
+
+
+@receiver(post_delete, sender=ArchivedMapping)
+def decrement_archived_counter(sender, instance, **kwargs):
+    """
+    Archived mappings stay counted; uncount them when they are finally
+    deleted (cascades from purged patients and doctors).
+    """
+    adjust_doctor_counter(instance.doctor_id, instance.status, -1)
@@ -1,3 +1,228 @@
-from django.test import TestCase
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from core.models import OutboxEvent
+from core.testing import IsolatedAPITestCase, QueryCountTestCase, make_doctor, make_mapping, make_patient
+from doctors.models import Doctor
+from doctors.recommendations import recommendation_index
+from .models import ArchivedMapping, MappingHistory, PatientDoctorMapping
 
-# Create your tests here.
+
+class MappingQueryCountTests(QueryCountTestCase):
+    """
+    Mapping endpoints nest patient and doctor details; they must issue a
+    constant number of queries regardless of how many mappings exist.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.patient = make_patient(self.user, 0)
+        self.mappings = []
+
+    def grow(self, rows):
+        # Each mapping gets its own patient and doctor so nested lookups
+        # cannot be served from a single cached related object
+        while len(self.mappings) < rows:
+            index = len(self.mappings) + 1
+            patient = make_patient(self.user, index)
+            doctor = make_doctor(self.user, index)
+            self.mappings.append(make_mapping(self.user, patient, doctor))
+
+    def grow_for_patient(self, rows):
+        while len(self.mappings) < rows:
+            doctor = make_doctor(self.user, len(self.mappings))
+            self.mappings.append(make_mapping(self.user, self.patient, doctor))
+
+    def test_mapping_list(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/mappings/'))
+
+    def test_mapping_list_filtered_by_status(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/mappings/?status=active'))
+
+    def test_mapping_by_patient(self):
+        self.assertConstantQueries(
+            self.grow_for_patient, lambda: self.client.get(f'/api/mappings/{self.patient.pk}/')
+        )
+
+    def test_mapping_create(self):
+        # Unmapped doctors for the new mappings, created outside the measurement
+        doctors = [make_doctor(self.user, 1000 + index) for index in range(len(self.row_counts))]
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.post(
+                '/api/mappings/', {'patient': self.patient.pk, 'doctor': doctors.pop().pk}, format='json'
+            ),
+            expected_status=201
+        )
+
+    def test_mapping_update(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.put(
+                f'/api/mappings/detail/{self.mappings[-1].pk}/', {'status': 'inactive'}, format='json'
+            )
+        )
+
+    def test_mapping_delete(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.delete(f'/api/mappings/detail/{self.mappings[-1].pk}/'),
+            expected_status=204
+        )
+
+    def test_mapping_status_choices(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/mappings/status-choices/'))
+
+    def test_mapping_list_cached_until_write(self):
+        self.grow(2)
+        self.client.get('/api/mappings/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/mappings/')
+        self.assertEqual(response.json()['count'], 2)
+
+        doctor = self.mappings[0].doctor
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.hospital_name = 'Renamed Hospital'
+            doctor.save(update_fields=['hospital_name', 'updated_at'])
+        response = self.client.get('/api/mappings/')
+        names = {mapping['doctor_details']['hospital_name'] for mapping in response.json()['mappings']}
+        self.assertIn('Renamed Hospital', names)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mappings[0].delete()
+        self.assertEqual(self.client.get('/api/mappings/').json()['count'], 1)
+
+    def test_mapping_list_skips_large_patient_fields(self):
+        self.grow(3)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/mappings/')
+        self.assertNotIn('medical_history', response.json()['mappings'][0]['patient_details'])
+        for query in context.captured_queries:
+            self.assertNotIn('"medical_history"', query['sql'])
+
+
+class DoctorCounterTests(IsolatedAPITestCase):
+    """
+    Doctor status counters follow mapping writes and are repaired by
+    rebuild_counters.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.doctor = make_doctor(self.user, 0)
+        self.patients = [make_patient(self.user, index) for index in range(2)]
+
+    def counters(self):
+        self.doctor.refresh_from_db()
+        return (
+            self.doctor.active_mapping_count,
+            self.doctor.inactive_mapping_count,
+            self.doctor.completed_mapping_count,
+        )
+
+    def test_counters_follow_mapping_writes(self):
+        first = make_mapping(self.user, self.patients[0], self.doctor)
+        second = make_mapping(self.user, self.patients[1], self.doctor)
+        self.assertEqual(self.counters(), (2, 0, 0))
+
+        first.status = 'inactive'
+        first.save()
+        self.assertEqual(self.counters(), (1, 1, 0))
+
+        second.delete()
+        self.assertEqual(self.counters(), (0, 1, 0))
+
+        # Deleting the patient cascades to its mappings
+        self.patients[0].delete()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_counter_never_goes_below_zero(self):
+        # Rows counted before the counter columns existed start at zero
+        mapping = make_mapping(self.user, self.patients[0], self.doctor)
+        Doctor.objects.filter(pk=self.doctor.pk).update(active_mapping_count=0)
+        mapping.delete()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_rebuild_counters(self):
+        make_mapping(self.user, self.patients[0], self.doctor)
+        make_mapping(self.user, self.patients[1], self.doctor, status='completed')
+        Doctor.objects.filter(pk=self.doctor.pk).update(active_mapping_count=0, inactive_mapping_count=5)
+
+        output = StringIO()
+        call_command('rebuild_counters', '--dry-run', stdout=output)
+        self.assertIn('Found drift on 1 doctor(s)', output.getvalue())
+        self.assertEqual(self.counters(), (0, 5, 1))
+
+        output = StringIO()
+        call_command('rebuild_counters', stdout=output)
+        self.assertIn('Repaired drift on 1 doctor(s) and 0 user(s)', output.getvalue())
+        self.assertEqual(self.counters(), (1, 0, 1))
+
+    def test_rebuild_counters_refreshes_recommendation_load(self):
+        make_mapping(self.user, self.patients[0], self.doctor)
+        Doctor.objects.filter(pk=self.doctor.pk).update(active_mapping_count=7)
+        recommendation_index.rebuild()
+        [(_, _, candidate)] = recommendation_index.recommend('cardiology', 'TX')
+        self.assertEqual(candidate.active_patients, 7)
+
+        call_command('rebuild_counters', stdout=StringIO())
+        [(_, _, candidate)] = recommendation_index.recommend('cardiology', 'TX')
+        self.assertEqual(candidate.active_patients, 1)
+
+
+class MappingArchiveTests(IsolatedAPITestCase):
+    """
+    Status transitions are kept in MappingHistory and old finished
+    mappings move to ArchivedMapping without changing doctor counters.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.doctor = make_doctor(self.user, 0)
+        self.mappings = [
+            make_mapping(self.user, make_patient(self.user, index), self.doctor)
+            for index in range(3)
+        ]
+
+    def test_status_changes_are_recorded(self):
+        url = f'/api/mappings/detail/{self.mappings[0].pk}/'
+        self.client.put(url, {'status': 'inactive'}, format='json')
+        self.client.put(url, {'notes': 'Follow-up booked'}, format='json')
+        self.client.put(url, {'status': 'completed'}, format='json')
+        history = MappingHistory.objects.filter(mapping_id=self.mappings[0].pk)
+        self.assertEqual(
+            list(history.values_list('from_status', 'to_status')),
+            [(None, 'active'), ('active', 'inactive'), ('inactive', 'completed')]
+        )
+
+    def test_archive_mappings(self):
+        for mapping in self.mappings[:2]:
+            mapping.status = 'completed'
+            mapping.save()
+        call_command('archive_mappings', '--older-than-days', '-1', '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual(list(PatientDoctorMapping.objects.values_list('pk', flat=True)), [self.mappings[2].pk])
+        self.assertEqual(ArchivedMapping.objects.count(), 2)
+        self.assertEqual(self.client.get('/api/mappings/').json()['count'], 1)
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.active_mapping_count, self.doctor.completed_mapping_count), (1, 2))
+        self.assertEqual(
+            sorted(OutboxEvent.objects.filter(event_type='archived').values_list('aggregate_type', 'aggregate_id')),
+            [('mapping', self.mappings[0].pk), ('mapping', self.mappings[1].pk)]
+        )
+
+    def test_archive_conflict_keeps_the_hot_row(self):
+        mapping = self.mappings[0]
+        mapping.status = 'completed'
+        mapping.save()
+        ArchivedMapping.objects.create(
+            id=mapping.pk, patient=mapping.patient, doctor=mapping.doctor, assigned_date=mapping.assigned_date,
+            status='completed', created_by=self.user, created_at=mapping.created_at, updated_at=mapping.updated_at,
+        )
+        with self.assertRaises(IntegrityError):
+            call_command('archive_mappings', '--older-than-days', '-1', stdout=StringIO())
+        self.assertTrue(PatientDoctorMapping.objects.filter(pk=mapping.pk).exists())
@@ -3,6 +3,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from core.concurrency import VersionConflict, check_if_match, precondition_failed, version_etag
+from core.idempotency import idempotent
+from core.response_cache import DOCTORS_SCOPE, cache_response
+from core.reference import ReferenceDocument, choices_list, reference_view
 from .models import PatientDoctorMapping
 from patients.models import Patient
 from .serializers import (
@@ -11,17 +15,32 @@ from .serializers import (
     PatientDoctorMappingUpdateSerializer
 )
 
+# Relations read by PatientDoctorMappingSerializer; loaded with the mappings
+# so serializing a list takes no per-row queries
+NESTED_RELATIONS = ('patient__created_by', 'doctor', 'created_by')
+# Patient columns PatientSummarySerializer does not render
+DEFERRED_FIELDS = tuple(f'patient__{name}' for name in Patient.HEAVY_FIELDS)
+
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
+@cache_response('mappings', depends=[DOCTORS_SCOPE])
 def mapping_list_create(request):
     """
     GET: List all patient-doctor mappings created by the authenticated user
     POST: Create a new patient-doctor mapping
+
+    GET responses are cached per user until one of the user's patients or
+    mappings, or any doctor, changes.
     """
     if request.method == 'GET':
         # Get only mappings created by the current user
-        mappings = PatientDoctorMapping.objects.filter(created_by=request.user)
+        mappings = PatientDoctorMapping.objects.filter(
+            created_by=request.user,
+            patient__is_deleted=False,
+            doctor__is_deleted=False
+        ).select_related(*NESTED_RELATIONS).defer(*DEFERRED_FIELDS)
         
         # Filter by status if provided
         status_filter = request.query_params.get('status', None)
@@ -58,13 +77,14 @@ def mapping_by_patient(request, patient_id):
     GET: Retrieve all doctors assigned to a specific patient
     """
     # Ensure the patient belongs to the current user
-    patient = get_object_or_404(Patient, pk=patient_id, created_by=request.user)
+    patient = get_object_or_404(Patient.objects.light(), pk=patient_id, created_by=request.user, is_deleted=False)
     
     # Get all mappings for this patient
     mappings = PatientDoctorMapping.objects.filter(
         patient=patient,
-        created_by=request.user
-    )
+        created_by=request.user,
+        doctor__is_deleted=False
+    ).select_related(*NESTED_RELATIONS).defer(*DEFERRED_FIELDS)
     
     # Filter by status if provided
     status_filter = request.query_params.get('status', None)
@@ -85,9 +105,21 @@ def mapping_detail(request, pk):
     """
     PUT: Update a specific mapping (e.g., change status)
     DELETE: Delete a specific mapping
+
+    Both honour If-Match with the mapping's version and answer 412 when
+    it was changed since.
     """
     # Get mapping and ensure it belongs to the current user
-    mapping = get_object_or_404(PatientDoctorMapping, pk=pk, created_by=request.user)
+    mapping = get_object_or_404(
+        PatientDoctorMapping.objects.select_related(*NESTED_RELATIONS).defer(*DEFERRED_FIELDS),
+        pk=pk,
+        created_by=request.user,
+        patient__is_deleted=False,
+        doctor__is_deleted=False
+    )
+    conflict = check_if_match(request, mapping)
+    if conflict:
+        return conflict
 
     if request.method == 'PUT':
         serializer = PatientDoctorMappingUpdateSerializer(
@@ -97,12 +129,15 @@ def mapping_detail(request, pk):
             context={'request': request}
         )
         if serializer.is_valid():
-            updated_mapping = serializer.save()
+            try:
+                updated_mapping = serializer.save()
+            except VersionConflict:
+                return precondition_failed(mapping)
             response_serializer = PatientDoctorMappingSerializer(updated_mapping)
             return Response({
                 'message': 'Mapping updated successfully',
                 'mapping': response_serializer.data
-            })
+            }, headers={'ETag': version_etag(updated_mapping)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
@@ -114,16 +149,14 @@ def mapping_detail(request, pk):
         }, status=status.HTTP_204_NO_CONTENT)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def mapping_status_choices(request):
-    """
+STATUS_CHOICES = ReferenceDocument({
+    'status_choices': choices_list(PatientDoctorMapping.STATUS_CHOICES)
+})
+
+mapping_status_choices = reference_view(
+    STATUS_CHOICES,
+    doc="""
     Get list of all available status choices.
+    Served from pre-encoded bytes with an ETag; public and cacheable.
     """
-    status_choices = [
-        {'value': choice[0], 'label': choice[1]} 
-        for choice in PatientDoctorMapping.STATUS_CHOICES
-    ]
-    return Response({
-        'status_choices': status_choices
-    })
+)
@@ -1,17 +1,22 @@
 from django.contrib import admin
-from .models import Patient
+from core.admin_mixins import CachedRelatedOnlyFieldListFilter, ScalableModelAdmin
+from .models import Patient, PatientCounter
 
 
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(ScalableModelAdmin):
     """
     Admin configuration for Patient model.
     This allows managing patients from Django admin interface.
+    Searches are exact (email) or prefix (names) so they use the Upper() indexes.
     """
     list_display = ['full_name', 'email', 'phone', 'gender', 'created_by', 'created_at']
-    list_filter = ['gender', 'created_at', 'created_by']
-    search_fields = ['first_name', 'last_name', 'email', 'phone']
+    list_filter = ['gender', 'is_deleted', 'created_at', ('created_by', CachedRelatedOnlyFieldListFilter)]
+    search_fields = ['=email', '^last_name', '^first_name']
+    actions = ['restore_selected']
+    raw_id_fields = ['created_by']
     readonly_fields = ['created_at', 'updated_at']
+    changelist_deferred_fields = Patient.HEAVY_FIELDS
     
     fieldsets = (
         ('Personal Information', {
@@ -24,7 +29,25 @@ class PatientAdmin(admin.ModelAdmin):
             'fields': ('blood_group', 'allergies', 'medical_history')
         }),
         ('System Information', {
-            'fields': ('created_by', 'created_at', 'updated_at'),
+            'fields': ('created_by', 'is_deleted', 'deleted_at', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+
+    @admin.action(description='Restore selected soft-deleted patients')
+    def restore_selected(self, request, queryset):
+        restored = 0
+        for obj in queryset.filter(is_deleted=True):
+            obj.restore()
+            restored += 1
+        self.message_user(request, f'Restored {restored} patient(s).')
+
+
+@admin.register(PatientCounter)
+class PatientCounterAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the denormalized per-user patient counters.
+    Use the rebuild_counters command to repair drift.
+    """
+    list_display = ['user', 'patient_count', 'updated_at']
+    readonly_fields = ['user', 'patient_count', 'updated_at']
@@ -0,0 +1,117 @@
+from datetime import date
+from django.core.cache import cache
+from django.db.models import Count
+from core import metrics
+from core.response_cache import bump_generation, get_generations
+from .models import Patient
+
+# Age buckets as (label, lower bound inclusive, upper bound exclusive)
+AGE_BUCKETS = [
+    ('0-17', 0, 18),
+    ('18-29', 18, 30),
+    ('30-44', 30, 45),
+    ('45-64', 45, 65),
+    ('65+', 65, None),
+]
+# Bucket for birth dates in the future
+INVALID_AGE = 'invalid'
+
+CACHE_PREFIX = 'patient-analytics'
+GLOBAL_SCOPE = 'all'
+
+
+def analytics_scope(scope):
+    """
+    The response_cache generation scope for a user id or 'all'.
+    """
+    return f'analytics:{scope}'
+
+
+def invalidate_for_user(user_id):
+    bump_generation(analytics_scope(user_id))
+    bump_generation(analytics_scope(GLOBAL_SCOPE))
+
+
+def _age_on(birth_date, today):
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def _grouped(queryset, *fields):
+    """
+    Push a breakdown down to a single SQL GROUP BY.
+    """
+    return queryset.values(*fields).annotate(count=Count('id')).order_by('-count', *fields)
+
+
+def compute_patient_analytics(queryset, today=None):
+    """
+    Compute demographic aggregates for a patient queryset.
+    Every breakdown is a GROUP BY in the database; only the grouped rows
+    (at most one per distinct birth date) are brought back into Python.
+    """
+    today = today or date.today()
+
+    gender_labels = dict(Patient.GENDER_CHOICES)
+    gender = [
+        {'gender': row['gender'], 'label': gender_labels.get(row['gender'], row['gender']), 'count': row['count']}
+        for row in _grouped(queryset, 'gender')
+    ]
+    total = sum(row['count'] for row in gender)
+
+    # NULL and blank blood groups are both reported as 'unknown'
+    blood_group_counts = {}
+    for row in _grouped(queryset, 'blood_group'):
+        key = row['blood_group'] or 'unknown'
+        blood_group_counts[key] = blood_group_counts.get(key, 0) + row['count']
+    blood_group = [
+        {'blood_group': key, 'count': count}
+        for key, count in sorted(blood_group_counts.items(), key=lambda item: -item[1])
+    ]
+
+    # Ages are bucketed from per-birth-date counts, which is exact and
+    # bounded by the number of distinct birth dates rather than patients.
+    # Future birth dates are counted as invalid and left out of the average.
+    age_counts = {label: 0 for label, _, _ in AGE_BUCKETS}
+    age_counts[INVALID_AGE] = 0
+    age_sum = 0
+    for row in _grouped(queryset, 'date_of_birth'):
+        age = _age_on(row['date_of_birth'], today)
+        if age < 0:
+            age_counts[INVALID_AGE] += row['count']
+            continue
+        age_sum += age * row['count']
+        for label, lower, upper in AGE_BUCKETS:
+            if age >= lower and (upper is None or age < upper):
+                age_counts[label] += row['count']
+                break
+    valid = total - age_counts[INVALID_AGE]
+
+    return {
+        'total': total,
+        'average_age': round(age_sum / valid, 1) if valid else None,
+        'age_distribution': [
+            {'range': label, 'count': age_counts[label]} for label in age_counts
+        ],
+        'gender': gender,
+        'blood_group': blood_group,
+        'states': list(_grouped(queryset, 'state')),
+        'cities': list(_grouped(queryset, 'city', 'state')),
+    }
+
+
+def get_patient_analytics(user=None, timeout=300):
+    """
+    Return cached analytics for a user's patients, or for all patients when user is None.
+    """
+    scope = GLOBAL_SCOPE if user is None else user.id
+    [generation] = get_generations([analytics_scope(scope)])
+    cache_key = f'{CACHE_PREFIX}:{scope}:{generation}'
+    result = cache.get(cache_key)
+    metrics.inc('cache_requests_total', cache='analytics', result='miss' if result is None else 'hit')
+    if result is None:
+        queryset = Patient.objects.filter(is_deleted=False)
+        if user is not None:
+            queryset = queryset.filter(created_by=user)
+        result = compute_patient_analytics(queryset)
+        cache.set(cache_key, result, timeout)
+    return result
@@ -0,0 +1,188 @@
+import re
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+from itertools import combinations, groupby, islice
+
+# Minimum score reported as a likely duplicate
+DEFAULT_MIN_SCORE = 0.8
+
+# Blocks larger than this (e.g. a shared placeholder phone number) are
+# skipped: they say little about identity and would make matching quadratic
+MAX_BLOCK_SIZE = 50
+
+# Weight of each compared attribute in the final score
+WEIGHTS = {
+    'name': 0.50,
+    'date_of_birth': 0.25,
+    'phone': 0.15,
+    'email': 0.10,
+}
+
+# Patient columns needed to build keys and score candidates
+MATCH_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'phone', 'email')
+
+DuplicateCandidate = namedtuple('DuplicateCandidate', 'patient_ids score reasons')
+
+_SOUNDEX_CODES = {
+    letter: str(code)
+    for code, letters in enumerate(['aeiouy', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r'])
+    for letter in letters
+}
+
+
+def normalize_name(value):
+    """
+    Lowercase ASCII letters only: "O'Brien-Núñez" -> "obriennunez".
+    """
+    value = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z]', '', value.lower())
+
+
+def phone_digits(value):
+    """
+    The last 10 digits of a phone number, or '' if it has fewer than 7.
+    """
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:] if len(digits) >= 7 else ''
+
+
+def soundex(value):
+    """
+    American Soundex code of a name ("Robert" and "Rupert" -> "R163").
+    """
+    name = normalize_name(value)
+    if not name:
+        return ''
+    codes = []
+    previous = _SOUNDEX_CODES.get(name[0])
+    for letter in name[1:]:
+        if letter in 'hw':
+            # h and w do not separate letters with the same code
+            continue
+        code = _SOUNDEX_CODES[letter]
+        if code != '0' and code != previous:
+            codes.append(code)
+        previous = code
+    return (name[0].upper() + ''.join(codes) + '000')[:4]
+
+
+def blocking_keys(first_name, last_name, date_of_birth, phone):
+    """
+    Keys under which a patient is filed. Two patients are only compared
+    if they share at least one key.
+    """
+    keys = []
+    last = normalize_name(last_name)
+    dob = date_of_birth.isoformat() if date_of_birth else ''
+    if last and dob:
+        keys.append(f'ln:{last}:{dob}')
+    phonetic = soundex(last_name) + soundex(first_name)
+    if phonetic and dob:
+        keys.append(f'sx:{phonetic}:{dob}')
+    digits = phone_digits(phone)
+    if digits:
+        keys.append(f'ph:{digits}')
+    return keys
+
+
+def patient_blocking_keys(patient):
+    return blocking_keys(patient.first_name, patient.last_name, patient.date_of_birth, patient.phone)
+
+
+def sync_blocking_keys(patient, adding=False):
+    """
+    Replace the patient's rows in the blocking index.
+    """
+    from .models import PatientBlockingKey
+    if not adding:
+        PatientBlockingKey.objects.filter(patient=patient).delete()
+    PatientBlockingKey.objects.bulk_create([
+        PatientBlockingKey(patient=patient, user_id=patient.created_by_id, key=key)
+        for key in patient_blocking_keys(patient)
+    ])
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _date_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    # One wrong component (typo, or day and month swapped) still counts for half
+    same = (a.year == b.year) + (a.month == b.month) + (a.day == b.day)
+    swapped = a.year == b.year and a.month == b.day and a.day == b.month
+    return 0.5 if same == 2 or swapped else 0.0
+
+
+def score_pair(a, b):
+    """
+    Score two patients (dicts of MATCH_FIELDS) between 0 and 1.
+    Returns (score, reasons) where reasons lists the attributes that match.
+    """
+    first_a, last_a = normalize_name(a['first_name']), normalize_name(a['last_name'])
+    first_b, last_b = normalize_name(b['first_name']), normalize_name(b['last_name'])
+    parts = {
+        # Also try first and last name swapped
+        'name': max(
+            _similarity(first_a + ' ' + last_a, first_b + ' ' + last_b),
+            _similarity(first_a + ' ' + last_a, last_b + ' ' + first_b),
+        ),
+        'date_of_birth': _date_similarity(a['date_of_birth'], b['date_of_birth']),
+        'phone': float(bool(phone_digits(a['phone'])) and phone_digits(a['phone']) == phone_digits(b['phone'])),
+        'email': _similarity(a['email'].split('@')[0].lower(), b['email'].split('@')[0].lower()),
+    }
+    score = sum(WEIGHTS[name] * value for name, value in parts.items())
+    reasons = [name for name, value in parts.items() if value >= 0.9]
+    return round(score, 3), reasons
+
+
+def candidate_pairs(keys, max_block_size=MAX_BLOCK_SIZE, across_users=False):
+    """
+    Stream the distinct patient id pairs that share a block.
+
+    `keys` is a PatientBlockingKey queryset. Rows are read in key order and
+    grouped on the fly, so only pairs within a block are ever formed.
+    """
+    columns = ('key', 'patient_id') if across_users else ('user_id', 'key', 'patient_id')
+    rows = keys.order_by(*columns).values_list(*columns).iterator(chunk_size=5000)
+    seen = set()
+    for _, block in groupby(rows, key=lambda row: row[:-1]):
+        ids = sorted({row[-1] for row in block})
+        if len(ids) < 2 or len(ids) > max_block_size:
+            continue
+        for pair in combinations(ids, 2):
+            if pair not in seen:
+                seen.add(pair)
+                yield pair
+
+
+def find_duplicates(keys, min_score=DEFAULT_MIN_SCORE, max_block_size=MAX_BLOCK_SIZE,
+                    across_users=False, batch_size=2000):
+    """
+    Yield DuplicateCandidates scoring at least min_score for the patients
+    in `keys` (a PatientBlockingKey queryset). Patient details are fetched
+    once per batch of candidate pairs.
+    """
+    from .models import Patient
+    pairs = candidate_pairs(keys, max_block_size, across_users)
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            return
+        ids = {patient_id for pair in batch for patient_id in pair}
+        patients = {
+            row['id']: row
+            for row in Patient.objects.filter(pk__in=ids, is_deleted=False).values('id', *MATCH_FIELDS)
+        }
+        for a, b in batch:
+            if a not in patients or b not in patients:
+                continue
+            score, reasons = score_pair(patients[a], patients[b])
+            if score >= min_score:
+                yield DuplicateCandidate((a, b), score, reasons)
@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from patients.duplicates import (
+    DEFAULT_MIN_SCORE,
+    MAX_BLOCK_SIZE,
+    MATCH_FIELDS,
+    blocking_keys,
+    find_duplicates,
+)
+from patients.models import Patient, PatientBlockingKey
+
+
+class Command(BaseCommand):
+    help = 'Report likely duplicate patients, comparing only patients that share a blocking key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE, help='Lowest score reported (0-1)')
+        parser.add_argument('--user', help='Only check patients registered by this username')
+        parser.add_argument(
+            '--across-users',
+            action='store_true',
+            help='Also pair patients registered by different users',
+        )
+        parser.add_argument(
+            '--max-block-size',
+            type=int,
+            default=MAX_BLOCK_SIZE,
+            help='Skip blocks with more patients than this',
+        )
+        parser.add_argument(
+            '--rebuild-index',
+            action='store_true',
+            help='Rebuild the blocking index for every patient first',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Patients indexed per transaction')
+
+    def handle(self, *args, **options):
+        if options['rebuild_index']:
+            indexed = self.rebuild_index(options['batch_size'])
+            self.stdout.write(f'Indexed {indexed} patient(s)')
+
+        keys = PatientBlockingKey.objects.all()
+        if options['user']:
+            try:
+                keys = keys.filter(user=User.objects.get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+
+        found = 0
+        for candidate in find_duplicates(
+            keys,
+            min_score=options['min_score'],
+            max_block_size=options['max_block_size'],
+            across_users=options['across_users'],
+        ):
+            found += 1
+            first, second = candidate.patient_ids
+            self.stdout.write(f'{candidate.score:.3f}  {first}  {second}  {",".join(candidate.reasons)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Found {found} likely duplicate pair(s)'))
+
+    def rebuild_index(self, batch_size):
+        """
+        Recompute the blocking keys of every patient in batches.
+        """
+        indexed = 0
+        patients = Patient.objects.order_by('id').values('id', 'created_by_id', *MATCH_FIELDS)
+        batch = []
+        for row in patients.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                indexed += self.index_batch(batch)
+                batch = []
+        if batch:
+            indexed += self.index_batch(batch)
+        return indexed
+
+    def index_batch(self, batch):
+        keys = [
+            PatientBlockingKey(patient_id=row['id'], user_id=row['created_by_id'], key=key)
+            for row in batch
+            for key in blocking_keys(row['first_name'], row['last_name'], row['date_of_birth'], row['phone'])
+        ]
+        with transaction.atomic():
+            PatientBlockingKey.objects.filter(patient_id__in=[row['id'] for row in batch]).delete()
+            PatientBlockingKey.objects.bulk_create(keys, batch_size=1000)
+        return len(batch)
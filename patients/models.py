@@ -1,8 +1,22 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Upper
 from django.contrib.auth.models import User
+from django.utils import timezone
+from core.concurrency import VersionedModelMixin
+from core.fields import CompressedTextField
+from core.outbox import record_event
 
 
-class Patient(models.Model):
+class PatientQuerySet(models.QuerySet):
+    def light(self):
+        """
+        Skip the large free-text columns on paths that do not render them.
+        """
+        return self.defer(*Patient.HEAVY_FIELDS)
+
+
+class Patient(VersionedModelMixin, models.Model):
     """
     Patient model to store patient information.
     Each patient is associated with the user who created it.
@@ -29,16 +43,45 @@ class Patient(models.Model):
     
     # Medical information
     blood_group = models.CharField(max_length=5, blank=True, null=True)
-    allergies = models.TextField(blank=True, null=True)
-    medical_history = models.TextField(blank=True, null=True)
+    allergies = CompressedTextField(blank=True, null=True)
+    medical_history = CompressedTextField(blank=True, null=True)
     
     # System fields
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='patients')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Optimistic concurrency; every update is conditional on and increments it
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    # Soft delete; rows are removed later by the purge_deleted command
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = PatientQuerySet.as_manager()
+
+    # Unbounded text columns deferred by PatientQuerySet.light()
+    HEAVY_FIELDS = ('address', 'allergies', 'medical_history')
+
+    # Fields the duplicate-detection blocking keys are built from
+    BLOCKING_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'phone')
+
+    # Fields published in outbox events and webhooks; the address and the
+    # medical record (allergies, medical history) are never sent downstream
+    OUTBOX_FIELDS = (
+        'id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'gender',
+        'city', 'state', 'zip_code', 'blood_group', 'created_by_id', 'is_deleted',
+        'deleted_at', 'created_at', 'updated_at', 'version',
+    )
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            # Exact and prefix admin searches compare UPPER(column)
+            models.Index(Upper('email'), name='patient_email_upper_idx'),
+            models.Index(Upper('last_name'), name='patient_last_name_upper_idx'),
+            models.Index(Upper('first_name'), name='patient_first_name_upper_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -46,3 +89,114 @@ class Patient(models.Model):
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_deleted = instance.__dict__.get('is_deleted')
+        instance._loaded_blocking_values = tuple(instance.__dict__.get(name) for name in cls.BLOCKING_FIELDS)
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the patient, keep the creator's patient counter in sync
+        (counting only patients that are not soft-deleted), refresh the
+        duplicate-detection blocking keys when a matched field changed and
+        write an outbox event, all in one transaction.
+        """
+        from .duplicates import sync_blocking_keys
+        adding = self._state.adding
+        was_deleted = getattr(self, '_loaded_is_deleted', None)
+        previous = getattr(self, '_loaded_blocking_values', None)
+        current = tuple(self.__dict__.get(name) for name in self.BLOCKING_FIELDS)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding or previous != current:
+                sync_blocking_keys(self, adding=adding)
+            if adding and not self.is_deleted:
+                PatientCounter.adjust(self.created_by_id, 1)
+            elif not adding and was_deleted is not None and was_deleted != self.is_deleted:
+                PatientCounter.adjust(self.created_by_id, -1 if self.is_deleted else 1)
+
+            if adding:
+                event_type = 'created'
+            elif self.is_deleted and not was_deleted:
+                event_type = 'deleted'
+            else:
+                event_type = 'updated'
+            record_event('patient', self, event_type)
+        self._loaded_is_deleted = self.is_deleted
+        self._loaded_blocking_values = current
+
+    def soft_delete(self):
+        """
+        Hide the patient from every read path with a single-row update.
+        Related mappings are removed later in batches by purge_deleted.
+        """
+        self.is_deleted = True
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+
+    def restore(self):
+        """
+        Undo a soft delete that has not been purged yet. The email stays
+        reserved while the patient is deleted, so it cannot clash. Mappings
+        already removed by the background purge are not brought back.
+        """
+        self.is_deleted = False
+        self.deleted_at = None
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+
+
+class PatientBlockingKey(models.Model):
+    """
+    Blocking index for duplicate detection: one row per key a patient is
+    filed under (normalized last name + date of birth, phonetic name +
+    date of birth, phone digits). Maintained by Patient.save().
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='blocking_keys')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'key']),
+            models.Index(fields=['key']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> patient {self.patient_id}"
+
+
+class PatientCounter(models.Model):
+    """
+    Denormalized number of patients registered by each user.
+    Kept up to date on patient create/delete so reads never scan the patients table.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='patient_counter')
+    patient_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.patient_count} patients"
+
+    @classmethod
+    def adjust(cls, user_id, delta):
+        """
+        Atomically add delta to the user's patient count, never going below zero.
+        """
+        if not delta:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(patient_count=Greatest(F('patient_count') + delta, 0))
+        if not updated and delta > 0:
+            counter, created = cls.objects.get_or_create(user_id=user_id, defaults={'patient_count': delta})
+            if not created:
+                cls.objects.filter(pk=counter.pk).update(patient_count=Greatest(F('patient_count') + delta, 0))
+
+    @classmethod
+    def get_count(cls, user_id):
+        """
+        Return the user's patient count with a single primary-key lookup.
+        """
+        count = cls.objects.filter(user_id=user_id).values_list('patient_count', flat=True).first()
+        return count or 0
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.concurrency import ChangedFieldsUpdateMixin
 from .models import Patient
 
 
@@ -16,23 +17,62 @@ class PatientSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
             'date_of_birth', 'gender', 'address', 'city', 'state', 'zip_code',
             'blood_group', 'allergies', 'medical_history', 'created_by',
-            'created_at', 'updated_at'
+            'created_at', 'updated_at', 'version'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at', 'version']
+        # Uniqueness is checked by validate_email, which reports soft-deleted holders
+        extra_kwargs = {'email': {'validators': []}}
 
     def validate_email(self, value):
         """
         Check that the email is unique, except for the current instance.
+        A soft-deleted patient keeps its email until purge_deleted removes
+        it, so the record can still be restored.
         """
         instance = getattr(self, 'instance', None)
         if instance and instance.email == value:
             return value
         
-        if Patient.objects.filter(email=value).exists():
+        is_deleted = Patient.objects.filter(email=value).values_list('is_deleted', flat=True).first()
+        if is_deleted:
+            raise serializers.ValidationError(
+                "A deleted patient still holds this email until it is purged."
+            )
+        if is_deleted is not None:
             raise serializers.ValidationError("A patient with this email already exists.")
         return value
 
 
+class PatientSummarySerializer(serializers.ModelSerializer):
+    """
+    Patient without the large free-text fields, for nesting in other
+    resources. Use with Patient.objects.light() or a matching defer().
+    """
+    full_name = serializers.ReadOnlyField()
+    created_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = Patient
+        fields = [
+            'id', 'first_name', 'last_name', 'full_name', 'email', 'phone',
+            'date_of_birth', 'gender', 'city', 'state', 'zip_code',
+            'blood_group', 'created_by', 'created_at', 'updated_at', 'version'
+        ]
+        read_only_fields = fields
+
+
+class PatientMedicalRecordSerializer(serializers.ModelSerializer):
+    """
+    The full medical record of a patient.
+    """
+    full_name = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Patient
+        fields = ['id', 'full_name', 'blood_group', 'allergies', 'medical_history', 'updated_at', 'version']
+        read_only_fields = fields
+
+
 class PatientCreateSerializer(PatientSerializer):
     """
     Serializer for creating new patients.
@@ -41,10 +81,10 @@ class PatientCreateSerializer(PatientSerializer):
     pass
 
 
-class PatientUpdateSerializer(PatientSerializer):
+class PatientUpdateSerializer(ChangedFieldsUpdateMixin, PatientSerializer):
     """
     Serializer for updating existing patients.
-    Makes all fields optional for partial updates.
+    Makes all fields optional for partial updates and writes only changed fields.
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
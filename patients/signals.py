@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.outbox import record_event
+from core.response_cache import schedule_bump, user_scope
+from .analytics import invalidate_for_user
+from .models import Patient, PatientCounter
+
+
+@receiver(post_delete, sender=Patient)
+def decrement_patient_counter(sender, instance, **kwargs):
+    """
+    Keep the creator's patient counter in sync when a patient is deleted.
+    post_delete runs inside the deletion transaction, so the counter
+    is rolled back together with the delete. Soft-deleted patients were
+    already uncounted when they were marked deleted.
+    """
+    if not instance.is_deleted:
+        PatientCounter.adjust(instance.created_by_id, -1)
+        # Soft-deleted patients already published their 'deleted' event
+        record_event('patient', instance, 'deleted')
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_patient_analytics(sender, instance, **kwargs):
+    """
+    Drop cached analytics for the patient's creator once the write is committed.
+    """
+    user_id = instance.created_by_id
+    transaction.on_commit(lambda: invalidate_for_user(user_id))
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_patient_responses(sender, instance, **kwargs):
+    """
+    Drop the creator's cached patient and mapping lists once the write is committed.
+    """
+    schedule_bump(user_scope(instance.created_by_id))
@@ -1,3 +1,338 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from mappings.models import PatientDoctorMapping
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.concurrency import VersionConflict
+from core.fields import MARKERS
+from core.response_cache import _generation_key
+from core.testing import IsolatedAPITestCase, QueryCountTestCase, make_doctor, make_mapping, make_patient
+from .analytics import analytics_scope, compute_patient_analytics
+from .duplicates import soundex
+from .models import Patient, PatientCounter
 
-# Create your tests here.
+
+class PatientQueryCountTests(QueryCountTestCase):
+    """
+    Patient endpoints must issue a constant number of queries
+    regardless of how many patients the user has.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345', is_staff=True)
+        self.client = self.client_for(self.user)
+        self.patients = []
+
+    def grow(self, rows):
+        while len(self.patients) < rows:
+            self.patients.append(make_patient(self.user, len(self.patients)))
+
+    def test_patient_list(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/patients/'))
+
+    def test_patient_detail(self):
+        self.assertConstantQueries(
+            self.grow, lambda: self.client.get(f'/api/patients/{self.patients[-1].pk}/')
+        )
+
+    def test_patient_create(self):
+        created = []
+
+        def create():
+            created.append(len(created))
+            return self.client.post('/api/patients/', {
+                'first_name': 'New', 'last_name': 'Patient', 'email': f'new{len(created)}@example.com',
+                'phone': '555-0300', 'date_of_birth': '1990-05-01', 'gender': 'F',
+                'address': '3 Main Street', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701',
+            }, format='json')
+        self.assertConstantQueries(self.grow, create, expected_status=201)
+
+    def test_patient_update(self):
+        self.assertConstantQueries(
+            self.grow,
+            lambda: self.client.put(f'/api/patients/{self.patients[-1].pk}/', {'city': 'Dallas'}, format='json')
+        )
+
+    def test_patient_delete(self):
+        self.assertConstantQueries(
+            self.grow, lambda: self.client.delete(f'/api/patients/{self.patients[-1].pk}/'), expected_status=204
+        )
+
+    def test_patient_medical_record(self):
+        self.assertConstantQueries(
+            self.grow, lambda: self.client.get(f'/api/patients/{self.patients[-1].pk}/medical-record/')
+        )
+
+    def test_patient_duplicates(self):
+        def grow_pairs(rows):
+            # Every row adds two patients sharing a birth date no other row uses
+            while len(self.patients) < rows * 2:
+                birth_date = date(1980, 1, 1) + timedelta(days=len(self.patients) // 2)
+                self.patients.append(make_patient(self.user, len(self.patients), date_of_birth=birth_date))
+
+        self.assertConstantQueries(grow_pairs, lambda: self.client.get('/api/patients/duplicates/'))
+
+    def test_patient_stats(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/patients/stats/'))
+
+    def test_patient_analytics(self):
+        self.assertConstantQueries(self.grow, lambda: self.client.get('/api/analytics/patients/'))
+
+    def test_patient_analytics_all_users(self):
+        self.assertConstantQueries(
+            self.grow, lambda: self.client.get('/api/analytics/patients/?scope=all')
+        )
+
+
+class PatientCounterTests(IsolatedAPITestCase):
+    """
+    The per-user patient counter follows creates and (soft) deletes and is
+    repaired by rebuild_counters.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+
+    def test_counter_follows_writes(self):
+        patients = [make_patient(self.user, index) for index in range(3)]
+        self.assertEqual(PatientCounter.get_count(self.user.pk), 3)
+        patients[0].soft_delete()
+        self.assertEqual(PatientCounter.get_count(self.user.pk), 2)
+        # Purging a soft-deleted patient does not uncount it twice
+        patients[0].delete()
+        patients[1].delete()
+        self.assertEqual(PatientCounter.get_count(self.user.pk), 1)
+        self.assertEqual(self.client.get('/api/patients/stats/').data['patient_count'], 1)
+
+    def test_counter_never_goes_below_zero(self):
+        patient = make_patient(self.user, 0)
+        PatientCounter.objects.filter(user=self.user).update(patient_count=0)
+        patient.delete()
+        self.assertEqual(PatientCounter.get_count(self.user.pk), 0)
+
+    def test_rebuild_counters(self):
+        make_patient(self.user, 0)
+        make_patient(self.user, 1)
+        PatientCounter.objects.filter(user=self.user).delete()
+
+        output = StringIO()
+        call_command('rebuild_counters', stdout=output)
+        self.assertIn('Repaired drift on 0 doctor(s) and 1 user(s)', output.getvalue())
+        self.assertEqual(PatientCounter.get_count(self.user.pk), 2)
+
+
+class PatientAnalyticsTests(IsolatedAPITestCase):
+    """
+    Analytics figures are exact and never served from a stale generation.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+
+    def test_figures(self):
+        make_patient(self.user, 0, date_of_birth=date(2010, 6, 1), gender='F', blood_group='A+', city='Austin')
+        make_patient(self.user, 1, date_of_birth=date(1996, 1, 1), gender='M', blood_group='', city='Dallas')
+        make_patient(self.user, 2, date_of_birth=date(1996, 1, 2), gender='F', blood_group='A+', city='Austin')
+        make_patient(self.user, 3, date_of_birth=date(1950, 3, 1), gender='O', blood_group='O-', city='Austin')
+        make_patient(self.user, 4, date_of_birth=date(2030, 1, 1), gender='F', blood_group='O-', city='Austin')
+        make_patient(User.objects.create_user('other'), 5)
+
+        analytics = compute_patient_analytics(Patient.objects.filter(created_by=self.user), today=date(2026, 1, 1))
+        self.assertEqual(analytics['total'], 5)
+        # 15, 30, 29 and 75 years; the 2030 birth date is invalid
+        self.assertEqual(analytics['average_age'], 37.2)
+        self.assertEqual(
+            {row['range']: row['count'] for row in analytics['age_distribution']},
+            {'0-17': 1, '18-29': 1, '30-44': 1, '45-64': 0, '65+': 1, 'invalid': 1}
+        )
+        self.assertEqual({row['gender']: row['count'] for row in analytics['gender']}, {'F': 3, 'M': 1, 'O': 1})
+        self.assertEqual(
+            {row['blood_group']: row['count'] for row in analytics['blood_group']},
+            {'A+': 2, 'O-': 2, 'unknown': 1}
+        )
+        self.assertEqual(
+            [(row['city'], row['count']) for row in analytics['cities']], [('Austin', 4), ('Dallas', 1)]
+        )
+
+    def test_lost_generation_does_not_revive_old_results(self):
+        make_patient(self.user, 0)
+        self.assertEqual(self.client.get('/api/analytics/patients/').data['analytics']['total'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_patient(self.user, 1)
+        # The generation is evicted while the result cached under it survives
+        cache.delete(_generation_key(analytics_scope(self.user.pk)))
+        self.assertEqual(self.client.get('/api/analytics/patients/').data['analytics']['total'], 2)
+
+
+class PatientVersionTests(IsolatedAPITestCase):
+    """
+    Updates are conditional on the row version (optimistic concurrency).
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.patient = make_patient(self.user, 0)
+        self.url = f'/api/patients/{self.patient.pk}/'
+
+    def test_if_match(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"1"')
+
+        response = self.client.put(self.url, {'city': 'Dallas'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+
+        response = self.client.put(self.url, {'city': 'Houston'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.data['current_version'], 2)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.city, 'Dallas')
+
+    def test_concurrent_save_conflicts(self):
+        first = Patient.objects.get(pk=self.patient.pk)
+        second = Patient.objects.get(pk=self.patient.pk)
+        first.city = 'Dallas'
+        first.save(update_fields=['city', 'updated_at'])
+        second.city = 'Houston'
+        with self.assertRaises(VersionConflict):
+            second.save(update_fields=['city', 'updated_at'])
+
+    def test_update_writes_only_changed_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(self.url, {'city': 'Austin', 'state': 'CA'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "patients_patient"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"state"', updates[0])
+        self.assertNotIn('"city"', updates[0])
+
+        response = self.client.put(self.url, {'state': 'CA'}, format='json')
+        self.assertEqual(response.data['patient']['version'], 2)
+
+
+class PatientMedicalRecordTests(IsolatedAPITestCase):
+    """
+    Large text fields are compressed at rest and served by their own endpoint.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.history = 'Hypertension since 2015, managed with lisinopril. ' * 100
+        self.patient = make_patient(self.user, 0, medical_history=self.history, allergies='Penicillin')
+
+    def test_history_is_compressed_at_rest(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT medical_history, allergies FROM patients_patient WHERE id = %s', [self.patient.pk])
+            stored_history, stored_allergies = cursor.fetchone()
+        self.assertTrue(stored_history.startswith(MARKERS))
+        self.assertLess(len(stored_history), len(self.history) // 4)
+        self.assertEqual(stored_allergies, 'Penicillin')
+        self.assertEqual(Patient.objects.get(pk=self.patient.pk).medical_history, self.history)
+
+    def test_medical_record(self):
+        response = self.client.get(f'/api/patients/{self.patient.pk}/medical-record/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['medical_history'], self.history)
+        self.assertEqual(response.data['allergies'], 'Penicillin')
+
+
+class PatientDuplicateTests(IsolatedAPITestCase):
+    """
+    Duplicate detection compares patients only within blocking-key blocks.
+    """
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+
+    def test_soundex(self):
+        self.assertEqual(soundex('Robert'), 'R163')
+        self.assertEqual(soundex('Rupert'), 'R163')
+        self.assertEqual(soundex('Ashcraft'), 'A261')
+        self.assertEqual(soundex('Tymczak'), 'T522')
+
+    def test_blocking_keys_follow_edits(self):
+        patient = make_patient(self.user, 1, last_name="O'Brien", phone='(555) 123-4567')
+        keys = set(patient.blocking_keys.values_list('key', flat=True))
+        self.assertIn(f'ln:obrien:{patient.date_of_birth.isoformat()}', keys)
+        self.assertIn('ph:5551234567', keys)
+
+        patient = Patient.objects.get(pk=patient.pk)
+        patient.phone = '555 765 4321'
+        patient.save()
+        keys = set(patient.blocking_keys.values_list('key', flat=True))
+        self.assertIn('ph:5557654321', keys)
+        self.assertNotIn('ph:5551234567', keys)
+
+    def test_duplicates_endpoint(self):
+        original = make_patient(self.user, 1, first_name='Jonathan', last_name='Smith', phone='555-123-4567')
+        copy = make_patient(self.user, 2, first_name='Jonathon', last_name='Smyth', phone='5551234567',
+                            date_of_birth=original.date_of_birth)
+        make_patient(self.user, 3, first_name='Maria', last_name='Garcia', phone='555-999-0000')
+        other_user = User.objects.create_user('other', password='pass12345')
+        make_patient(other_user, 4, first_name='Jonathan', last_name='Smith', date_of_birth=original.date_of_birth)
+
+        response = self.client.get('/api/patients/duplicates/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        duplicate = response.data['duplicates'][0]
+        self.assertEqual({patient['id'] for patient in duplicate['patients']}, {original.pk, copy.pk})
+        self.assertIn('phone', duplicate['reasons'])
+        self.assertEqual(len(self.client.get('/api/patients/duplicates/?limit=0').data['duplicates']), 1)
+
+        copy.soft_delete()
+        self.assertEqual(self.client.get('/api/patients/duplicates/').data['count'], 0)
+        self.assertEqual(self.client.get('/api/patients/duplicates/?min_score=2').status_code, 400)
+
+
+class PatientSoftDeleteTests(IsolatedAPITestCase):
+    PATIENT = {
+        'first_name': 'New', 'last_name': 'Patient', 'email': 'patient0.1@example.com',
+        'phone': '555-0300', 'date_of_birth': '1990-05-01', 'gender': 'F',
+        'address': '3 Main Street', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pass12345')
+        self.client = self.client_for(self.user)
+        self.patient = make_patient(self.user, 0)
+        self.mapping = make_mapping(self.user, self.patient, make_doctor(self.user, 0))
+
+    def count(self):
+        return PatientCounter.objects.get(user=self.user).patient_count
+
+    def test_deleted_patient_is_hidden_and_uncounted(self):
+        self.assertEqual(self.client.delete(f'/api/patients/{self.patient.pk}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/patients/{self.patient.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/patients/').json()['count'], 0)
+        self.assertEqual(self.count(), 0)
+        self.assertTrue(Patient.objects.get(pk=self.patient.pk).is_deleted)
+
+    def test_deleted_patient_keeps_its_email_until_purged(self):
+        self.patient.soft_delete()
+        response = self.client.post('/api/patients/', self.PATIENT, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['email'], ['A deleted patient still holds this email until it is purged.'])
+
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(Patient.objects.filter(pk=self.patient.pk).exists())
+        self.assertFalse(PatientDoctorMapping.objects.filter(pk=self.mapping.pk).exists())
+        self.assertEqual(self.client.post('/api/patients/', self.PATIENT, format='json').status_code, 201)
+        self.assertEqual(self.count(), 1)
+
+    def test_restore(self):
+        self.patient.soft_delete()
+        Patient.objects.get(pk=self.patient.pk).restore()
+        self.assertEqual(self.client.get(f'/api/patients/{self.patient.pk}/').status_code, 200)
+        self.assertEqual(self.count(), 1)
+
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertTrue(Patient.objects.filter(pk=self.patient.pk).exists())
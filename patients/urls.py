@@ -4,4 +4,8 @@ from . import views
 urlpatterns = [
     path('patients/', views.patient_list_create, name='patient-list-create'),
     path('patients/<int:pk>/', views.patient_detail, name='patient-detail'),
+    path('patients/<int:pk>/medical-record/', views.patient_medical_record, name='patient-medical-record'),
+    path('patients/stats/', views.patient_stats, name='patient-stats'),
+    path('patients/duplicates/', views.patient_duplicates, name='patient-duplicates'),
+    path('analytics/patients/', views.patient_analytics, name='patient-analytics'),
 ]
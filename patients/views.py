@@ -2,21 +2,40 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from .models import Patient
-from .serializers import PatientSerializer, PatientCreateSerializer, PatientUpdateSerializer
+from core.concurrency import VersionConflict, check_if_match, precondition_failed, version_etag
+from core.idempotency import idempotent
+from core.queue import enqueue
+from core.response_cache import cache_response
+from .analytics import get_patient_analytics
+from .duplicates import DEFAULT_MIN_SCORE, find_duplicates
+from .models import Patient, PatientBlockingKey, PatientCounter
+from .serializers import (
+    PatientSerializer,
+    PatientCreateSerializer,
+    PatientUpdateSerializer,
+    PatientMedicalRecordSerializer,
+    PatientSummarySerializer
+)
 
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
+@cache_response('patients')
 def patient_list_create(request):
     """
     GET: List all patients created by the authenticated user
     POST: Create a new patient
+
+    GET responses are cached per user until one of the user's patients changes.
     """
     if request.method == 'GET':
         # Get only patients created by the current user
-        patients = Patient.objects.filter(created_by=request.user)
+        patients = Patient.objects.filter(
+            created_by=request.user, is_deleted=False
+        ).select_related('created_by')
         serializer = PatientSerializer(patients, many=True)
         return Response({
             'count': patients.count(),
@@ -44,28 +63,145 @@ def patient_detail(request, pk):
     GET: Retrieve a specific patient
     PUT: Update a specific patient
     DELETE: Delete a specific patient
+
+    GET returns the row version as ETag; PUT and DELETE honour If-Match and
+    answer 412 when the patient was changed since that version.
     """
     # Get patient and ensure it belongs to the current user
-    patient = get_object_or_404(Patient, pk=pk, created_by=request.user)
+    # (DELETE renders nothing, so it skips the large text columns)
+    patients = Patient.objects.light() if request.method == 'DELETE' else Patient.objects.all()
+    patient = get_object_or_404(patients, pk=pk, created_by=request.user, is_deleted=False)
 
     if request.method == 'GET':
         serializer = PatientSerializer(patient)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': version_etag(patient)})
 
-    elif request.method == 'PUT':
+    conflict = check_if_match(request, patient)
+    if conflict:
+        return conflict
+
+    if request.method == 'PUT':
         serializer = PatientUpdateSerializer(patient, data=request.data, partial=True)
         if serializer.is_valid():
-            updated_patient = serializer.save()
+            try:
+                updated_patient = serializer.save()
+            except VersionConflict:
+                return precondition_failed(patient)
             response_serializer = PatientSerializer(updated_patient)
             return Response({
                 'message': 'Patient updated successfully',
                 'patient': response_serializer.data
-            })
+            }, headers={'ETag': version_etag(updated_patient)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
         patient_name = patient.full_name
-        patient.delete()
+        try:
+            patient.soft_delete()
+        except VersionConflict:
+            return precondition_failed(patient)
+        enqueue('core.purge_mappings', {'parent': 'patient', 'id': patient.pk})
         return Response({
             'message': f'Patient {patient_name} deleted successfully'
         }, status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def patient_medical_record(request, pk):
+    """
+    GET: Retrieve a patient's full medical record (blood group, allergies,
+    medical history). Only these columns are read from the database.
+    """
+    patient = get_object_or_404(
+        Patient.objects.only(
+            'id', 'first_name', 'last_name', 'blood_group', 'allergies',
+            'medical_history', 'updated_at', 'version'
+        ),
+        pk=pk,
+        created_by=request.user,
+        is_deleted=False
+    )
+    serializer = PatientMedicalRecordSerializer(patient)
+    return Response(serializer.data, headers={'ETag': version_etag(patient)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def patient_duplicates(request):
+    """
+    GET: Likely duplicate pairs among the user's patients, best match first.
+    Query params: min_score (0-1, default 0.8), limit (default 50, max 200).
+    Only patients sharing a blocking key (same last name and birth date,
+    same phonetic name and birth date, or same phone) are compared.
+    """
+    try:
+        min_score = float(request.query_params.get('min_score', DEFAULT_MIN_SCORE))
+        if not 0 <= min_score <= 1:
+            raise ValueError
+    except ValueError:
+        return Response({
+            'error': 'min_score must be a number between 0 and 1'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 50)), 200))
+    except ValueError:
+        limit = 50
+
+    keys = PatientBlockingKey.objects.filter(user=request.user)
+    candidates = sorted(find_duplicates(keys, min_score=min_score), key=lambda candidate: -candidate.score)
+    page = candidates[:limit]
+    patients = Patient.objects.light().select_related('created_by').in_bulk(
+        {patient_id for candidate in page for patient_id in candidate.patient_ids}
+    )
+
+    return Response({
+        'count': len(candidates),
+        'duplicates': [
+            {
+                'score': candidate.score,
+                'reasons': candidate.reasons,
+                'patients': PatientSummarySerializer(
+                    [patients[patient_id] for patient_id in candidate.patient_ids], many=True
+                ).data
+            }
+            for candidate in page
+            if all(patient_id in patients for patient_id in candidate.patient_ids)
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def patient_stats(request):
+    """
+    Get the precomputed number of patients registered by the authenticated user.
+    """
+    return Response({
+        'patient_count': PatientCounter.get_count(request.user.id)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def patient_analytics(request):
+    """
+    Get demographic analytics (age, gender, blood group, city/state) for the
+    authenticated user's patients. Staff can pass ?scope=all for every patient.
+    """
+    scope = request.query_params.get('scope', 'mine')
+    if scope == 'all':
+        if not request.user.is_staff:
+            return Response({
+                'error': 'Only staff users can view global analytics'
+            }, status=status.HTTP_403_FORBIDDEN)
+        user = None
+    else:
+        user = request.user
+
+    analytics = get_patient_analytics(user, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+    return Response({
+        'scope': 'all' if user is None else 'mine',
+        'analytics': analytics
+    })